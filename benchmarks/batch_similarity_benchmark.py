@@ -0,0 +1,77 @@
+"""
+Benchmark scoring a matrix of names with batch_similarity against scoring each pair with strsimpy and SequenceMatcher,
+and matching a season of names to rosters with batch_similarity.match_roster against data_utils.get_player_id_from_name,
+checking that the results are exactly the same. Run this file from the repository root with:
+python -m benchmarks.batch_similarity_benchmark [rosters] [players per roster] [names per roster]
+
+@author: Kevin Kelly
+"""
+import random
+import sys
+import time
+from difflib import SequenceMatcher
+
+from strsimpy.jaro_winkler import JaroWinkler
+
+from benchmarks.name_matcher_benchmark import make_pbp_name, make_roster
+from jmu_baseball_utils import batch_similarity
+from jmu_baseball_utils import data_utils
+
+MATRIX_ROWS = 300
+
+
+def main():
+    """
+    Time the pair by pair and batch versions of each and report any differences.
+
+    :return: None
+    """
+    roster_count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    players = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    names_per_roster = int(sys.argv[3]) if len(sys.argv) > 3 else 400
+    rng = random.Random(2019)
+    rosters = [make_roster(rng, players) for _ in range(roster_count)]
+    names = [[make_pbp_name(rng, roster) for _ in range(names_per_roster)] for roster in rosters]
+
+    # one matrix of distinct names against every player name, with few enough rows that scoring each pair in Python
+    # does not take minutes
+    jaro_winkler = JaroWinkler()
+    rows = sorted({name.lower() for roster_names in names for name in roster_names})[:MATRIX_ROWS]
+    columns = sorted({name_dict['first_name'].lower() + ' ' + name_dict['last_name'].lower()
+                      for roster in rosters for name_dict in roster.values()})
+    t0 = time.perf_counter()
+    pair_scores = [[(jaro_winkler.similarity(row, column),
+                     SequenceMatcher(a=row, b=column).find_longest_match(0, len(row), 0, len(column)).size)
+                    for column in columns] for row in rows]
+    pair_time = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    similarities = batch_similarity.jaro_winkler_matrix(rows, columns)
+    lengths = batch_similarity.longest_common_substring_matrix(rows, columns)
+    matrix_time = time.perf_counter() - t0
+    matrix_differences = sum(1 for i, row_scores in enumerate(pair_scores) for j, (similarity, length) in
+                             enumerate(row_scores) if similarities[i, j] != similarity or lengths[i, j] != length)
+    print('{pairs} pairs, {differences} differences'.format(pairs=len(rows) * len(columns),
+                                                             differences=matrix_differences))
+    print('  pair by pair: {seconds:7.3f} s'.format(seconds=pair_time))
+    print('         batch: {seconds:7.3f} s, {speedup:.1f}x'.format(seconds=matrix_time,
+                                                                    speedup=pair_time / matrix_time))
+
+    t0 = time.perf_counter()
+    before = [[data_utils.get_player_id_from_name(name, roster) for name in roster_names]
+              for roster, roster_names in zip(rosters, names)]
+    before_time = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    after = [batch_similarity.match_roster(roster_names, roster) for roster, roster_names in zip(rosters, names)]
+    after_time = time.perf_counter() - t0
+    match_differences = sum(1 for before_results, after_results in zip(before, after)
+                            for before_result, after_result in zip(before_results, after_results)
+                            if before_result != after_result)
+    print('{matches} names against {rosters} rosters, {differences} differences'
+          .format(matches=roster_count * names_per_roster, rosters=roster_count, differences=match_differences))
+    print('get_player_id_from_name: {seconds:7.3f} s'.format(seconds=before_time))
+    print('           match_roster: {seconds:7.3f} s, {speedup:.1f}x'.format(seconds=after_time,
+                                                                             speedup=before_time / after_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark the csv and binary COPY formats for box score lines, the biggest load in the copiers. Generated pitching
+lines are encoded both ways, and with --database they are also copied into temporary tables in the ncaa_baseball
+database, so the time the server spends parsing them is included. Run this file from the repository root with:
+python -m benchmarks.copy_format_benchmark [rows] [--database]
+
+@author: Kevin Kelly
+"""
+import random
+import sys
+import time
+
+from database_files import binary_copy
+from database_files import ncaa_database
+from database_files.ncaa_database import NCAADatabase
+
+TABLE = 'pitching_line'
+
+
+def make_rows(rows: int) -> list:
+    """
+    Make pitching lines the way copy_box_score_lines does: ids, then int stats with a float for innings pitched and a
+    few missing stats.
+    """
+    rng = random.Random(2019)
+    columns = list(binary_copy.get_table_columns(TABLE))
+    lines = []
+    for line_number in range(rows):
+        stats = []
+        for column in columns[2:]:
+            if column == 'ip':
+                stats.append('{innings}.{outs}'.format(innings=rng.randrange(10), outs=rng.randrange(3)))
+            elif rng.random() < 0.05:
+                stats.append(None)
+            else:
+                stats.append(rng.randrange(2) if column in ('app', 'gs', 'w', 'l', 'sv', 'cg', 'sho') else
+                             rng.randrange(120))
+        # the lines of a game are next to each other, about 25 of them per game
+        lines.append((line_number // 25 + 1, rng.randrange(1, 200000)) + tuple(stats))
+    return lines
+
+
+def read_all(stream) -> int:
+    """
+    Read a copy stream the way COPY does, a block at a time.
+
+    :return: the number of characters or bytes read
+    """
+    size = 0
+    while True:
+        block = stream.read(ncaa_database.COPY_READ_SIZE)
+        if not block:
+            return size
+        size += len(block)
+
+
+def main():
+    """
+    Time encoding, and copying if asked, in both formats.
+
+    :return: None
+    """
+    arguments = [argument for argument in sys.argv[1:] if argument != '--database']
+    rows = int(arguments[0]) if arguments else 200000
+    lines = make_rows(rows)
+    columns = list(binary_copy.get_table_columns(TABLE))
+
+    t0 = time.perf_counter()
+    csv_size = read_all(ncaa_database._CopyStream(lines, columns))
+    csv_time = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    binary_size = read_all(binary_copy.BinaryCopyStream(TABLE, columns, lines))
+    binary_time = time.perf_counter() - t0
+    print('Encoding {rows} {table} rows'.format(rows=rows, table=TABLE))
+    print('   csv: {seconds:7.3f} s, {size:7.1f} MB'.format(seconds=csv_time, size=csv_size / 1e6))
+    print('binary: {seconds:7.3f} s, {size:7.1f} MB'.format(seconds=binary_time, size=binary_size / 1e6))
+
+    if '--database' not in sys.argv:
+        return
+    column_string = ', '.join(columns)
+    with NCAADatabase() as database:
+        database.cursor.execute('CREATE TEMP TABLE csv_benchmark (LIKE {table}); '
+                                'CREATE TEMP TABLE binary_benchmark (LIKE {table});'.format(table=TABLE))
+        t0 = time.perf_counter()
+        database.cursor.copy_expert("COPY csv_benchmark({columns}) FROM STDIN delimiter ',' NULL AS '' CSV HEADER"
+                                    .format(columns=column_string), ncaa_database._CopyStream(lines, columns),
+                                    size=ncaa_database.COPY_READ_SIZE)
+        csv_copy_time = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        database.cursor.copy_expert('COPY binary_benchmark({columns}) FROM STDIN WITH (FORMAT binary)'
+                                    .format(columns=column_string),
+                                    binary_copy.BinaryCopyStream(TABLE, columns, lines),
+                                    size=ncaa_database.COPY_READ_SIZE)
+        binary_copy_time = time.perf_counter() - t0
+        database.cursor.execute('SELECT count(*) FROM (SELECT * FROM csv_benchmark '
+                                'EXCEPT ALL SELECT * FROM binary_benchmark) AS differences')
+        differences = database.cursor.fetchone()[0]
+    print('Copying {rows} rows, {differences} differences'.format(rows=rows, differences=differences))
+    print('   csv: {seconds:7.3f} s'.format(seconds=csv_copy_time))
+    print('binary: {seconds:7.3f} s, {speedup:.1f}x'.format(seconds=binary_copy_time,
+                                                            speedup=csv_copy_time / binary_copy_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""
+Benchmark matching play by play names to roster players, comparing data_utils.get_player_id_from_name with a
+RosterNameMatcher built once per roster and with a NameResolutionCache, and check that all of them give the same result
+for every name. The cache is timed twice, the second time loading what the first run saved, like a later run over the
+same season. Rosters and names are generated so this runs without scraped data. Run this file from the repository root
+with:
+python -m benchmarks.name_matcher_benchmark [rosters] [players per roster] [names per roster]
+
+@author: Kevin Kelly
+"""
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+
+from jmu_baseball_utils import data_utils
+from jmu_baseball_utils.name_matcher import NameResolutionCache, RosterNameMatcher
+
+FIRST_NAMES = ['Jake', 'Ryan', 'Tyler', 'Matt', 'Chris', 'Nick', 'Kyle', 'Josh', 'Zach', 'Brandon', 'Justin', 'Cole',
+               'Connor', 'Will', 'Jack', 'Luke', 'Logan', 'Austin', 'Hunter', 'Trey', 'Mason', 'Carter', 'Evan', 'Sam']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Miller', 'Davis', 'Garcia', 'Rodriguez', 'Wilson',
+              'Martinez', 'Anderson', 'Taylor', 'Thomas', 'Moore', 'Jackson', 'Martin', 'Lee', 'Thompson', 'White',
+              'Harris', 'Clark', 'Lewis', 'Robinson', 'Walker', 'Young', 'Allen', 'King', 'Wright', 'Scott']
+
+
+def make_roster(rng: random.Random, players: int) -> dict:
+    """
+    Make a roster dict in the format get_player_id_from_name takes.
+    """
+    return {rng.randrange(1000000, 9999999): {'first_name': rng.choice(FIRST_NAMES),
+                                              'last_name': rng.choice(LAST_NAMES)}
+            for _ in range(players)}
+
+
+def make_pbp_name(rng: random.Random, roster: dict) -> str:
+    """
+    Make a name the way they show up in play by play: a last name, an initial and last name, a full name, a typo, or
+    just a jersey number.
+    """
+    name_dict = rng.choice(list(roster.values()))
+    first, last = name_dict['first_name'], name_dict['last_name']
+    style = rng.randrange(6)
+    if style == 0:
+        return last.upper()
+    if style == 1:
+        return '{initial}. {last}'.format(initial=first[0], last=last)
+    if style == 2:
+        return '{last},{initial}'.format(last=last, initial=first[0])
+    if style == 3:
+        return first + ' ' + last
+    if style == 4:
+        typo = rng.randrange(len(last))
+        return last[:typo] + rng.choice(string.ascii_lowercase) + last[typo + 1:]
+    return '#{number}'.format(number=rng.randrange(1, 60))
+
+
+def time_cache(cache: NameResolutionCache, rosters: list, names: list) -> tuple:
+    """
+    Resolve every name through a cache, going through the rosters in turn the way games alternate between teams.
+
+    :return: a list of the results for each roster, and the number of seconds it took
+    """
+    results = [[] for _ in rosters]
+    t0 = time.perf_counter()
+    for name_index in range(len(names[0]) if names else 0):
+        for team, (roster, roster_names) in enumerate(zip(rosters, names)):
+            results[team].append(cache.get_player_id_from_name(team, roster_names[name_index], roster))
+    return results, time.perf_counter() - t0
+
+
+def main():
+    """
+    Time each way of matching the same names and report any name where they differ.
+
+    :return: None
+    """
+    roster_count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    players = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    names_per_roster = int(sys.argv[3]) if len(sys.argv) > 3 else 400
+    rng = random.Random(2019)
+    rosters = [make_roster(rng, players) for _ in range(roster_count)]
+    names = [[make_pbp_name(rng, roster) for _ in range(names_per_roster)] for roster in rosters]
+
+    t0 = time.perf_counter()
+    before = [[data_utils.get_player_id_from_name(name, roster) for name in roster_names]
+              for roster, roster_names in zip(rosters, names)]
+    before_time = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    after = []
+    for roster, roster_names in zip(rosters, names):
+        matcher = RosterNameMatcher(roster)
+        after.append([matcher.match(name) for name in roster_names])
+    after_time = time.perf_counter() - t0
+
+    with tempfile.TemporaryDirectory() as directory:
+        file_name = os.path.join(directory, 'name_resolutions.csv')
+        first_cache = NameResolutionCache(file_name)
+        cached, cached_time = time_cache(first_cache, rosters, names)
+        first_cache.save()
+        second_cache = NameResolutionCache(file_name)
+        reloaded, reloaded_time = time_cache(second_cache, rosters, names)
+
+    differences = 0
+    for roster_names, before_results, *other_results in zip(names, before, after, cached, reloaded):
+        for name, before_result, *other_result in zip(roster_names, before_results, *other_results):
+            for after_result in other_result:
+                if before_result != after_result:
+                    differences += 1
+                    print('{name}: {before} before, {after} after'.format(name=name, before=before_result,
+                                                                          after=after_result))
+    matches = roster_count * names_per_roster
+    print('{matches} names against {rosters} rosters of {players} players, {differences} differences'
+          .format(matches=matches, rosters=roster_count, players=players, differences=differences))
+    print('get_player_id_from_name: {seconds:7.3f} s, {per_name:8.1f} us per name'
+          .format(seconds=before_time, per_name=before_time / matches * 1e6))
+    print('      RosterNameMatcher: {seconds:7.3f} s, {per_name:8.1f} us per name, {speedup:.1f}x'
+          .format(seconds=after_time, per_name=after_time / matches * 1e6, speedup=before_time / after_time))
+    for name, seconds, cache in [('NameResolutionCache', cached_time, first_cache),
+                                 ('saved cache', reloaded_time, second_cache)]:
+        print('{name:>23}: {seconds:7.3f} s, {per_name:8.1f} us per name, {speedup:.1f}x'
+              .format(name=name, seconds=seconds, per_name=seconds / matches * 1e6, speedup=before_time / seconds))
+        cache.print_stats()
+
+
+if __name__ == '__main__':
+    main()
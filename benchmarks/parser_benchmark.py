@@ -0,0 +1,77 @@
+"""
+Benchmark the html parser backends on pages stored in the page cache. Each page is parsed and its tables are read the
+same way the box score and play by play scrapers read them. Run a scrape with the page cache enabled first, then run
+this file from the repository root with: python -m benchmarks.parser_benchmark [max_pages]
+
+@author: Kevin Kelly
+"""
+import glob
+import gzip
+import os
+import sys
+import time
+
+from jmu_baseball_utils import html_parsers
+from jmu_baseball_utils import page_cache
+
+
+def load_cached_pages(max_pages: int) -> list:
+    """
+    Load the text of pages from the page cache.
+
+    :param max_pages: the maximum number of pages to load
+    :return: a list of page texts
+    """
+    object_file_names = sorted(glob.glob(os.path.join(page_cache.get_cache_directory(), 'objects', '*', '*.html.gz')))
+    pages = []
+    for object_file_name in object_file_names[:max_pages]:
+        with gzip.open(object_file_name, 'rb') as object_file:
+            pages.append(object_file.read().decode('utf-8'))
+    return pages
+
+
+def read_tables(page) -> list:
+    """
+    Read every stat table on a page into lists of cell text.
+
+    :param page: the parsed page
+    :return: a list of tables, each a list of rows, each a list of cell text
+    """
+    return [[[col.text.strip() for col in row.select('td')] for row in table.select('tr')]
+            for table in page.select('.mytable')]
+
+
+def main():
+    """
+    Time each available parser backend on the cached pages and check that each one reads the same tables as
+    'html.parser'.
+
+    :return: None
+    """
+    max_pages = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    pages = load_cached_pages(max_pages)
+    if not pages:
+        print('No cached pages found in {}, run a scrape with the page cache first'
+              .format(page_cache.get_cache_directory()))
+        return
+    print('{num_pages} cached pages, {num_mb:.1f} MB'.format(num_pages=len(pages),
+                                                              num_mb=sum(len(page) for page in pages) / 1e6))
+
+    expected_tables = None
+    baseline_time = None
+    for backend in html_parsers.get_available_backends():
+        t0 = time.time()
+        tables = [read_tables(html_parsers.parse(page, backend)) for page in pages]
+        elapsed = time.time() - t0
+        if expected_tables is None:
+            expected_tables = tables
+            baseline_time = elapsed
+        mismatches = sum(1 for table, expected in zip(tables, expected_tables) if table != expected)
+        print('{backend:>12}: {total:7.2f} seconds, {per_page:6.2f} ms per page, {speedup:5.2f}x, '
+              '{mismatches} pages differ from html.parser'
+              .format(backend=backend, total=elapsed, per_page=elapsed / len(pages) * 1000,
+                      speedup=baseline_time / elapsed, mismatches=mismatches))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark the per call cost of the path and year info helpers that run inside the scrapers' loops, comparing the cached
+versions in file_utils and data_utils with the uncached versions they replaced. Run this file from the repository root
+with: python -m benchmarks.path_benchmark [calls]
+
+@author: Kevin Kelly
+"""
+import os
+import pathlib
+import sys
+import time
+
+import unicodecsv
+
+from jmu_baseball_utils import data_utils
+from jmu_baseball_utils import file_utils
+
+
+def uncached_get_path(file_path: str) -> str:
+    """
+    get_path before it was cached.
+    """
+    dir_path = pathlib.Path(file_utils.__file__).parent.absolute()
+    path = os.path.join(dir_path, file_path)
+
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+
+def uncached_get_year_info(year: int) -> dict:
+    """
+    get_year_info before it was cached.
+    """
+    file_name = file_utils.get_year_info_file_name()
+    with open(file_name, 'rb') as file:
+        reader = unicodecsv.DictReader(file)
+        for line in reader:
+            if year == int(line['year']):
+                return line
+    return {}
+
+
+def time_calls(function: callable, calls: int) -> float:
+    """
+    Time a function.
+
+    :param function: a function that takes no arguments
+    :param calls: the number of times to call it
+    :return: the average number of microseconds per call
+    """
+    t0 = time.perf_counter()
+    for _ in range(calls):
+        function()
+    return (time.perf_counter() - t0) / calls * 1e6
+
+
+def main():
+    """
+    Time each helper before and after caching and check that both return the same thing.
+
+    :return: None
+    """
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    scrape_path = '../scraped-data/2019/division_1/'
+    cases = [('get_path', lambda: uncached_get_path(scrape_path), lambda: file_utils.get_path(scrape_path)),
+             ('get_year_info', lambda: uncached_get_year_info(2019), lambda: data_utils.get_year_info(2019))]
+    for name, before, after in cases:
+        if before() != after():
+            print('{name}: cached and uncached results differ'.format(name=name))
+        before_time = time_calls(before, calls)
+        after_time = time_calls(after, calls)
+        print('{name:>14}: {before:8.2f} us before, {after:8.2f} us after, {speedup:7.1f}x'
+              .format(name=name, before=before_time, after=after_time, speedup=before_time / after_time))
+
+
+if __name__ == '__main__':
+    main()
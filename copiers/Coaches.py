@@ -26,7 +26,7 @@ def copy_coaches(database: NCAADatabase, year, division):
     # get new coaches from this year and division
     new_coaches = []
     coach_file_name = file_utils.get_scrape_file_name(year, division, 'coaches')
-    with open(coach_file_name, 'rb') as coach_file:
+    with file_utils.open_scrape_file(coach_file_name, 'rb') as coach_file:
         coach_reader = unicodecsv.DictReader(coach_file)
         for coach in coach_reader:
             if coach['coach_name'] != '':
@@ -26,7 +26,7 @@ def copy_conferences(database: NCAADatabase, year, division):
     # get new conferences from this year and division
     new_conferences = []
     conference_file_name = file_utils.get_scrape_file_name(year, division, 'conferences')
-    with open(conference_file_name, 'rb') as conference_file:
+    with file_utils.open_scrape_file(conference_file_name, 'rb') as conference_file:
         conference_reader = unicodecsv.DictReader(conference_file)
         for conference in conference_reader:
             if 'Independent' in conference['conference_name']:
@@ -9,6 +9,7 @@ import re
 import unicodecsv
 
 from jmu_baseball_utils import file_utils
+from jmu_baseball_utils import scrape_records
 from copiers import rosters
 from copiers import school_name_changes
 from database_files.ncaa_database import NCAADatabase
@@ -32,7 +33,7 @@ def copy_game_info(database: NCAADatabase, year, division):
     database_teams = {team['school_name']: team['team_id'] for team in
                       database.get_all_team_info() if team['year'] == year}
     
-    database_games = {game['ncaa_id']: game for game in database.get_all_game_info()}
+    database_games = {game['ncaa_id']: game for game in database.iter_all_game_info()}
     
     new_games = []
     
@@ -40,54 +41,54 @@ def copy_game_info(database: NCAADatabase, year, division):
     new_teams = 0
     
     game_info_file_name = file_utils.get_scrape_file_name(year, division, 'game_info')
-    with open(game_info_file_name, 'rb') as game_info_file:
-        game_info_reader = unicodecsv.DictReader(game_info_file)
-        for game in game_info_reader:
-            ncaa_id = int(game['game_id'])
-            if ncaa_id in database_games:
-                continue
-            if game['away_school_name'] in school_name_changes.school_name_changes:
-                game['away_school_name'] = school_name_changes.school_name_changes[game['away_school_name']]
-            elif game['home_school_name'] in school_name_changes.school_name_changes:
-                game['home_school_name'] = school_name_changes.school_name_changes[game['home_school_name']]
+    for game in scrape_records.read_records(game_info_file_name, scrape_records.GameInfo):
+        ncaa_id = game.game_id
+        if ncaa_id in database_games:
+            continue
+        away_school_name = game.away_school_name
+        home_school_name = game.home_school_name
+        if away_school_name in school_name_changes.school_name_changes:
+            away_school_name = school_name_changes.school_name_changes[away_school_name]
+        elif home_school_name in school_name_changes.school_name_changes:
+            home_school_name = school_name_changes.school_name_changes[home_school_name]
+        try:
+            away_team_id = database_teams[away_school_name]
+        except KeyError:
             try:
-                away_team_id = database_teams[game['away_school_name']]
+                away_school_id = database_schools[away_school_name]
             except KeyError:
-                try:
-                    away_school_id = database_schools[game['away_school_name']]
-                except KeyError:
-                    away_school_id = database.add_school(game['away_school_name'])
-                    database_schools.update({game['away_school_name']: away_school_id})
-                    new_schools += 1
-                away_team_id = database.create_team(year, away_school_id)
-                database_teams.update({game['away_school_name']: away_team_id})
-                new_teams += 1
+                away_school_id = database.add_school(away_school_name)
+                database_schools.update({away_school_name: away_school_id})
+                new_schools += 1
+            away_team_id = database.create_team(year, away_school_id)
+            database_teams.update({away_school_name: away_team_id})
+            new_teams += 1
+        try:
+            home_team_id = database_teams[home_school_name]
+        except KeyError:
             try:
-                home_team_id = database_teams[game['home_school_name']]
+                home_school_id = database_schools[home_school_name]
             except KeyError:
-                try:
-                    home_school_id = database_schools[game['home_school_name']]
-                except KeyError:
-                    home_school_id = database.add_school(game['home_school_name'])
-                    database_schools.update({game['home_school_name']: home_school_id})
-                    new_schools += 1
-                home_team_id = database.create_team(year, home_school_id)
-                database_teams.update({game['home_school_name']: home_team_id})
-                new_teams += 1
-            
-            match = re.search(r'\d{2}/\d{2}/\d{4}', game['date'])
-            date = datetime.strptime(match.group(), '%m/%d/%Y').date()
-            
-            location = game['location']
-            
-            attendance = game['attendance'].replace(',', '')
-            
-            new_games.append({'ncaa_id': ncaa_id,
-                              'away_team_id': away_team_id,
-                              'home_team_id': home_team_id,
-                              'date': date,
-                              'location': location,
-                              'attendance': attendance})
+                home_school_id = database.add_school(home_school_name)
+                database_schools.update({home_school_name: home_school_id})
+                new_schools += 1
+            home_team_id = database.create_team(year, home_school_id)
+            database_teams.update({home_school_name: home_team_id})
+            new_teams += 1
+        
+        match = re.search(r'\d{2}/\d{2}/\d{4}', game.date)
+        date = datetime.strptime(match.group(), '%m/%d/%Y').date()
+        
+        location = game.location
+        
+        attendance = game.attendance.replace(',', '')
+        
+        new_games.append({'ncaa_id': ncaa_id,
+                          'away_team_id': away_team_id,
+                          'home_team_id': home_team_id,
+                          'date': date,
+                          'location': location,
+                          'attendance': attendance})
     database.copy_expert('game(ncaa_id, away_team_id, home_team_id, date, location, attendance)',
                          'game_info', header, new_games)
     
@@ -106,16 +107,16 @@ def copy_game_innings(database: NCAADatabase, year, division):
     """
     print('Copying innings... ', end='')
     database_schools = {school['name']: school['ncaa_id'] for school in database.get_all_schools()}
-    database_games = {game['ncaa_id']: game['id'] for game in database.get_all_game_info()}
+    database_games = {game['ncaa_id']: game['id'] for game in database.iter_all_game_info()}
     database_teams = {team['school_ncaa_id']: team['team_id'] for team in
                       database.get_all_team_info() if team['year'] == year}
     
-    database_innings = {(inning['game_id'], inning['team_id']): None for
-                        inning in database.get_all_innings()}
+    # innings already in the database are skipped by the upsert, only repeats in the file are skipped here
+    copied_innings = set()
 
     new_innings = []
     inning_file_name = file_utils.get_scrape_file_name(year, division, 'game_innings')
-    with open(inning_file_name, 'rb') as inning_file:
+    with file_utils.open_scrape_file(inning_file_name, 'rb') as inning_file:
         reader = unicodecsv.reader(inning_file)
         next(reader)  # skip header
         for line in reader:
@@ -129,7 +130,7 @@ def copy_game_innings(database: NCAADatabase, year, division):
                     line[3] = school_name_changes.school_name_changes[line[3]]
                 school_id = database_schools[line[3]]
                 team_id = database_teams[school_id]
-            if (game_id, team_id) in database_innings:
+            if (game_id, team_id) in copied_innings:
                 continue
 
             inning_num = 1
@@ -140,12 +141,11 @@ def copy_game_innings(database: NCAADatabase, year, division):
                                     'runs': inning})
                 inning_num += 1
             
-            database_innings.update({(game_id, team_id): None})
+            copied_innings.add((game_id, team_id))
     
-    header = ['game_id', 'team_id', 'inning', 'runs']
-    database.copy_expert('inning(game_id, team_id, inning, runs)', 'innings', header, new_innings)
+    num_innings = database.upsert('inning(game_id, team_id, inning, runs)', new_innings)
     
-    print('{num_innings} new innings.'.format(num_innings=len(new_innings)))
+    print('{num_innings} new innings.'.format(num_innings=num_innings))
 
 
 def create_game_positions(database: NCAADatabase, year, division):
@@ -161,9 +161,9 @@ def create_game_positions(database: NCAADatabase, year, division):
     
     positions = ['1b', '2b', '3b', 'ss', 'lf', 'cf', 'rf', 'dh', 'dp', 'ph', 'pr', 'p', 'c']
     
-    database_games = {game['ncaa_id']: game['id'] for game in database.get_all_game_info()}
+    database_games = {game['ncaa_id']: game['id'] for game in database.iter_all_game_info()}
     
-    all_players = {player['ncaa_id']: player['player_id'] for player in database.get_all_players()}
+    all_players = {player['ncaa_id']: player['player_id'] for player in database.iter_all_players()}
     
     database_rosters = {roster['ncaa_id']: roster['roster_id'] for roster in
                         database.get_year_roster_info(year)}
@@ -175,8 +175,8 @@ def create_game_positions(database: NCAADatabase, year, division):
     database_teams = {team['school_name']: team['team_id'] for team in database.get_all_team_info()
                       if team['year'] == year}
     
-    database_game_positions = {(game_position['game_id'], game_position['roster_id']): None for
-                               game_position in database.get_all_game_position_info()}
+    # positions already in the database are skipped by the upsert, only repeats in the file are skipped here
+    copied_game_positions = set()
 
     box_score_file_name = file_utils.get_scrape_file_name(year, division, 'box_score_fielding')
     
@@ -188,85 +188,80 @@ def create_game_positions(database: NCAADatabase, year, division):
     
     unknown_schools = set()
     
-    with open(box_score_file_name, 'rb') as box_score_file:
-        reader = unicodecsv.DictReader(box_score_file)
-        for line in reader:
-            if line['Player'] == 'Totals':
+    # the totals rows are skipped by the reader
+    for line in scrape_records.read_box_score_lines(box_score_file_name, ['pos'], convert_stats=False):
+        game_id = database_games[line.game_id]
+        try:
+            roster_id = database_rosters[line.player_id]
+        except KeyError:
+            school_name = line.school_name
+            if school_name in school_name_changes.school_name_changes:
+                school_name = school_name_changes.school_name_changes[school_name]
+            last_name = line.player.split(',', 1)[0].strip()
+            if last_name == '':
+                no_names += 1
                 continue
-            game_id = database_games[int(line['game_id'])]
             try:
-                roster_id = database_rosters[int(line['player_id'])]
-            except (ValueError, KeyError):
-                if line['school_name'] in school_name_changes.school_name_changes:
-                    line['school_name'] = school_name_changes.school_name_changes[line['school_name']]
-                last_name = line['Player'].split(',', 1)[0].strip()
-                if last_name == '':
-                    no_names += 1
-                    continue
-                try:
-                    first_name = line['Player'].split(',', 1)[1].strip()
-                except IndexError:
-                    first_name = 'N/A'
-                try:
-                    roster_id = all_players_by_name.get((first_name, last_name, database_teams[line['school_name']]))
-                    if roster_id is None:
-                        if line['player_id'] != '' and int(line['player_id']) in all_players:
-                            roster_id = rosters.create_roster(database, all_players[int(line['player_id'])],
-                                                              database_teams[line['school_name']])
-                            database_rosters.update({int(line['player_id']): roster_id})
-                            all_players_by_name.update({(first_name, last_name,
-                                                         database_teams[line['school_name']]): roster_id})
-                            new_rosters += 1
-                        else:
-                            player_id, roster_id = \
-                                rosters.add_player_and_create_roster(database, first_name, last_name, line['player_id'],
-                                                                     database_teams[line['school_name']])
-                            all_players_by_name.update({(first_name, last_name,
-                                                         database_teams[line['school_name']]): roster_id})
-                            if line['player_id'] != '':
-                                database_rosters.update({int(line['player_id']): roster_id})
-                                all_players.update({int(line['player_id']): player_id})
-                            new_players += 1
-                            new_rosters += 1
-                except KeyError:
-                    unknown_schools.update({(line['school_name'], line['school_id'])})
-                    continue
-            if (game_id, roster_id) in database_game_positions:
+                first_name = line.player.split(',', 1)[1].strip()
+            except IndexError:
+                first_name = 'N/A'
+            try:
+                roster_id = all_players_by_name.get((first_name, last_name, database_teams[school_name]))
+                if roster_id is None:
+                    if line.player_id is not None and line.player_id in all_players:
+                        roster_id = rosters.create_roster(database, all_players[line.player_id],
+                                                          database_teams[school_name])
+                        database_rosters.update({line.player_id: roster_id})
+                        all_players_by_name.update({(first_name, last_name, database_teams[school_name]): roster_id})
+                        new_rosters += 1
+                    else:
+                        player_id, roster_id = \
+                            rosters.add_player_and_create_roster(database, first_name, last_name, line.player_id,
+                                                                 database_teams[school_name])
+                        all_players_by_name.update({(first_name, last_name, database_teams[school_name]): roster_id})
+                        if line.player_id is not None:
+                            database_rosters.update({line.player_id: roster_id})
+                            all_players.update({line.player_id: player_id})
+                        new_players += 1
+                        new_rosters += 1
+            except KeyError:
+                unknown_schools.update({(school_name, line.school_id)})
                 continue
-            player_positions = []
-            position_string = line['Pos'].lower()
-            if position_string == '':
-                player_positions.append('n/a')
-            else:
-                # Gets all positions a player played in a game by removing positions from the
-                # position string one by one. For instance a position_string that looks like
-                # 'prlf' will return ['pr', 'lf'].
-                for position in positions:
-                    position_string = re.subn(position, '', position_string)
-                    if position_string[1] > 0:
-                        # designated hitter is written as dp or designated player in some box scores
-                        if position == 'dp':
-                            player_positions.append('dh')
-                        else:
-                            player_positions.append(position)
-                    position_string = position_string[0]  # gets the old position string without
-                    # the position we just found
-                    # if the position string is empty or contains just a slash all positions have
-                    # been found
-                    if position_string == '' or position_string == '/':
-                        break
+        if (game_id, roster_id) in copied_game_positions:
+            continue
+        player_positions = []
+        position_string = (line.stats[0] or '').lower()
+        if position_string == '':
+            player_positions.append('n/a')
+        else:
+            # Gets all positions a player played in a game by removing positions from the
+            # position string one by one. For instance a position_string that looks like
+            # 'prlf' will return ['pr', 'lf'].
+            for position in positions:
+                position_string = re.subn(position, '', position_string)
+                if position_string[1] > 0:
+                    # designated hitter is written as dp or designated player in some box scores
+                    if position == 'dp':
+                        player_positions.append('dh')
+                    else:
+                        player_positions.append(position)
+                position_string = position_string[0]  # gets the old position string without
+                # the position we just found
+                # if the position string is empty or contains just a slash all positions have
+                # been found
+                if position_string == '' or position_string == '/':
+                    break
 
-            for position in player_positions:
-                new_positions.append({'game_id': game_id,
-                                      'roster_id': roster_id,
-                                      'position': position})
-            database_game_positions.update({(game_id, roster_id): None})
-    header = ['game_id', 'roster_id', 'position']
-    database.copy_expert('game_position(game_id, roster_id, position)', 'positions', header, new_positions)
+        for position in player_positions:
+            new_positions.append({'game_id': game_id,
+                                  'roster_id': roster_id,
+                                  'position': position})
+        copied_game_positions.add((game_id, roster_id))
+    num_positions = database.upsert('game_position(game_id, roster_id, position)', new_positions)
     
     print('{num_positions} position relations created. {new_players} players added. {new_rosters} roster relations '
           'created. {no_names} players with no name. {unknown_schools} unknown schools.'
-          .format(num_positions=len(new_positions), new_players=new_players, new_rosters=new_rosters,
+          .format(num_positions=num_positions, new_players=new_players, new_rosters=new_rosters,
                   no_names=no_names, unknown_schools=len(unknown_schools)))
 
 
@@ -298,14 +293,14 @@ def copy_box_score_lines(database: NCAADatabase, year, division):
                      'sf', 'sh', 'bk', 'wp', 'cg', 'sho'],
         'fielding': ['po', 'a', 'e', 'pb', 'ci', 'sb', 'cs', 'dp', 'tp']}
     
-    database_games = {game['ncaa_id']: game['id'] for game in database.get_all_game_info()}
+    database_games = {game['ncaa_id']: game['id'] for game in database.iter_all_game_info()}
     
     database_rosters = {roster['ncaa_id']: roster['roster_id'] for roster in
-                        database.get_all_roster_info() if roster['year'] == year}
+                        database.iter_all_roster_info() if roster['year'] == year}
     
     all_players_by_name = {
         (roster['first_name'], roster['last_name'], roster['team_id']): roster['roster_id'] for
-        roster in database.get_all_roster_info() if roster['year'] == year}
+        roster in database.iter_all_roster_info() if roster['year'] == year}
     
     database_teams = {team['school_name']: team['team_id'] for team in database.get_all_team_info()
                       if team['year'] == year}
@@ -313,8 +308,8 @@ def copy_box_score_lines(database: NCAADatabase, year, division):
     for stat_type in ['hitting', 'pitching', 'fielding']:
         print('Copying {stat_type} box scores... '.format(stat_type=stat_type), end='')
     
-        database_box_score_lines = {(line[0], line[1]): None for
-                                    line in database.get_all_box_score_lines(stat_type)}
+        # lines already in the database are skipped by the upsert, only repeats in the file are skipped here
+        copied_box_score_lines = set()
     
         stat_file_name = 'box_score_' + stat_type
         box_score_file_name = file_utils.get_scrape_file_name(year, division, stat_file_name)
@@ -326,89 +321,38 @@ def copy_box_score_lines(database: NCAADatabase, year, division):
     
         unknown_schools = set()
     
-        with open(box_score_file_name, 'rb') as box_score_file:
-            reader = unicodecsv.DictReader(box_score_file)
-            reader.fieldnames = [field.lower() for field in reader.fieldnames]
-            for line in reader:
-                if line['player'] == 'Totals':
+        # stats are converted while reading, a stat not kept in this year's box scores is None
+        for line in scrape_records.read_box_score_lines(box_score_file_name, ncaa_stat_headers[stat_type]):
+            game_id = database_games[line.game_id]
+            
+            roster_id = database_rosters.get(line.player_id)
+            if roster_id is None:
+                school_name = school_name_changes.school_name_changes.get(line.school_name, line.school_name)
+                last_name = line.player.split(',', 1)[0].strip()
+                if last_name == '':
+                    no_names += 1
                     continue
-
-                game_id = database_games[int(line['game_id'])]
-
                 try:
-                    roster_id = database_rosters[int(line['player_id'])]
-                except ValueError:
-                    if line['school_name'] in school_name_changes.school_name_changes:
-                        line['school_name'] = school_name_changes.school_name_changes[line['school_name']]
-                    last_name = line['player'].split(',', 1)[0].strip()
-                    if last_name == '':
-                        no_names += 1
-                        continue
-                    try:
-                        first_name = line['player'].split(',', 1)[1].strip()
-                    except IndexError:
-                        first_name = 'N/A'
-                    try:
-                        roster_id = all_players_by_name.get(
-                            (first_name, last_name, database_teams[line['school_name']]))
-                        if roster_id is None:
-                            no_roster_id += 1
-                            continue
-                    except KeyError:
-                        unknown_schools.update({(line['school_name'], line['school_id'])})
+                    first_name = line.player.split(',', 1)[1].strip()
+                except IndexError:
+                    first_name = 'N/A'
+                try:
+                    roster_id = all_players_by_name.get((first_name, last_name, database_teams[school_name]))
+                    if roster_id is None:
+                        no_roster_id += 1
                         continue
                 except KeyError:
-                    if line['school_name'] in school_name_changes.school_name_changes:
-                        line['school_name'] = school_name_changes.school_name_changes[line['school_name']]
-                    last_name = line['player'].split(',', 1)[0].strip()
-                    if last_name == '':
-                        no_names += 1
-                        continue
-                    try:
-                        first_name = line['player'].split(',', 1)[1].strip()
-                    except IndexError:
-                        first_name = 'N/A'
-                    try:
-                        roster_id = all_players_by_name.get(
-                            (first_name, last_name, database_teams[line['school_name']]))
-                        if roster_id is None:
-                            no_roster_id += 1
-                            continue
-                    except KeyError:
-                        unknown_schools.update({(line['school_name'], line['school_id'])})
-                        continue
-                
-                if (game_id, roster_id) in database_box_score_lines:
+                    unknown_schools.update({(school_name, line.school_id)})
                     continue
-                
-                player_stats = {heading: None for heading in database_stat_headers[stat_type]}
-                player_stats.update({'game_id': game_id,
-                                     'roster_id': roster_id})
-                for i, stat in enumerate(ncaa_stat_headers[stat_type]):
-                    try:
-                        if line[stat] == '' or line[stat] is None:
-                            line[stat] = 0
-                    except KeyError:
-                        # not all years have the same statistics, if that stat was not kept for
-                        # this box score then we just set the value of the statistic to None
-                        player_stats[database_stat_headers[stat_type][i]] = None
-                        continue
-                    try:
-                        player_stats[database_stat_headers[stat_type][i]] = int(line[stat])
-                    except ValueError:
-                        # sometimes stats have non-numerical characters like '-' and ',',
-                        # we remove them with this regex if the previous cast results in a
-                        # ValueError
-                        player_stats[database_stat_headers[stat_type][i]] = re.sub(r'[^\d.]', '',
-                                                                                   line[stat])
-
-                new_box_score_lines.append(player_stats)
-                database_box_score_lines.update({(game_id, roster_id): None})
+            
+            if (game_id, roster_id) in copied_box_score_lines:
+                continue
+            
+            new_box_score_lines.append((game_id, roster_id) + line.stats)
+            copied_box_score_lines.add((game_id, roster_id))
     
-        header = ['game_id', 'roster_id'] + database_stat_headers[stat_type]
-        database.copy_expert('{stat_type}_line(game_id, roster_id, {stat_headings})'.format(
-            stat_type=stat_type, stat_headings=', '.join(database_stat_headers[stat_type])),
-            'box_score_{stat_type}'.format(stat_type=stat_type), header, new_box_score_lines)
+        num_lines = database.upsert('{stat_type}_line(game_id, roster_id, {stat_headings})'.format(
+            stat_type=stat_type, stat_headings=', '.join(database_stat_headers[stat_type])), new_box_score_lines)
     
         print('{num_lines} new lines. {no_name} players with no name. {unknown_schools} unknown schools.'
-              .format(num_lines=len(new_box_score_lines), no_name=no_names, unknown_schools=len(unknown_schools)))
+              .format(num_lines=num_lines, no_name=no_names, unknown_schools=len(unknown_schools)))
@@ -3,9 +3,8 @@ This file adds all players to the database and creates roster relations.
 
 @author: Kevin Kelly
 """
-import unicodecsv
-
 from jmu_baseball_utils import file_utils
+from jmu_baseball_utils import scrape_records
 from database_files.ncaa_database import NCAADatabase
 
 
@@ -21,39 +20,36 @@ def copy_players(database: NCAADatabase, year, division):
     print('Copying players... ', end='')
     
     all_players_by_ncaa_id = {player['ncaa_id']: player['player_id'] for player in
-                              database.get_all_players()}
+                              database.iter_all_players()}
     
     new_players = []
     roster_file_name = file_utils.get_scrape_file_name(year, division, 'rosters')
-    with open(roster_file_name, 'rb') as roster_file:
-        reader = unicodecsv.DictReader(roster_file)
-        for line in reader:
-            try:
-                ncaa_id = int(line['player_id'])
-            except ValueError:
-                continue
-            if ncaa_id in all_players_by_ncaa_id:
-                continue
-            
-            # names are scraped in the format 'last_name, first_name'
-            first_name = line['player_name'].split(',', 1)[1].strip()
-            last_name = line['player_name'].split(',', 1)[0].strip()
-            
-            # some players have empty names, I chose to ignore them
-            if last_name == '':
-                continue
-            
-            # null values are not allowed for first names so if they have a last name I still add
-            # them to the database and change their first name to 'N/A'
-            if first_name == '':
-                first_name = 'N/A'
-            
-            all_players_by_ncaa_id.update(
-                {ncaa_id: None})  # necessary because of some silly duplicates
-            
-            new_players.append({'ncaa_id': ncaa_id,
-                                'first_name': first_name,
-                                'last_name': last_name})
+    for line in scrape_records.read_records(roster_file_name, scrape_records.RosterLine):
+        ncaa_id = line.player_id
+        if ncaa_id is None:
+            continue
+        if ncaa_id in all_players_by_ncaa_id:
+            continue
+        
+        # names are scraped in the format 'last_name, first_name'
+        first_name = line.player_name.split(',', 1)[1].strip()
+        last_name = line.player_name.split(',', 1)[0].strip()
+        
+        # some players have empty names, I chose to ignore them
+        if last_name == '':
+            continue
+        
+        # null values are not allowed for first names so if they have a last name I still add
+        # them to the database and change their first name to 'N/A'
+        if first_name == '':
+            first_name = 'N/A'
+        
+        all_players_by_ncaa_id.update(
+            {ncaa_id: None})  # necessary because of some silly duplicates
+        
+        new_players.append({'ncaa_id': ncaa_id,
+                            'first_name': first_name,
+                            'last_name': last_name})
     
     header = ['ncaa_id', 'first_name', 'last_name']
     database.copy_expert('player(ncaa_id, first_name, last_name)', 'players', header, new_players)
@@ -73,7 +69,7 @@ def create_rosters(database: NCAADatabase, year, division):
     print('Creating rosters... ', end='')
     
     all_players_by_ncaa_id = {player['ncaa_id']: player['player_id'] for player in
-                              database.get_all_players()}
+                              database.iter_all_players()}
     
     # all teams from this year
     year_teams_by_ncaa_id = {team['school_ncaa_id']: team['team_id'] for team in
@@ -82,35 +78,33 @@ def create_rosters(database: NCAADatabase, year, division):
                           database.get_all_team_info() if team['year'] == year}
     
     database_roster_rows = {(roster['team_id'], roster['player_id']): roster['ncaa_id'] for roster
-                            in database.get_all_roster_info()}
+                            in database.iter_all_roster_info()}
     
     player_class_map = {'fr': 'freshman', 'so': 'sophomore', 'jr': 'junior', 'sr': 'senior',
                         'n/a': 'n/a'}
     new_roster_rows = []
     roster_file_name = file_utils.get_scrape_file_name(year, division, 'rosters')
-    with open(roster_file_name, 'rb') as roster_file:
-        reader = unicodecsv.DictReader(roster_file)
-        for line in reader:
-            try:
-                player_ncaa_id = int(line['player_id'])
-                player_id = all_players_by_ncaa_id[player_ncaa_id]
-            except (KeyError, ValueError):
-                continue
-            try:
-                team_id = year_teams_by_ncaa_id[int(line['school_id'])]
-            except KeyError:
-                team_id = year_teams_by_name[line['school_name']]
-            
-            # skip if the player is already in the database
-            if (team_id, player_id) in database_roster_rows:
-                continue
-            
-            database_roster_rows.update({(team_id, player_id): player_ncaa_id})
-            
-            player_class = player_class_map[line['class'].lower()]
-            new_roster_rows.append({'team_id': team_id,
-                                    'player_id': player_id,
-                                    'class': player_class})
+    for line in scrape_records.read_records(roster_file_name, scrape_records.RosterLine):
+        player_ncaa_id = line.player_id
+        try:
+            player_id = all_players_by_ncaa_id[player_ncaa_id]
+        except KeyError:
+            continue
+        try:
+            team_id = year_teams_by_ncaa_id[line.school_id]
+        except KeyError:
+            team_id = year_teams_by_name[line.school_name]
+        
+        # skip if the player is already in the database
+        if (team_id, player_id) in database_roster_rows:
+            continue
+        
+        database_roster_rows.update({(team_id, player_id): player_ncaa_id})
+        
+        player_class = player_class_map[line.player_class.lower()]
+        new_roster_rows.append({'team_id': team_id,
+                                'player_id': player_id,
+                                'class': player_class})
     
     header = ['team_id', 'player_id', 'class']
     database.copy_expert('roster(team_id, player_id, class)', 'rosters', header, new_roster_rows)
@@ -68,7 +68,7 @@ def add_nicknames_and_urls(database: NCAADatabase, year, division):
     new_schools = []
 
     school_file_name = file_utils.get_scrape_file_name(year, division, 'team_info')
-    with open(school_file_name, 'rb') as school_file:
+    with file_utils.open_scrape_file(school_file_name, 'rb') as school_file:
         school_reader = unicodecsv.DictReader(school_file)
         for school in school_reader:
             if school['school_name'] in school_name_changes.school_name_changes:
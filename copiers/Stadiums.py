@@ -24,7 +24,7 @@ def copy_stadiums(database: NCAADatabase, year, division):
     # get new stadiums from this year and division
     new_stadiums = []
     stadium_file_name = file_utils.get_scrape_file_name(year, division, 'stadiums')
-    with open(stadium_file_name, 'rb') as stadium_file:
+    with file_utils.open_scrape_file(stadium_file_name, 'rb') as stadium_file:
         stadium_reader = unicodecsv.DictReader(stadium_file)
         for stadium in stadium_reader:
             if stadium['stadium_name'] != '' and stadium['stadium_name'] not in database_stadiums:
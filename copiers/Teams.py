@@ -45,7 +45,7 @@ def create_teams(database: NCAADatabase, year, division):
     
     team_coaches = {}
     coach_file_name = file_utils.get_scrape_file_name(year, division, 'coaches')
-    with open(coach_file_name, 'rb') as coach_file:
+    with file_utils.open_scrape_file(coach_file_name, 'rb') as coach_file:
         coach_reader = unicodecsv.DictReader(coach_file)
         for coach in coach_reader:
             if coach['coach_id'] == '':
@@ -55,14 +55,14 @@ def create_teams(database: NCAADatabase, year, division):
     
     team_stadiums = {}
     stadiums_file_name = file_utils.get_scrape_file_name(year, division, 'stadiums')
-    with open(stadiums_file_name, 'rb') as stadiums_file:
+    with file_utils.open_scrape_file(stadiums_file_name, 'rb') as stadiums_file:
         stadiums_reader = unicodecsv.DictReader(stadiums_file)
         for stadium in stadiums_reader:
             team_stadiums.update({int(stadium['school_id']): stadium['stadium_name']})
     
     new_teams = []
     team_file_name = file_utils.get_scrape_file_name(year, division, 'conference_teams')
-    with open(team_file_name, 'rb') as team_file:
+    with file_utils.open_scrape_file(team_file_name, 'rb') as team_file:
         team_reader = unicodecsv.DictReader(team_file)
         for team in team_reader:
             school_ncaa_id = int(team['school_id'])
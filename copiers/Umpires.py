@@ -18,7 +18,7 @@ def copy_umpires(database: NCAADatabase, year, division):
     :return: None
     """
     print('Copying umpires... ', end='')
-    database_games = {game['ncaa_id']: game['id'] for game in database.get_all_game_info()}
+    database_games = {game['ncaa_id']: game['id'] for game in database.iter_all_game_info()}
     
     database_umpires = {(umpire['first_name'], umpire['last_name']): umpire['id'] for
                         umpire in database.get_all_umpires()}
@@ -28,7 +28,7 @@ def copy_umpires(database: NCAADatabase, year, division):
     game_info_file_name = file_utils.get_scrape_file_name(year, division, 'game_info')
     
     new_umpires = []
-    with open(game_info_file_name, 'rb') as game_info_file:
+    with file_utils.open_scrape_file(game_info_file_name, 'rb') as game_info_file:
         reader = unicodecsv.DictReader(game_info_file)
         for game in reader:
             if database_games[int(game['game_id'])] in database_umpire_games:
@@ -65,7 +65,7 @@ def create_umpire_games(database: NCAADatabase, year, division):
     :return: None
     """
     print('Copying umpires... ', end='')
-    database_games = {game['ncaa_id']: game['id'] for game in database.get_all_game_info()}
+    database_games = {game['ncaa_id']: game['id'] for game in database.iter_all_game_info()}
     
     database_umpires = {(umpire['first_name'], umpire['last_name']): umpire['id'] for
                         umpire in database.get_all_umpires()}
@@ -74,7 +74,7 @@ def create_umpire_games(database: NCAADatabase, year, division):
 
     game_info_file_name = file_utils.get_scrape_file_name(year, division, 'game_info')
     new_umpire_games = []
-    with open(game_info_file_name, 'rb') as game_info_file:
+    with file_utils.open_scrape_file(game_info_file_name, 'rb') as game_info_file:
         reader = unicodecsv.DictReader(game_info_file)
         
         for game in reader:
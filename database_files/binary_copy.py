@@ -0,0 +1,315 @@
+"""
+Encode rows in PostgreSQL's binary COPY format, so the server reads each value directly instead of parsing it from csv
+text. The type of each column is read from the table's file in table-definitions, and the enum types from
+type-definitions are sent as their labels. The table definitions also give each table's unique constraint, which the
+database's upserts use to skip rows that are already loaded.
+"""
+import datetime
+import io
+import itertools
+import operator
+import os
+import re
+import struct
+
+from jmu_baseball_utils import file_utils
+
+SIGNATURE = b'PGCOPY\n\xff\r\n\x00'
+HEADER = SIGNATURE + struct.pack('!ii', 0, 0)  # no flags and no header extension
+TRAILER = struct.pack('!h', -1)
+NULL = struct.pack('!i', -1)
+POSTGRES_EPOCH = datetime.date(2000, 1, 1)
+BATCH_ROWS = 1000  # rows encoded at a time
+ENCODED_VALUES = 4096  # encoded values kept by each column's encoder
+CONSTRAINT_WORDS = {'UNIQUE', 'PRIMARY', 'FOREIGN', 'CHECK', 'CONSTRAINT', 'EXCLUDE'}
+
+_table_definitions = {}  # table name -> ({column name: type name}, unique columns), read from the table definitions
+_enum_types = None  # names of the types in type-definitions
+
+
+def get_table_columns(table: str) -> dict:
+    """
+    Get the type of every column of a table from its definition in table-definitions.
+
+    :param table: the table name, such as 'hitting_line'
+    :return: a dict of column names to lower case type names, in the order they are defined
+    """
+    return _read_table_definition(table)[0]
+
+
+def get_unique_columns(table: str) -> list:
+    """
+    Get the columns of a table's unique constraint from its definition in table-definitions: the first UNIQUE (...)
+    constraint, or else the first column declared UNIQUE.
+
+    :param table: the table name, such as 'hitting_line'
+    :return: a list of the column names, or None if the table has no unique constraint
+    """
+    return _read_table_definition(table)[1]
+
+
+def _read_table_definition(table: str) -> tuple:
+    """
+    Read the columns and the unique constraint of a table from its CREATE TABLE statement.
+    """
+    if table not in _table_definitions:
+        with open(file_utils.get_path('../database_files/table-definitions/{table}.sql'.format(table=table)),
+                  encoding='utf-8') as definition_file:
+            definition = re.sub(r'--.*', '', definition_file.read())
+        body = definition[definition.index('(') + 1:definition.rindex(')')]
+        columns = {}
+        unique_columns = None
+        unique_column = None
+        for column_definition in _split_columns(body):
+            words = column_definition.split()
+            if not words:
+                continue
+            if words[0].upper() in CONSTRAINT_WORDS:
+                if words[0].upper() == 'UNIQUE' and unique_columns is None:
+                    unique_columns = [column.strip().lower() for column in
+                                      column_definition[column_definition.index('(') + 1:
+                                                        column_definition.rindex(')')].split(',')]
+                continue
+            column_type = words[1].lower()
+            if column_type == 'double' and len(words) > 2 and words[2].lower() == 'precision':
+                column_type = 'double precision'
+            columns[words[0].lower()] = re.sub(r'\(.*', '', column_type)
+            if unique_column is None and 'UNIQUE' in (word.upper() for word in words[2:]):
+                unique_column = words[0].lower()
+        if unique_columns is None and unique_column is not None:
+            unique_columns = [unique_column]
+        _table_definitions[table] = (columns, unique_columns)
+    return _table_definitions[table]
+
+
+def get_encoders(table: str, column_names: list) -> list:
+    """
+    Get the encoder of each column.
+
+    :param table: the table name
+    :param column_names: the columns being copied, in the order of each row's values
+    :return: a list of FieldEncoders
+    """
+    columns = get_table_columns(table)
+    encoders = []
+    for column_name in column_names:
+        column_type = columns.get(column_name.lower())
+        if column_type is None:
+            raise ValueError('{table} has no column {column}'.format(table=table, column=column_name))
+        encoders.append(_get_encoder(column_type))
+    return encoders
+
+
+class FieldEncoder(dict):
+    """
+    Encodes the values of one column into length prefixed binary fields. Box score columns are mostly the same few
+    small numbers and the rows of a game are next to each other, so encoded values are kept in the dict and looking one
+    up skips encoding it again. Columns of mostly unique values, like play by play text, keep nothing.
+    """
+
+    def __init__(self, encode: callable, max_size: int) -> None:
+        """
+        :param encode: the function that encodes a value
+        :param max_size: the most encoded values to keep
+        """
+        super().__init__()
+        self.encode = encode
+        self.max_size = max_size
+
+    def __missing__(self, value) -> bytes:
+        field = self.encode(value)
+        if self.max_size:
+            # starting over when full keeps the values that are common now, like the ids of the current game
+            if len(self) >= self.max_size:
+                self.clear()
+            self[value] = field
+        return field
+
+
+def encode_row(encoders: list, row) -> bytes:
+    """
+    Encode one row.
+
+    :param encoders: the encoder of each column, from get_encoders
+    :param row: a tuple of the row's values, in the same order as the encoders
+    :return: the encoded row
+    """
+    return struct.pack('!h', len(encoders)) + b''.join(map(operator.getitem, encoders, row))
+
+
+class BinaryCopyStream:
+    """
+    A file-like object for COPY ... FORMAT binary to read from, that encodes rows from an iterator as they are read.
+    """
+
+    def __init__(self, table: str, column_names: list, data) -> None:
+        """
+        :param table: the table name
+        :param column_names: the columns being copied
+        :param data: an iterable of dicts with the column names as keys, or an iterable of tuples with values in the
+        same order as column_names
+        """
+        self.encoders = get_encoders(table, column_names)
+        self.column_names = column_names
+        self.rows = iter(data)
+        self.buffer = io.BytesIO()
+        self.buffer.write(HEADER)
+        self.finished = False
+
+    def read(self, size: int = -1) -> bytes:
+        """
+        Read up to size bytes, encoding more rows first if the buffer has fewer than that.
+
+        :param size: the most bytes to read, or -1 to read everything that is left
+        :return: the bytes read, empty once every row and the trailer have been read
+        """
+        while not self.finished and (size < 0 or self.buffer.tell() < size):
+            batch = list(itertools.islice(self.rows, BATCH_ROWS))
+            if batch and isinstance(batch[0], dict):
+                batch = [[row[column_name] for column_name in self.column_names] for row in batch]
+            encoders = self.encoders
+            row_header = struct.pack('!h', len(encoders))
+            self.buffer.write(b''.join([row_header + b''.join(map(operator.getitem, encoders, row)) for row in batch]))
+            if len(batch) < BATCH_ROWS:
+                self.buffer.write(TRAILER)
+                self.finished = True
+        data = self.buffer.getvalue()
+        if 0 <= size < len(data):
+            data, rest = data[:size], data[size:]
+        else:
+            rest = b''
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        self.buffer.write(rest)
+        return data
+
+
+def parse_table_string(table_string: str) -> tuple:
+    """
+    Split a copy_expert table string into the table name and its columns.
+
+    :param table_string: a table name with its columns, in the format table_name(column1, column2)
+    :return: the table name and a list of the column names, which is every column in the table definition if the
+    table string does not list them
+    """
+    match = re.fullmatch(r'\s*(\w+)\s*(?:\((.*)\))?\s*', table_string)
+    if match is None:
+        raise ValueError('Cannot read the table string {table_string}'.format(table_string=table_string))
+    table = match.group(1)
+    if match.group(2) is None:
+        return table, list(get_table_columns(table))
+    return table, [column.strip() for column in match.group(2).split(',')]
+
+
+def _split_columns(body: str) -> list:
+    """
+    Split the body of a CREATE TABLE statement on the commas that are not inside parentheses.
+    """
+    column_definitions = []
+    depth = 0
+    start = 0
+    for index, character in enumerate(body):
+        if character == '(':
+            depth += 1
+        elif character == ')':
+            depth -= 1
+        elif character == ',' and depth == 0:
+            column_definitions.append(body[start:index])
+            start = index + 1
+    column_definitions.append(body[start:])
+    return column_definitions
+
+
+def _get_enum_types() -> set:
+    """
+    Get the names of the enum types in type-definitions.
+    """
+    global _enum_types
+    if _enum_types is None:
+        _enum_types = set()
+        type_directory = file_utils.get_path('../database_files/type-definitions/')
+        for type_file_name in sorted(os.listdir(type_directory)):
+            with open(os.path.join(type_directory, type_file_name), encoding='utf-8') as type_file:
+                _enum_types.update(name.lower() for name in re.findall(r'CREATE TYPE (\w+) AS ENUM', type_file.read(),
+                                                                       flags=re.IGNORECASE))
+    return _enum_types
+
+
+def _get_encoder(column_type: str) -> FieldEncoder:
+    """
+    Get the encoder of a column type. None and empty strings are NULL, the same as NULL AS '' in the csv copies.
+    """
+    if column_type in ('int', 'integer', 'int4', 'serial'):
+        return FieldEncoder(_encode_int, ENCODED_VALUES)
+    if column_type in ('smallint', 'int2'):
+        return FieldEncoder(_encode_smallint, ENCODED_VALUES)
+    if column_type in ('bigint', 'int8', 'bigserial'):
+        return FieldEncoder(_encode_bigint, ENCODED_VALUES)
+    if column_type in ('float', 'float8', 'double precision'):
+        return FieldEncoder(_encode_float, ENCODED_VALUES)
+    if column_type in ('real', 'float4'):
+        return FieldEncoder(_encode_real, ENCODED_VALUES)
+    if column_type in ('boolean', 'bool'):
+        return FieldEncoder(_encode_bool, ENCODED_VALUES)
+    if column_type == 'date':
+        return FieldEncoder(_encode_date, ENCODED_VALUES)
+    if column_type in _get_enum_types():
+        return FieldEncoder(_encode_text, ENCODED_VALUES)
+    if column_type in ('text', 'varchar', 'char', 'character'):
+        return FieldEncoder(_encode_text, 0)
+    raise ValueError('Binary copies do not support the column type {column_type}'.format(column_type=column_type))
+
+
+def _encode_int(value, pack=struct.Struct('!ii').pack) -> bytes:
+    if value is None or value == '':
+        return NULL
+    return pack(4, int(value))
+
+
+def _encode_smallint(value, pack=struct.Struct('!ih').pack) -> bytes:
+    if value is None or value == '':
+        return NULL
+    return pack(2, int(value))
+
+
+def _encode_bigint(value, pack=struct.Struct('!iq').pack) -> bytes:
+    if value is None or value == '':
+        return NULL
+    return pack(8, int(value))
+
+
+def _encode_float(value, pack=struct.Struct('!id').pack) -> bytes:
+    if value is None or value == '':
+        return NULL
+    return pack(8, float(value))
+
+
+def _encode_real(value, pack=struct.Struct('!if').pack) -> bytes:
+    if value is None or value == '':
+        return NULL
+    return pack(4, float(value))
+
+
+def _encode_bool(value, pack=struct.Struct('!i?').pack) -> bytes:
+    if value is None or value == '':
+        return NULL
+    if isinstance(value, str):
+        value = value.strip().lower() in ('t', 'true', 'y', 'yes', 'on', '1')
+    return pack(1, bool(value))
+
+
+def _encode_date(value, pack=struct.Struct('!ii').pack) -> bytes:
+    if value is None or value == '':
+        return NULL
+    if isinstance(value, datetime.datetime):
+        value = value.date()
+    elif isinstance(value, str):
+        value = datetime.date.fromisoformat(value.strip())
+    return pack(4, (value - POSTGRES_EPOCH).days)
+
+
+def _encode_text(value, pack=struct.Struct('!i').pack) -> bytes:
+    if value is None or value == '':
+        return NULL
+    encoded = str(value).encode('utf-8')
+    return pack(len(encoded)) + encoded
@@ -1,15 +1,39 @@
 """
 File containing the NCAADatabase class, which has numerous methods for contacting the postgres database.
+
+The database keeps a pool of connections. Each thread that uses the database gets its own connection and cursor from
+the pool the first time it runs a query, so copiers and analysis running in different threads do not share a cursor.
+A thread keeps its connection until it returns it, so worker threads should run their queries inside
+database.task(), which returns the connection when the work is done. A thread that needs a connection while every
+connection is checked out waits up to connection_timeout seconds for one and then raises psycopg2.pool.PoolError.
+By default the pool has a single connection, so a thread that has used the database outside of task(), like the main
+thread of a copier, keeps every other thread waiting until it releases its connection. The connection of a thread
+that ended without returning it is taken back when another thread is waiting for one.
 """
+import csv
+import io
+import itertools
 import os
 import sys
+import threading
+from contextlib import contextmanager
 
 import psycopg2
-import unicodecsv
+import psycopg2.pool
 
+from database_files import binary_copy
 from jmu_baseball_utils import file_utils
 
 DEFAULT_CONFERENCE_NAME = 'Other'
+DEFAULT_MIN_CONNECTIONS = 1  # connections opened when the database is entered
+DEFAULT_MAX_CONNECTIONS = 1  # connections open at once, one per thread using the database
+DEFAULT_CONNECTION_TIMEOUT = 60  # seconds a thread waits for a connection before giving up
+DEFAULT_ITERSIZE = 10000  # rows fetched at a time by a server side cursor
+
+COPY_READ_SIZE = 64 * 1024  # characters of csv or bytes of binary data handed to COPY at a time
+COPY_BATCH_ROWS = 1000  # rows written to the csv buffer at a time
+
+_cursor_numbers = itertools.count()  # makes every server side cursor name unique
 
 
 class NCAADatabase:
@@ -17,20 +41,39 @@ class NCAADatabase:
     NCAADatabase class, to be used with a with statement.
     """
     
+    def __init__(self, min_connections: int = DEFAULT_MIN_CONNECTIONS,
+                 max_connections: int = DEFAULT_MAX_CONNECTIONS,
+                 connection_timeout: float = DEFAULT_CONNECTION_TIMEOUT):
+        """
+        Set up the database, the connections are opened by the with statement.
+
+        :param min_connections: the number of connections to open right away
+        :param max_connections: the most connections to have open at once, and so the most threads that can use the
+        database at once
+        :param connection_timeout: the seconds a thread waits for a connection when every connection is checked out
+        """
+        self.max_connections = max(1, max_connections)
+        self.min_connections = max(1, min(min_connections, self.max_connections))
+        self.connection_timeout = connection_timeout
+        self.pool = None
+        self.local = threading.local()
+        self.available_connections = threading.BoundedSemaphore(self.max_connections)
+        self.thread_connections = {}  # thread -> the connection it has checked out
+        self.thread_connections_lock = threading.Lock()
+    
     def __enter__(self):
         """
-        Connect to the database and return the database object with a connection generated by psycopg2.
+        Connect to the database and return the database object with a pool of connections generated by psycopg2.
 
         :return: the database object
         """
         try:
-            self.connection = psycopg2.connect(user=os.getenv('NCAABaseballUser'),
-                                               password=os.getenv('NCAABaseballPassword'),
-                                               host='localhost',
-                                               port=5432,
-                                               database='ncaa_baseball')
-            self.connection.autocommit = True
-            self.cursor = self.connection.cursor()
+            self.pool = psycopg2.pool.ThreadedConnectionPool(self.min_connections, self.max_connections,
+                                                             user=os.getenv('NCAABaseballUser'),
+                                                             password=os.getenv('NCAABaseballPassword'),
+                                                             host='localhost',
+                                                             port=5432,
+                                                             database='ncaa_baseball')
             return self
         except psycopg2.Error as error:
             print("Error while connecting to ncaa_baseball, make sure your environment variables are "
@@ -39,10 +82,103 @@ class NCAADatabase:
     
     def __exit__(self, exc_type, exc_value, traceback):
         """
-        Close the connection to the database.
+        Close every connection to the database.
+        :return: None
+        """
+        self.pool.closeall()
+    
+    @property
+    def connection(self):
+        """
+        The current thread's connection, checked out from the pool the first time the thread uses it.
+        """
+        if getattr(self.local, 'connection', None) is None:
+            self._check_out_connection()
+        return self.local.connection
+    
+    @property
+    def cursor(self):
+        """
+        The current thread's cursor.
+        """
+        if getattr(self.local, 'connection', None) is None:
+            self._check_out_connection()
+        return self.local.cursor
+    
+    @contextmanager
+    def task(self):
+        """
+        Use a connection for one task in the current thread, returning it to the pool when the task is done so
+        another thread can use it. If the thread already has a connection, it keeps it.
+
+        :return: the database object
+        """
+        had_connection = getattr(self.local, 'connection', None) is not None
+        try:
+            yield self
+        finally:
+            if not had_connection:
+                self.release_connection()
+    
+    def release_connection(self):
+        """
+        Return the current thread's connection to the pool, if it has one.
+
+        :return: None
+        """
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            return
+        self.local.connection = None
+        self.local.cursor.close()
+        self.local.cursor = None
+        with self.thread_connections_lock:
+            self.thread_connections.pop(threading.current_thread(), None)
+        # a connection in the middle of a failed transaction is closed instead of being handed to another thread
+        self.pool.putconn(connection, close=connection.closed or
+                          connection.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE)
+        self.available_connections.release()
+    
+    def _check_out_connection(self):
+        """
+        Check out a connection from the pool for the current thread, waiting for one if they are all in use. A
+        connection that was closed or lost since it was last used is replaced with a new one.
+
+        :return: None
+        """
+        if not self.available_connections.acquire(blocking=False):
+            self._reclaim_connections()
+            if not self.available_connections.acquire(timeout=self.connection_timeout):
+                raise psycopg2.pool.PoolError('No connection was returned to the pool within {timeout} seconds, '
+                                              'threads using the database should run their queries in '
+                                              'database.task()'.format(timeout=self.connection_timeout))
+        try:
+            connection = self.pool.getconn()
+            if not _is_healthy(connection):
+                self.pool.putconn(connection, close=True)
+                connection = self.pool.getconn()
+            connection.autocommit = True
+            self.local.connection = connection
+            self.local.cursor = connection.cursor()
+        except psycopg2.Error:
+            self.available_connections.release()
+            raise
+        with self.thread_connections_lock:
+            self.thread_connections[threading.current_thread()] = connection
+    
+    def _reclaim_connections(self):
+        """
+        Close the connections of threads that ended without returning them, so their places in the pool can be used
+        again.
+
         :return: None
         """
-        self.connection.close()
+        with self.thread_connections_lock:
+            ended_threads = [thread for thread in self.thread_connections if not thread.is_alive()]
+            connections = [self.thread_connections.pop(thread) for thread in ended_threads]
+        for connection in connections:
+            self.pool.putconn(connection, close=True)
+            self.available_connections.release()
     
     def get_year_info(self, year):
         """
@@ -188,14 +324,18 @@ class NCAADatabase:
         :return: a list of player dicts
         """
         
-        self.cursor.execute('SELECT id, ncaa_id, first_name, last_name '
-                            'FROM player;')
-        players = []
-        for row in self.cursor:
-            players.append({'player_id': row[0], 'ncaa_id': row[1], 'first_name': row[2],
-                            'last_name': row[3]})
+        return list(self.iter_all_players())
+    
+    def iter_all_players(self, itersize=DEFAULT_ITERSIZE):
+        """
+        Get all players from the database, streamed from a server side cursor.
+        :param itersize: the number of rows fetched from the server at a time
+        :return: an iterator of player dicts
+        """
         
-        return players
+        for row in self.iterate('SELECT id, ncaa_id, first_name, last_name '
+                                'FROM player;', itersize=itersize):
+            yield {'player_id': row[0], 'ncaa_id': row[1], 'first_name': row[2], 'last_name': row[3]}
     
     def get_all_roster_info(self):
         """
@@ -203,18 +343,22 @@ class NCAADatabase:
         :return: A list of roster dicts
         """
         
-        self.cursor.execute('SELECT roster.id, roster.team_id, roster.player_id, roster.class, '
-                            'player.ncaa_id, player.first_name, player.last_name, team.year '
-                            'FROM roster '
-                            '    JOIN player ON roster.player_id = player.id '
-                            '    JOIN team ON roster.team_id = team.id;')
-        roster_rows = []
-        for row in self.cursor:
-            roster_rows.append({'roster_id': row[0], 'team_id': row[1], 'player_id': row[2],
-                                'class': row[3], 'ncaa_id': row[4], 'first_name': row[5],
-                                'last_name': row[6], 'year': row[7]})
+        return list(self.iter_all_roster_info())
+    
+    def iter_all_roster_info(self, itersize=DEFAULT_ITERSIZE):
+        """
+        Get all roster information from the database, joins the player table, streamed from a server side cursor.
+        :param itersize: the number of rows fetched from the server at a time
+        :return: an iterator of roster dicts
+        """
         
-        return roster_rows
+        for row in self.iterate('SELECT roster.id, roster.team_id, roster.player_id, roster.class, '
+                                'player.ncaa_id, player.first_name, player.last_name, team.year '
+                                'FROM roster '
+                                '    JOIN player ON roster.player_id = player.id '
+                                '    JOIN team ON roster.team_id = team.id;', itersize=itersize):
+            yield {'roster_id': row[0], 'team_id': row[1], 'player_id': row[2], 'class': row[3],
+                   'ncaa_id': row[4], 'first_name': row[5], 'last_name': row[6], 'year': row[7]}
     
     def get_year_roster_info(self, year):
         """
@@ -243,14 +387,19 @@ class NCAADatabase:
         :return: a list of game dicts
         """
         
-        self.cursor.execute('SELECT id, ncaa_id, away_team_id, home_team_id, date, location, attendance '
-                            'FROM game;')
-        games = []
-        for row in self.cursor:
-            games.append({'id': row[0], 'ncaa_id': row[1], 'away_team_id': row[2], 'home_team_id': row[3],
-                          'date': row[4], 'location': row[5], 'attendance': row[6]})
+        return list(self.iter_all_game_info())
+    
+    def iter_all_game_info(self, itersize=DEFAULT_ITERSIZE):
+        """
+        Get all games in the game table, streamed from a server side cursor.
+        :param itersize: the number of rows fetched from the server at a time
+        :return: an iterator of game dicts
+        """
         
-        return games
+        for row in self.iterate('SELECT id, ncaa_id, away_team_id, home_team_id, date, location, attendance '
+                                'FROM game;', itersize=itersize):
+            yield {'id': row[0], 'ncaa_id': row[1], 'away_team_id': row[2], 'home_team_id': row[3],
+                   'date': row[4], 'location': row[5], 'attendance': row[6]}
     
     def get_all_innings(self):
         """
@@ -258,13 +407,18 @@ class NCAADatabase:
         :return: a list of inning dicts
         """
         
-        self.cursor.execute('SELECT game_id, team_id, inning, runs '
-                            'FROM inning')
-        innings = []
-        for row in self.cursor:
-            innings.append({'game_id': row[0], 'team_id': row[1], 'inning': row[2], 'runs': row[3]})
+        return list(self.iter_all_innings())
+    
+    def iter_all_innings(self, itersize=DEFAULT_ITERSIZE):
+        """
+        Get all inning run totals in the database, streamed from a server side cursor.
+        :param itersize: the number of rows fetched from the server at a time
+        :return: an iterator of inning dicts
+        """
         
-        return innings
+        for row in self.iterate('SELECT game_id, team_id, inning, runs '
+                                'FROM inning', itersize=itersize):
+            yield {'game_id': row[0], 'team_id': row[1], 'inning': row[2], 'runs': row[3]}
     
     def get_all_game_position_info(self):
         """
@@ -272,13 +426,18 @@ class NCAADatabase:
         :return: a list of game position dicts
         """
         
-        self.cursor.execute('SELECT game_id, roster_id, position '
-                            'FROM game_position;')
-        game_positions = []
-        for row in self.cursor:
-            game_positions.append({'game_id': row[0], 'roster_id': row[1], 'position': row[2]})
+        return list(self.iter_all_game_position_info())
+    
+    def iter_all_game_position_info(self, itersize=DEFAULT_ITERSIZE):
+        """
+        Get all game position relations from the game_position table, streamed from a server side cursor.
+        :param itersize: the number of rows fetched from the server at a time
+        :return: an iterator of game position dicts
+        """
         
-        return game_positions
+        for row in self.iterate('SELECT game_id, roster_id, position '
+                                'FROM game_position;', itersize=itersize):
+            yield {'game_id': row[0], 'roster_id': row[1], 'position': row[2]}
     
     def get_all_box_score_lines(self, stat_type):
         """
@@ -287,13 +446,18 @@ class NCAADatabase:
         :return: a list of box score line lists with game_id and roster_id in positions 0 and 1
         """
         
-        self.cursor.execute('SELECT * '
-                            'FROM {stat_type}_line'.format(stat_type=stat_type))
-        box_score_lines = []
-        for row in self.cursor:
-            box_score_lines.append(row)
+        return list(self.iter_all_box_score_lines(stat_type))
+    
+    def iter_all_box_score_lines(self, stat_type, itersize=DEFAULT_ITERSIZE):
+        """
+        Get all box score lines from the stat_type_line table of this stat type, streamed from a server side cursor.
+        :param stat_type: the stat type of this table (hitting, pitching, or fielding)
+        :param itersize: the number of rows fetched from the server at a time
+        :return: an iterator of box score line tuples with game_id and roster_id in positions 0 and 1
+        """
         
-        return box_score_lines
+        return self.iterate('SELECT * '
+                            'FROM {stat_type}_line'.format(stat_type=stat_type), itersize=itersize)
     
     def get_all_umpires(self):
         """
@@ -333,38 +497,125 @@ class NCAADatabase:
         :return: a list of play by play dicts
         """
         
-        self.cursor.execute('SELECT game_id, team_id, inning, side, ord, text, pitches '
-                            'FROM play_by_play;')
-        pbp = []
-        for row in self.cursor:
-            pbp.append({'game_id': row[0], 'team_id': row[1], 'inning': row[2], 'side': row[3],
-                        'ord': row[4], 'text': row[5], 'pitches': row[6]})
+        return list(self.iter_all_play_by_play())
+    
+    def iter_all_play_by_play(self, itersize=DEFAULT_ITERSIZE):
+        """
+        Get all play by play text and information from the database, streamed from a server side cursor.
+        :param itersize: the number of rows fetched from the server at a time
+        :return: an iterator of play by play dicts
+        """
         
-        return pbp
+        for row in self.iterate('SELECT game_id, team_id, inning, side, ord, text, pitches '
+                                'FROM play_by_play;', itersize=itersize):
+            yield {'game_id': row[0], 'team_id': row[1], 'inning': row[2], 'side': row[3],
+                   'ord': row[4], 'text': row[5], 'pitches': row[6]}
     
-    def copy_expert(self, table_string, data_type, file_header, data):
+    def iterate(self, query, parameters=None, itersize=DEFAULT_ITERSIZE):
         """
-        Copy data to the database using a csv file as an intermediary.
+        Run a query on a named server side cursor and iterate through its rows, so only itersize rows are in memory at
+        a time no matter how big the result is. The cursor is declared WITH HOLD since the connection is in autocommit
+        mode, and it is closed once the rows run out or the iterator is closed.
+        :param query: the sql query
+        :param parameters: the query parameters, if any
+        :param itersize: the number of rows fetched from the server at a time
+        :return: an iterator of row tuples
+        """
+        
+        cursor = self.connection.cursor(name='ncaa_stream_{number}'.format(number=next(_cursor_numbers)),
+                                        withhold=True)
+        cursor.itersize = itersize
+        try:
+            cursor.execute(query, parameters)
+            for row in cursor:
+                yield row
+        finally:
+            cursor.close()
+    
+    def copy_expert(self, table_string, data_type, file_header, data, keep_file=False):
+        """
+        Copy data to the database, streaming it to COPY as csv rows. The rows are written into memory only as COPY reads
+        them, so data can be an iterator and nothing is written to disk unless keep_file is set.
         :param table_string: the table to copy to, including column names if applicable in the format
         table_name(column1, column2)
-        :param data_type: the type of the data, such as 'conferences' or 'box_score_hitting' to create
-        and copy
-        :param file_header: the header of the csv file
-        :param data: the data to copy that will be inserted into the csv file via a csv dictwriter.
-        This data must be a list of dicts
+        :param data_type: the type of the data, such as 'conferences' or 'box_score_hitting', which names the kept
+        csv file
+        :param file_header: the header of the csv
+        :param data: the data to copy that will be written as csv rows via a csv writer.
+        This data must be an iterable of dicts, or an iterable of tuples with values in the same order as file_header
+        :param keep_file: also write the csv to the file from file_utils.get_copy_file_name, for debugging
         :return: None
         """
         
-        copy_file_name = file_utils.get_copy_file_name(data_type)
-        with open(copy_file_name, 'wb') as copy_file:
-            writer = unicodecsv.DictWriter(copy_file, file_header)
-            writer.writeheader()
-            writer.writerows(data)
-            copy_file.flush()
+        copy_file = None
+        if keep_file:
+            copy_file = open(file_utils.get_copy_file_name(data_type), 'w', encoding='utf-8', newline='')
+        try:
+            self.cursor.copy_expert("COPY {table_string} from STDIN delimiter ',' NULL AS '' "
+                                    "CSV HEADER".format(table_string=table_string),
+                                    _CopyStream(data, file_header, copy_file), size=COPY_READ_SIZE)
+        finally:
+            if copy_file is not None:
+                copy_file.close()
+        self.connection.commit()
+    
+    def copy_binary(self, table_string, data):
+        """
+        Copy data to the database in the binary COPY format, so the server does not have to parse every value from
+        text. The column types come from the table definitions in table-definitions. Used for the biggest tables,
+        where most values are integers.
+        :param table_string: the table to copy to, including column names if applicable in the format
+        table_name(column1, column2)
+        :param data: an iterable of dicts with the column names as keys, or an iterable of tuples with values in the
+        same order as the columns
+        :return: None
+        """
         
-        self.cursor.copy_expert("COPY {table_string} from STDIN delimiter ',' NULL AS '' "
-                                "CSV HEADER".format(table_string=table_string), open(copy_file_name))
+        table, column_names = binary_copy.parse_table_string(table_string)
+        self.cursor.copy_expert('COPY {table}({columns}) FROM STDIN WITH (FORMAT binary)'
+                                .format(table=table, columns=', '.join(column_names)),
+                                binary_copy.BinaryCopyStream(table, column_names, data), size=COPY_READ_SIZE)
+        self.connection.commit()
+    
+    def upsert(self, table_string, data):
+        """
+        Copy data to the database, skipping rows that are already in the table. The rows are copied in the binary
+        format into a temporary staging table, then inserted from it with ON CONFLICT DO NOTHING on the table's unique
+        constraint from table-definitions. The database finds the rows that already exist, so the copiers do not have
+        to read the whole table first, and loading a season takes the same time no matter how much is already loaded.
+        :param table_string: the table to copy to, including column names if applicable in the format
+        table_name(column1, column2)
+        :param data: an iterable of dicts with the column names as keys, or an iterable of tuples with values in the
+        same order as the columns
+        :return: the number of rows inserted
+        """
+        
+        table, column_names = binary_copy.parse_table_string(table_string)
+        unique_columns = binary_copy.get_unique_columns(table)
+        if unique_columns is None:
+            raise ValueError('{table} has no unique constraint to upsert on'.format(table=table))
+        # pg_temp makes sure only a temporary table is ever created or dropped, never a permanent one with the same name
+        staging_table = 'pg_temp.{table}_staging'.format(table=table)
+        columns = ', '.join(column_names)
+        # a temporary table belongs to this thread's connection and is never written to the write ahead log
+        self.cursor.execute('DROP TABLE IF EXISTS {staging_table}; '
+                            'CREATE TEMP TABLE {staging_table} AS SELECT {columns} FROM {table} WITH NO DATA;'
+                            .format(staging_table=staging_table, columns=columns, table=table))
+        try:
+            self.cursor.copy_expert('COPY {staging_table}({columns}) FROM STDIN WITH (FORMAT binary)'
+                                    .format(staging_table=staging_table, columns=columns),
+                                    binary_copy.BinaryCopyStream(table, column_names, data), size=COPY_READ_SIZE)
+            self.cursor.execute('INSERT INTO {table}({columns}) '
+                                'SELECT {columns} '
+                                'FROM {staging_table} '
+                                'ON CONFLICT ({unique_columns}) DO NOTHING;'
+                                .format(table=table, columns=columns, staging_table=staging_table,
+                                        unique_columns=', '.join(unique_columns)))
+            inserted = self.cursor.rowcount
+        finally:
+            self.cursor.execute('DROP TABLE IF EXISTS {staging_table};'.format(staging_table=staging_table))
         self.connection.commit()
+        return inserted
     
     def add_school(self, school_name, school_ncaa_id=None):
         """
@@ -780,3 +1031,71 @@ class NCAADatabase:
             pbp.append({'team_id': row[0], 'inning': row[1], 'side': row[2],
                         'ord': row[3], 'text': row[4], 'pitches': row[5]})
         return pbp
+
+
+def _is_healthy(connection) -> bool:
+    """
+    Check that a connection is still open and the server still answers it.
+    """
+    if connection.closed:
+        return False
+    try:
+        # in autocommit mode the check does not leave a transaction open
+        connection.autocommit = True
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        return True
+    except psycopg2.Error:
+        return False
+
+
+class _CopyStream:
+    """
+    A file-like object for COPY to read from, that writes csv rows from an iterator into memory as they are read. The
+    csv is written the same way the copy files used to be: a header, then dict rows through a DictWriter or tuple rows
+    through a writer.
+    """
+    
+    def __init__(self, data, file_header, copy_file=None):
+        """
+        :param data: an iterable of dicts, or an iterable of tuples with values in the same order as file_header
+        :param file_header: the header of the csv
+        :param copy_file: a text file to also write the csv to, or None
+        """
+        self.rows = iter(data)
+        first_row = next(self.rows, None)
+        self.buffer = io.StringIO()
+        if first_row is not None and not isinstance(first_row, dict):
+            self.writer = csv.writer(self.buffer)
+            self.writer.writerow(file_header)
+        else:
+            self.writer = csv.DictWriter(self.buffer, file_header)
+            self.writer.writeheader()
+        if first_row is not None:
+            self.rows = itertools.chain([first_row], self.rows)
+        self.finished = first_row is None
+        self.copy_file = copy_file
+    
+    def read(self, size=-1):
+        """
+        Read up to size characters of the csv, writing more rows first if the buffer has fewer than that.
+        :param size: the most characters to read, or -1 to read the rest of the csv
+        :return: the characters read, an empty string once every row has been read
+        """
+        while not self.finished and (size < 0 or self.buffer.tell() < size):
+            rows_written = 0
+            for row in itertools.islice(self.rows, COPY_BATCH_ROWS):
+                self.writer.writerow(row)
+                rows_written += 1
+            self.finished = rows_written < COPY_BATCH_ROWS
+        text = self.buffer.getvalue()
+        if 0 <= size < len(text):
+            text, rest = text[:size], text[size:]
+        else:
+            rest = ''
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        self.buffer.write(rest)
+        if self.copy_file is not None:
+            self.copy_file.write(text)
+        return text
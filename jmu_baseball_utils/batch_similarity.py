@@ -0,0 +1,227 @@
+"""
+Score many names against many other names at once, for matching a whole season of box score or play by play names to
+rosters. The Jaro-Winkler similarity and longest common substring of every pair in an N x M matrix are computed with
+NumPy, one character position at a time across every pair, instead of one pair at a time in Python. The scores are
+exactly the ones strsimpy's JaroWinkler and difflib's SequenceMatcher give for each pair, so the best matches are the
+same ones data_utils.get_player_id_from_name finds. Needs numpy installed.
+"""
+from typing import Iterator
+
+import numpy
+
+CHUNK_PAIRS = 250000  # number of pairs scored at once, which bounds the memory used
+JW_THRESHOLD = 0.7  # strsimpy's default, the Jaro similarity above which the common prefix adds to the score
+JW_COEFFICIENT = 0.1
+FIRST_PADDING = -1  # padding characters of the two sides of each pair, which never match anything
+SECOND_PADDING = -2
+
+
+def jaro_winkler_matrix(first: list, second: list) -> numpy.ndarray:
+    """
+    Get the Jaro-Winkler similarity of every pair of strings, the same as JaroWinkler().similarity(first[i], second[j])
+    from strsimpy.
+
+    :param first: the N strings of the rows
+    :param second: the M strings of the columns
+    :return: an N x M float array of similarities
+    """
+    return _score_matrix(first, second, _jaro_winkler)
+
+
+def longest_common_substring_matrix(first: list, second: list) -> numpy.ndarray:
+    """
+    Get the length of the longest common substring of every pair of strings, the same as the size of
+    SequenceMatcher(a=first[i], b=second[j]).find_longest_match for strings shorter than 200 characters.
+
+    :param first: the N strings of the rows
+    :param second: the M strings of the columns
+    :return: an N x M int array of lengths
+    """
+    return _score_matrix(first, second, _longest_common_substring)
+
+
+def get_best_matches(names: list, choices: list) -> list:
+    """
+    Find the best choice for each name the way data_utils.get_player_id_from_name does: the choice with the longest
+    piece of the name in common, with ties broken by the highest Jaro-Winkler similarity and then by the order of the
+    choices. Names and choices are compared in lower case.
+
+    :param names: the names to match, such as play by play or box score names
+    :param choices: the names to match them to, such as 'first last' for each player on a roster
+    :return: a list with a tuple for each name of the index of the best choice, the length of the match, and the
+    Jaro-Winkler similarity, or (None, None, None) if no choice has anything in common with the name
+    """
+    names = [name.lower() for name in names]
+    choices = [choice.lower() for choice in choices]
+    if not choices:
+        return [(None, None, None)] * len(names)
+    # the same spellings show up over and over, so each one is only scored once
+    unique_names = list(dict.fromkeys(names))
+    if not unique_names:
+        return []
+    lengths = longest_common_substring_matrix(unique_names, choices)
+    # get_player_id_from_name compares with the roster name first
+    similarities = jaro_winkler_matrix(choices, unique_names).T
+    best_lengths = lengths.max(axis=1)
+    # argmax gives the first of the highest similarities among the longest matches
+    best_choices = numpy.where(lengths == best_lengths[:, None], similarities, -1.0).argmax(axis=1)
+    best_similarities = similarities[numpy.arange(len(unique_names)), best_choices]
+    best_matches = {name: (int(choice), int(length), float(similarity)) if length > 0 else (None, None, None)
+                    for name, choice, length, similarity in zip(unique_names, best_choices, best_lengths,
+                                                                best_similarities)}
+    return [best_matches[name] for name in names]
+
+
+def match_roster(pbp_names: list, player_dict: dict) -> list:
+    """
+    Match names against a roster, giving the same result for each name as data_utils.get_player_id_from_name.
+
+    :param pbp_names: the player names extracted from play by play strings or box scores
+    :param player_dict: a dict of players formatted like this: {player_id: {'first_name': first, 'last_name': last}}
+    :return: a list with a tuple for each name of the player id of the best match, the length of that match, and the
+    jaro winkler similarity, or (None, None, None) if no player matches the name at all
+    """
+    player_ids = list(player_dict)
+    player_names = [name_dict['first_name'] + ' ' + name_dict['last_name'] for name_dict in player_dict.values()]
+    return [(player_ids[choice], length, similarity) if choice is not None else (None, None, None)
+            for choice, length, similarity in get_best_matches(pbp_names, player_names)]
+
+
+def _score_matrix(first: list, second: list, score: callable) -> numpy.ndarray:
+    """
+    Score every pair of strings, a chunk of rows at a time.
+
+    :param first: the N strings of the rows
+    :param second: the M strings of the columns
+    :param score: a function that scores the encoded pairs of a chunk
+    :return: an N x M array of scores
+    """
+    first_codes, first_lengths = _encode(first, FIRST_PADDING)
+    second_codes, second_lengths = _encode(second, SECOND_PADDING)
+    width = max(first_codes.shape[1], second_codes.shape[1])
+    # names are almost always in the first part of unicode, and comparing smaller numbers is faster
+    code_type = numpy.int16 if max(first_codes.max(), second_codes.max()) <= numpy.iinfo(numpy.int16).max \
+        else numpy.int32
+    first_codes = _pad(first_codes, width, FIRST_PADDING).astype(code_type)
+    second_codes = _pad(second_codes, width, SECOND_PADDING).astype(code_type)
+    scores = []
+    for rows in _get_row_chunks(len(first), len(second)):
+        pairs = len(rows) * len(second)
+        scores.append(score(numpy.repeat(first_codes[rows], len(second), axis=0).reshape(pairs, width),
+                            numpy.repeat(first_lengths[rows], len(second)),
+                            numpy.tile(second_codes, (len(rows), 1)),
+                            numpy.tile(second_lengths, len(rows))).reshape(len(rows), len(second)))
+    if not scores:
+        return numpy.zeros((len(first), len(second)))
+    return numpy.concatenate(scores)
+
+
+def _get_row_chunks(rows: int, columns: int) -> Iterator[range]:
+    """
+    Split the rows of a matrix into chunks of about CHUNK_PAIRS pairs.
+    """
+    chunk_rows = max(1, CHUNK_PAIRS // max(columns, 1))
+    for start in range(0, rows, chunk_rows):
+        yield range(start, min(start + chunk_rows, rows))
+
+
+def _encode(strings: list, padding: int) -> tuple:
+    """
+    Encode strings as a padded array of code points and an array of their lengths.
+    """
+    lengths = numpy.array([len(string) for string in strings], dtype=numpy.int64)
+    codes = numpy.full((len(strings), max(lengths.max(initial=0), 1)), padding, dtype=numpy.int32)
+    for row, string in enumerate(strings):
+        codes[row, :len(string)] = numpy.frombuffer(string.encode('utf-32-le'), dtype=numpy.uint32)
+    return codes, lengths
+
+
+def _pad(codes: numpy.ndarray, width: int, padding: int) -> numpy.ndarray:
+    """
+    Pad an array of code points out to a width.
+    """
+    if codes.shape[1] == width:
+        return codes
+    return numpy.pad(codes, ((0, 0), (0, width - codes.shape[1])), constant_values=padding)
+
+
+def _jaro_winkler(s0: numpy.ndarray, s0_lengths: numpy.ndarray, s1: numpy.ndarray,
+                  s1_lengths: numpy.ndarray) -> numpy.ndarray:
+    """
+    Get the Jaro-Winkler similarity of pairs of encoded strings, step for step the same as strsimpy: the characters of
+    the shorter string (the first one if they are the same length) each take the first unmatched equal character of the
+    longer string within the match range, and the common prefix is not capped at four characters.
+    """
+    pairs, width = s0.shape
+    positions = numpy.arange(width)
+    s0_longer = s0_lengths > s1_lengths
+    min_codes = numpy.where(s0_longer[:, None], s1, s0)
+    max_codes = numpy.where(s0_longer[:, None], s0, s1)
+    # the padding of the shorter string must still never match the longer string's
+    min_codes = numpy.where(min_codes < 0, FIRST_PADDING, min_codes)
+    max_codes = numpy.where(max_codes < 0, SECOND_PADDING, max_codes)
+    min_lengths = numpy.minimum(s0_lengths, s1_lengths)
+    max_lengths = numpy.maximum(s0_lengths, s1_lengths)
+    match_range = numpy.maximum(max_lengths // 2 - 1, 0)
+
+    max_matched = numpy.zeros((pairs, width), dtype=bool)
+    min_matched = numpy.zeros((pairs, width), dtype=bool)
+    # only the columns any pair's match range reaches are compared at each position
+    widest_range = int(match_range.max(initial=0))
+    match_range = match_range.astype(numpy.int16)[:, None]
+    for min_position in range(width):
+        start = max(min_position - widest_range, 0)
+        stop = min(min_position + widest_range + 1, width)
+        distances = numpy.abs(positions[start:stop] - min_position).astype(numpy.int16)
+        candidates = (max_codes[:, start:stop] == min_codes[:, min_position, None]) & (distances <= match_range)
+        candidates &= ~max_matched[:, start:stop]
+        found = candidates.any(axis=1) & (min_position < min_lengths)
+        found_pairs = numpy.flatnonzero(found)
+        max_matched[found_pairs, start + candidates[found_pairs].argmax(axis=1)] = True
+        min_matched[:, min_position] = found
+    matches = min_matched.sum(axis=1)
+
+    # line up the matched characters of each string in order and count the ones that differ
+    differ = (_get_matched(min_codes, min_matched) != _get_matched(max_codes, max_matched)) & \
+        (positions[None, :] < matches[:, None])
+    transpositions = differ.sum(axis=1) // 2
+
+    same = (s0 == s1) & (positions[None, :] < min_lengths[:, None])
+    prefix = numpy.cumprod(same, axis=1).sum(axis=1)
+
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        matches = matches.astype(numpy.float64)
+        jaro = (matches / s0_lengths + matches / s1_lengths + (matches - transpositions) / matches) / 3
+        scale = numpy.minimum(JW_COEFFICIENT, 1.0 / max_lengths)
+        similarity = numpy.where(jaro > JW_THRESHOLD, jaro + scale * prefix * (1 - jaro), jaro)
+    similarity = numpy.where(matches == 0, 0.0, similarity)
+    equal = (s0_lengths == s1_lengths) & (same.sum(axis=1) == s0_lengths)
+    return numpy.where(equal, 1.0, similarity)
+
+
+def _get_matched(codes: numpy.ndarray, matched: numpy.ndarray) -> numpy.ndarray:
+    """
+    Move the matched characters of each string to the front, in order.
+    """
+    pairs, columns = numpy.nonzero(matched)
+    order = numpy.cumsum(matched, axis=1) - 1
+    matched_codes = numpy.zeros_like(codes)
+    matched_codes[pairs, order[pairs, columns]] = codes[pairs, columns]
+    return matched_codes
+
+
+def _longest_common_substring(s0: numpy.ndarray, s0_lengths: numpy.ndarray, s1: numpy.ndarray,
+                              s1_lengths: numpy.ndarray) -> numpy.ndarray:
+    """
+    Get the length of the longest common substring of pairs of encoded strings, keeping the length of the common
+    substring ending at each position of s1 while stepping through s0. The two sides are padded differently, so the
+    padding never counts.
+    """
+    pairs, width = s0.shape
+    length_type = numpy.uint8 if width < numpy.iinfo(numpy.uint8).max else numpy.int32
+    ending = numpy.zeros((pairs, width + 1), dtype=length_type)
+    longest = numpy.zeros((pairs, width), dtype=length_type)
+    for position in range(width):
+        ending[:, 1:] = (ending[:, :-1] + 1) * (s0[:, position, None] == s1)
+        numpy.maximum(longest, ending[:, 1:], out=longest)
+    return longest.max(axis=1).astype(numpy.int64)
@@ -0,0 +1,166 @@
+"""
+Typed, compressed columnar copies of the scraped csv files. The scrapers keep appending to csvs, since a crashed scrape
+can resume from them, and a finished csv can then be converted to a Parquet or Arrow IPC file. Each column is stored as
+an integer, a float, or a string, whichever fits every value in it, and empty values become nulls, so readers get
+numbers back without parsing strings. Needs pyarrow installed.
+"""
+import csv
+import importlib.util
+import io
+import os
+from typing import Iterator
+
+from jmu_baseball_utils import compressed_files
+
+PARQUET = 'parquet'  # zstd compressed Parquet, the smallest on disk
+ARROW = 'arrow'  # zstd compressed Arrow IPC, the fastest to read
+STORAGE_FORMATS = (PARQUET, ARROW)
+COMPRESSION = 'zstd'
+
+
+def is_available() -> bool:
+    """
+    Check if pyarrow is installed.
+
+    :return: True if columnar files can be written and read
+    """
+    return importlib.util.find_spec('pyarrow') is not None
+
+
+def check_format(storage_format: str) -> str:
+    """
+    Make sure a storage format is known and pyarrow is installed.
+
+    :param storage_format: 'parquet' or 'arrow'
+    :return: the storage format
+    """
+    if storage_format not in STORAGE_FORMATS:
+        raise ValueError('Unknown storage format {storage_format}, expected one of {formats}'
+                         .format(storage_format=storage_format, formats=STORAGE_FORMATS))
+    if not is_available():
+        raise ValueError('The {storage_format} storage format needs pyarrow installed'
+                         .format(storage_format=storage_format))
+    return storage_format
+
+
+def read_csv_table(csv_file_name: str):
+    """
+    Read a scraped csv, compressed or not, into a typed table. Every column is read as strings first so a column that
+    is mostly numbers with a few other values stays a string column instead of failing part way through.
+
+    :param csv_file_name: the csv file
+    :return: a pyarrow Table
+    """
+    import pyarrow
+    import pyarrow.compute
+    import pyarrow.csv
+
+    with compressed_files.open_file(csv_file_name, 'rb') as csv_file:
+        column_names = next(csv.reader(io.TextIOWrapper(csv_file, encoding='utf-8', newline='')), [])
+    if not column_names:
+        return pyarrow.table({})
+
+    # repeated headings, such as two 'Player' columns, get a suffix so every column has its own name
+    seen = {}
+    unique_names = []
+    for column_name in column_names:
+        seen[column_name] = seen.get(column_name, 0) + 1
+        unique_names.append(column_name if seen[column_name] == 1 else
+                            '{name}_{count}'.format(name=column_name, count=seen[column_name]))
+
+    with compressed_files.open_file(csv_file_name, 'rb') as csv_file:
+        table = pyarrow.csv.read_csv(
+            csv_file,
+            read_options=pyarrow.csv.ReadOptions(column_names=unique_names, skip_rows=1),
+            parse_options=pyarrow.csv.ParseOptions(newlines_in_values=True),
+            convert_options=pyarrow.csv.ConvertOptions(column_types={name: pyarrow.string() for name in unique_names},
+                                                       strings_can_be_null=False))
+    return pyarrow.table({name: _narrow_column(table.column(name)) for name in unique_names})
+
+
+def _narrow_column(column):
+    """
+    Turn empty strings into nulls and convert the column to integers, or floats, if every value is kept exactly. Ids
+    like zip codes can have leading zeros, so a column is only converted to integers if every value is written the
+    same way the integer would be, and a column with leading zeros is never converted to floats.
+
+    :param column: a pyarrow string column
+    :return: the narrowed pyarrow column
+    """
+    import pyarrow
+    import pyarrow.compute
+
+    column = pyarrow.compute.if_else(pyarrow.compute.equal(column, ''), pyarrow.scalar(None, pyarrow.string()),
+                                     column)
+    if pyarrow.compute.any(pyarrow.compute.match_substring_regex(column, r'^[+-]?0\d')).as_py():
+        return column
+    try:
+        integers = pyarrow.compute.cast(column, pyarrow.int64())
+    except (pyarrow.ArrowInvalid, pyarrow.ArrowNotImplementedError):
+        pass
+    else:
+        if pyarrow.compute.all(pyarrow.compute.equal(pyarrow.compute.cast(integers, pyarrow.string()),
+                                                     column)).as_py() is not False:
+            return integers
+        return column
+    try:
+        return pyarrow.compute.cast(column, pyarrow.float64())
+    except (pyarrow.ArrowInvalid, pyarrow.ArrowNotImplementedError):
+        return column
+
+
+def write_table(table, file_name: str, storage_format: str) -> None:
+    """
+    Write a table to a columnar file, replacing the old file in one step so readers never see half a file.
+
+    :param table: a pyarrow Table
+    :param file_name: the file to write
+    :param storage_format: 'parquet' or 'arrow'
+    :return: None
+    """
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+
+    check_format(storage_format)
+    temp_file_name = file_name + '.tmp'
+    if storage_format == PARQUET:
+        pyarrow.parquet.write_table(table, temp_file_name, compression=COMPRESSION)
+    else:
+        options = pyarrow.ipc.IpcWriteOptions(compression=COMPRESSION)
+        with pyarrow.OSFile(temp_file_name, 'wb') as sink, \
+                pyarrow.ipc.new_file(sink, table.schema, options=options) as writer:
+            writer.write_table(table)
+    os.replace(temp_file_name, file_name)
+
+
+def read_table(file_name: str, storage_format: str, columns: list = None):
+    """
+    Read a columnar file.
+
+    :param file_name: the file to read
+    :param storage_format: 'parquet' or 'arrow'
+    :param columns: the names of the columns to read, defaults to every column
+    :return: a pyarrow Table
+    """
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+
+    check_format(storage_format)
+    if storage_format == PARQUET:
+        return pyarrow.parquet.read_table(file_name, columns=columns)
+    with pyarrow.memory_map(file_name, 'r') as source:
+        table = pyarrow.ipc.open_file(source).read_all()
+    return table.select(columns) if columns is not None else table
+
+
+def iter_rows(table) -> Iterator[dict]:
+    """
+    Iterate over the rows of a table as dicts, a batch at a time so the whole table is never converted at once.
+
+    :param table: a pyarrow Table
+    :return: an iterator of row dicts, nulls are None
+    """
+    for batch in table.to_batches():
+        yield from batch.to_pylist()
@@ -0,0 +1,170 @@
+"""
+Transparent gzip and zstd compression for the scraped csv files. A compressed csv is a series of complete gzip members
+or zstd frames, one for each time the file is flushed, which both formats read back as one stream. Because every flush
+ends a member, the size of a compressed file after a flush is a safe place to cut it back to, so the scrapers can
+append to and resume compressed files the same way they do uncompressed ones.
+"""
+import gzip
+import importlib.util
+import io
+from typing import Optional
+
+GZIP = 'gzip'
+ZSTD = 'zstd'  # needs zstandard installed
+COMPRESSIONS = (GZIP, ZSTD)
+EXTENSIONS = {GZIP: '.gz', ZSTD: '.zst'}
+MAX_BUFFER_SIZE = 1 << 20  # bytes written before a member is ended even if the file was not flushed
+
+_default_compression = None
+
+
+def is_available(compression: str) -> bool:
+    """
+    Check if the library a compression needs is installed.
+
+    :param compression: 'gzip' or 'zstd'
+    :return: True if the compression can be used
+    """
+    if compression == GZIP:
+        return True
+    if compression == ZSTD:
+        return importlib.util.find_spec('zstandard') is not None
+    return False
+
+
+def set_default_compression(compression: Optional[str]) -> None:
+    """
+    Set the compression used for new scraped csv files. Files that already exist keep the compression they have.
+
+    :param compression: 'gzip', 'zstd', or None to write uncompressed files
+    :return: None
+    """
+    global _default_compression
+    if compression is not None and compression not in COMPRESSIONS:
+        raise ValueError('Unknown compression {compression}, expected one of {compressions}'
+                         .format(compression=compression, compressions=COMPRESSIONS))
+    if compression is not None and not is_available(compression):
+        raise ValueError('The {compression} compression needs zstandard installed'.format(compression=compression))
+    _default_compression = compression
+
+
+def get_default_compression() -> Optional[str]:
+    """
+    Get the compression used for new scraped csv files.
+
+    :return: 'gzip', 'zstd', or None
+    """
+    return _default_compression
+
+
+def get_compression(file_name: str) -> Optional[str]:
+    """
+    Get the compression of a file from its extension.
+
+    :param file_name: the file
+    :return: 'gzip', 'zstd', or None if the file is not compressed
+    """
+    for compression, extension in EXTENSIONS.items():
+        if file_name.endswith(extension):
+            return compression
+    return None
+
+
+def open_file(file_name: str, mode: str = 'rb'):
+    """
+    Open a file that may be compressed, based on its extension. Uncompressed files are opened normally.
+
+    :param file_name: the file
+    :param mode: 'rb', 'wb', or 'ab'
+    :return: a binary file object, reading gives the uncompressed bytes and writing compresses them
+    """
+    if mode not in ('rb', 'wb', 'ab'):
+        raise ValueError('Unsupported mode {mode}, expected rb, wb, or ab'.format(mode=mode))
+    compression = get_compression(file_name)
+    if compression is None:
+        return open(file_name, mode)
+    if mode != 'rb':
+        return CompressedAppendFile(file_name, mode, compression)
+    if compression == GZIP:
+        return gzip.open(file_name, 'rb')
+    import zstandard
+    raw_file = open(file_name, 'rb')
+    reader = zstandard.ZstdDecompressor().stream_reader(raw_file, read_across_frames=True, closefd=True)
+    return io.BufferedReader(reader)
+
+
+class CompressedAppendFile:
+    """
+    A binary file that compresses everything written to it. Writes are buffered and each flush writes the buffer as one
+    complete gzip member or zstd frame.
+    """
+
+    def __init__(self, file_name: str, mode: str, compression: str) -> None:
+        """
+        Open the file.
+
+        :param file_name: the file
+        :param mode: 'wb' or 'ab'
+        :param compression: 'gzip' or 'zstd'
+        """
+        self.raw_file = open(file_name, mode)
+        self.compression = compression
+        self.buffer = bytearray()
+        if compression == ZSTD:
+            import zstandard
+            self.compressor = zstandard.ZstdCompressor()
+
+    def write(self, data: bytes) -> int:
+        self.buffer += data
+        if len(self.buffer) >= MAX_BUFFER_SIZE:
+            self.flush()
+        return len(data)
+
+    def flush(self) -> None:
+        """
+        Compress everything written since the last flush into a complete member and write it to the file.
+
+        :return: None
+        """
+        if self.buffer:
+            if self.compression == GZIP:
+                self.raw_file.write(gzip.compress(bytes(self.buffer), mtime=0))
+            else:
+                self.raw_file.write(self.compressor.compress(bytes(self.buffer)))
+            self.buffer.clear()
+        self.raw_file.flush()
+
+    def tell(self) -> int:
+        """
+        Get the size of the compressed file, flushing first so the size includes everything written.
+
+        :return: the position in the compressed file
+        """
+        self.flush()
+        return self.raw_file.tell()
+
+    def truncate(self, size: int) -> int:
+        """
+        Drop everything written that was not flushed and cut the compressed file back to size, which should be a size
+        returned by tell.
+
+        :param size: the size to cut the compressed file to
+        :return: the new size
+        """
+        self.buffer.clear()
+        return self.raw_file.truncate(size)
+
+    def close(self) -> None:
+        if not self.raw_file.closed:
+            self.flush()
+            self.raw_file.close()
+
+    @property
+    def closed(self) -> bool:
+        return self.raw_file.closed
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
@@ -0,0 +1,188 @@
+"""
+Byte offset indexes for large csv files whose rows are grouped by a key, such as play_by_play.csv grouped by game id.
+The index maps each key to the byte ranges of its rows and is saved in a sidecar file, so finding one game's rows means
+reading only those bytes through mmap instead of parsing the whole csv. The index is extended as the csv is appended to
+and rebuilt if the csv is cut short or replaced.
+"""
+import csv
+import hashlib
+import io
+import mmap
+import os
+import threading
+
+TAIL_SIZE = 64  # number of bytes before the end of the indexed part of the csv that are checked to be unchanged
+
+
+class CsvOffsetIndex:
+    """
+    The byte offset index of one csv file.
+    """
+
+    def __init__(self, csv_file_name: str, index_file_name: str, key_column: str) -> None:
+        """
+        Initialize the index. Nothing is read until the first lookup.
+
+        :param csv_file_name: the csv file to index, its first row must be the header
+        :param index_file_name: the sidecar file the index is saved to
+        :param key_column: the name of the column the rows are grouped by
+        """
+        self.csv_file_name = csv_file_name
+        self.index_file_name = index_file_name
+        self.key_column = key_column
+        self.header = None
+        self.indexed_size = 0  # number of bytes of the csv covered by the index
+        self.tail_hash = ''
+        self.ranges = {}  # key -> list of [start, end) byte ranges, in file order
+        self.lock = threading.Lock()
+        self._loaded = False
+
+    def get_rows(self, keys) -> dict:
+        """
+        Get the rows of every key in keys that is in the csv.
+
+        :param keys: the keys to look up
+        :return: a dict of keys to lists of row dicts, in the order the keys first appear in the csv
+        """
+        with self.lock:
+            self._refresh()
+            found_keys = sorted((key for key in set(keys) if key in self.ranges), key=lambda key: self.ranges[key][0])
+            rows = {}
+            if not found_keys:
+                return rows
+            with open(self.csv_file_name, 'rb') as csv_file, \
+                    mmap.mmap(csv_file.fileno(), 0, access=mmap.ACCESS_READ) as csv_map:
+                for key in found_keys:
+                    rows[key] = []
+                    for start, end in self.ranges[key]:
+                        text = csv_map[start:end].decode('utf-8')
+                        rows[key] += list(csv.DictReader(io.StringIO(text, newline=''), fieldnames=self.header))
+            return rows
+
+    def get_keys(self) -> list:
+        """
+        Get every key in the csv.
+
+        :return: a list of keys in the order they first appear in the csv
+        """
+        with self.lock:
+            self._refresh()
+            return list(self.ranges)
+
+    def _refresh(self) -> None:
+        """
+        Bring the index up to date with the csv, loading the sidecar file the first time. Rows appended since the index
+        was last saved are added to it, and if the indexed part of the csv changed the index is rebuilt.
+
+        :return: None
+        """
+        if not self._loaded:
+            self._load()
+            self._loaded = True
+        csv_size = os.path.getsize(self.csv_file_name) if os.path.exists(self.csv_file_name) else 0
+        if csv_size == self.indexed_size and self.tail_hash == self._hash_tail(self.indexed_size):
+            return
+        if csv_size < self.indexed_size or self.tail_hash != self._hash_tail(self.indexed_size):
+            print('Rebuilding offset index for {file_name}'.format(file_name=self.csv_file_name))
+            self.header = None
+            self.indexed_size = 0
+            self.ranges = {}
+        self._extend(csv_size)
+        self.tail_hash = self._hash_tail(self.indexed_size)
+        self._save()
+
+    def _extend(self, csv_size: int) -> None:
+        """
+        Index the complete rows between the end of the indexed part of the csv and csv_size. A row that is still being
+        written (no newline after it yet) is left for the next refresh.
+
+        :param csv_size: the size of the csv
+        :return: None
+        """
+        with open(self.csv_file_name, 'rb') as csv_file:
+            csv_file.seek(self.indexed_size)
+            offset = self.indexed_size
+            record_start = offset
+            record = b''
+            key_index = None if self.header is None else self.header.index(self.key_column)
+            for line in csv_file:
+                if offset + len(line) > csv_size or not line.endswith(b'\n'):
+                    break
+                offset += len(line)
+                record += line
+                # a newline inside a quoted field does not end the row
+                if record.count(b'"') % 2 == 1:
+                    continue
+                if b'"' in record:
+                    values = next(csv.reader(io.StringIO(record.decode('utf-8'), newline='')), [])
+                else:
+                    # without quotes a row is just its values separated by commas, which is much faster to split
+                    values = record.rstrip(b'\r\n').decode('utf-8').split(',') if record.strip() else []
+                if self.header is None:
+                    self.header = values
+                    key_index = self.header.index(self.key_column)
+                elif values:
+                    self._add_range(values[key_index], record_start, offset)
+                record_start = offset
+                record = b''
+            self.indexed_size = record_start
+
+    def _add_range(self, key: str, start: int, end: int) -> None:
+        """
+        Add the byte range of a row to its key, merging it into the key's last range if the two are next to each other.
+        """
+        key_ranges = self.ranges.setdefault(key, [])
+        if key_ranges and key_ranges[-1][1] == start:
+            key_ranges[-1][1] = end
+        else:
+            key_ranges.append([start, end])
+
+    def _hash_tail(self, size: int) -> str:
+        """
+        Hash the last TAIL_SIZE bytes before size in the csv, used to tell if the indexed part of the csv was replaced.
+        """
+        if size == 0 or not os.path.exists(self.csv_file_name):
+            return ''
+        with open(self.csv_file_name, 'rb') as csv_file:
+            csv_file.seek(max(0, size - TAIL_SIZE))
+            return hashlib.sha1(csv_file.read(size - max(0, size - TAIL_SIZE))).hexdigest()
+
+    def _load(self) -> None:
+        """
+        Load the index from its sidecar file. A missing or unreadable sidecar file leaves the index empty so it is
+        rebuilt from the csv.
+
+        :return: None
+        """
+        if not os.path.exists(self.index_file_name):
+            return
+        try:
+            with open(self.index_file_name, encoding='utf-8', newline='') as index_file:
+                reader = csv.reader(index_file)
+                indexed_size, tail_hash = next(reader)
+                header = next(reader)
+                ranges = {}
+                for key, start, end in reader:
+                    ranges.setdefault(key, []).append([int(start), int(end)])
+        except (ValueError, StopIteration):
+            print('Ignoring unreadable offset index {file_name}'.format(file_name=self.index_file_name))
+            return
+        self.indexed_size = int(indexed_size)
+        self.tail_hash = tail_hash
+        self.header = header
+        self.ranges = ranges
+
+    def _save(self) -> None:
+        """
+        Write the index to its sidecar file, replacing the old one in one step so a crash never leaves half an index.
+
+        :return: None
+        """
+        temp_file_name = self.index_file_name + '.tmp'
+        with open(temp_file_name, 'w', encoding='utf-8', newline='') as index_file:
+            writer = csv.writer(index_file)
+            writer.writerow([self.indexed_size, self.tail_hash])
+            writer.writerow(self.header or [])
+            for key, key_ranges in self.ranges.items():
+                writer.writerows([key, start, end] for start, end in key_ranges)
+        os.replace(temp_file_name, self.index_file_name)
@@ -7,13 +7,15 @@ import unicodecsv
 from difflib import SequenceMatcher
 
 from dropbox import Dropbox
-from dropbox.files import FileMetadata
 from strsimpy.jaro_winkler import JaroWinkler
 
+from jmu_baseball_utils import dropbox_sync
 from jmu_baseball_utils import file_utils
 
 jaro_winkler = JaroWinkler()
 
+_year_info = None  # year -> year info line, read from the year info file the first time it is needed
+
 
 def get_year_info(year: int) -> dict:
     """
@@ -24,13 +26,28 @@ def get_year_info(year: int) -> dict:
     :return: a dict containing the year_id, hitting_id, pitching_id, and fielding_id for that year, or an empty dict
     if the year is not in the file
     """
-    file_name = file_utils.get_year_info_file_name()
-    with open(file_name, 'rb') as file:
-        reader = unicodecsv.DictReader(file)
-        for line in reader:
-            if year == int(line['year']):
-                return line
-    return {}
+    global _year_info
+    if _year_info is None:
+        file_name = file_utils.get_year_info_file_name()
+        with open(file_name, 'rb') as file:
+            reader = unicodecsv.DictReader(file)
+            year_info = {}
+            for line in reader:
+                # the first line for a year wins, like it did when the file was searched for each call
+                year_info.setdefault(int(line['year']), line)
+        _year_info = year_info
+    return dict(_year_info.get(year, {}))
+
+
+def clear_year_info_cache() -> None:
+    """
+    Forget the year info file, so the next call to get_year_info reads it again. Call this after updating the file
+    while running.
+    
+    :return: None
+    """
+    global _year_info
+    _year_info = None
 
 
 def get_school_id_dict() -> dict:
@@ -55,7 +72,7 @@ def get_schools(year: int, division: int) -> list:
     items, 'school_name' for school name and 'school_id' for school code
     """
     file_name = file_utils.get_scrape_file_name(year, division, 'conference_teams')
-    with open(file_name, 'rb') as file:
+    with file_utils.open_scrape_file(file_name, 'rb') as file:
         reader = unicodecsv.DictReader(file)
         return [{'school_name': row['school_name'], 'school_id': row['school_id']} for row in
                 reader]
@@ -67,17 +84,19 @@ def get_games_from_schedule(year: int, division: int) -> list:
     
     :param year: the year to get games for
     :param division: the division of the games
-    :return: a list of game dicts in the division and year specified, the dicts contain four
-    items, 'school_name' for school name, 'date' for the date of the game, 'opponent_string' for the
-    opponent name and some other information (@ for away game and some others), and 'game_url for
-    the url of the game
+    :return: a list of game dicts in the division and year specified, the dicts contain six
+    items, 'school_name' for school name, 'school_id' for the school's id, 'date' for the date of the game,
+    'opponent_string' for the opponent name and some other information (@ for away game and some others),
+    'opponent_url' for the url of the opponent's team page, and 'game_url for the url of the game
     """
     file_name = file_utils.get_scrape_file_name(year, division, 'schedules')
-    with open(file_name, 'rb') as file:
+    with file_utils.open_scrape_file(file_name, 'rb') as file:
         reader = unicodecsv.DictReader(file)
         return [{'school_name': row['school_name'],
+                 'school_id': row['school_id'],
                  'date': row['date'],
                  'opponent_string': row['opponent_string'],
+                 'opponent_url': row['opponent_url'],
                  'game_url': row['game_url']}
                 for row in
                 reader]
@@ -92,7 +111,7 @@ def get_games_from_game_info(year: int, division: int) -> list:
     :return a list of game dicts that contain game information for that game
     """
     game_info_file_name = file_utils.get_scrape_file_name(year, division, 'game_info')
-    with open(game_info_file_name, 'rb') as game_info_file:
+    with file_utils.open_scrape_file(game_info_file_name, 'rb') as game_info_file:
         game_info_reader = unicodecsv.DictReader(game_info_file)
         return [game for game in game_info_reader]
 
@@ -102,7 +121,8 @@ def get_player_id_from_name(pbp_name: str, player_dict: dict) -> (str, int, floa
     Get the player id of the player with the name closest to the name found in the play by play. Uses SequenceMatcher to
     find the longest match between each player's name in the player_dict and pbp_name. If two players have the same
     match length, the JaroWinkler similarity function is used to determine which player is a better match. This
-    method is not guaranteed to return the correct player.
+    method is not guaranteed to return the correct player. To match many names against the same roster, use
+    name_matcher.RosterNameMatcher, which gives the same results without comparing the name to every player.
 
     :param pbp_name: the player name extracted from a play by play string
     :param player_dict: a dict of players formatted like this: {player_id: {'first_name': first, 'last_name': last}}
@@ -162,7 +182,7 @@ def split_name(name: str) -> tuple:
 def upload_data(dbx: Dropbox, file_path: str, data_type: str, file_name: str, year: int = None, division: int = None) \
         -> None:
     """
-    Upload this file to a dropbox folder.
+    Upload this file to a dropbox folder. The file is skipped if Dropbox already has the same contents.
 
     :param dbx: the dropbox connection
     :param file_path: the path of the file to upload
@@ -172,33 +192,37 @@ def upload_data(dbx: Dropbox, file_path: str, data_type: str, file_name: str, ye
     :param division: the division of this data. Note: year and division must both have values if they are to be used
     :return: None
     """
-    with open(file_path, 'rb') as file:
-        if year and division:
-            dbx_file_name = f'/{data_type}/{year}/division_{division}/{file_name}'
-        else:
-            dbx_file_name = f'/{data_type}/{file_name}'
-        print(f'Uploading to {dbx_file_name}... ', end='')
-        dbx.files_upload(file.read(), dbx_file_name)
-        print('complete')
+    if year and division:
+        dbx_file_name = f'/{data_type}/{year}/division_{division}/{file_name}'
+    else:
+        dbx_file_name = f'/{data_type}/{file_name}'
+    print(f'Uploading to {dbx_file_name}... ', end='')
+    if dropbox_sync.get_remote_hash(dbx, dbx_file_name) == dropbox_sync.get_content_hash(file_path):
+        print('unchanged')
+        return
+    dropbox_sync.upload_file(dbx, file_path, dbx_file_name)
+    print('complete')
+
+
+def upload_all_data(dbx: Dropbox, data_type: str) -> None:
+    """
+    Upload every file in a local data folder that is missing from dropbox or different from the dropbox copy.
+
+    :param dbx: the dropbox connection
+    :param data_type: the type of data this is (scraped-data, spray_charts, hit_location_data, etc.)
+    :return: None
+    """
+    dropbox_sync.upload_folder(dbx, data_type)
+    print(f'Finished uploading all {data_type} files')
 
 
 def download_all_data(dbx: Dropbox, data_type: str) -> None:
     """
-    Download all data from a dropbox folder.
+    Download all data from a dropbox folder. Files that are already the same locally are skipped.
 
     :param dbx: the dropbox connection
     :param data_type: the type of data this is (scraped-data, spray_charts, hit_location_data, etc.)
     :return: None
     """
-    metadata = dbx.files_list_folder(f'/{data_type}', recursive=True)
-    while metadata.has_more:
-        entries = metadata.entries
-        for entry in entries:
-            if isinstance(entry, FileMetadata):
-                print(f'Downloading to {entry.path_display}... ', end='')
-                file_name = entry.name
-                path = entry.path_display.replace(file_name, '')
-                dbx.files_download_to_file(f'{file_utils.get_path(f"../{path}")}/{file_name}', entry.path_display)
-                print('complete')
-        metadata = dbx.files_list_folder_continue(metadata.cursor)
+    dropbox_sync.download_folder(dbx, data_type)
     print(f'Finished downloading all {data_type} files')
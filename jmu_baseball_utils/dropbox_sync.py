@@ -0,0 +1,249 @@
+"""
+Sync data folders with Dropbox, transferring only files that changed. Local files are compared with Dropbox using
+Dropbox's content hash, large files are uploaded in chunks through an upload session instead of being read into memory
+at once, and transfers run in a thread pool. Only these Dropbox client methods are used, so any object with the same
+methods can stand in for the client: files_list_folder, files_list_folder_continue, files_get_metadata, files_upload,
+files_upload_session_start, files_upload_session_append_v2, files_upload_session_finish, and files_download_to_file.
+A transfer that Dropbox rate limits is tried again after the wait Dropbox asks for.
+"""
+import hashlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import requests
+from dropbox.exceptions import ApiError, DropboxException, RateLimitError
+from dropbox.files import CommitInfo, FileMetadata, UploadSessionCursor, WriteMode
+
+from jmu_baseball_utils import file_utils
+
+HASH_BLOCK_SIZE = 4 * 1024 * 1024  # Dropbox hashes files in 4 MB blocks
+CHUNK_SIZE = 8 * 1024 * 1024  # files bigger than this are uploaded in chunks of this size
+DEFAULT_WORKERS = 8  # number of files transferred at once
+EXCLUDED_DIRECTORIES = {'spool', 'page-cache'}  # working directories under scraped-data that are never synced
+TRY_LIMIT = 5  # attempts at a rate limited transfer before it counts as failed
+RETRY_SLEEP = 1  # seconds to wait after the first rate limit when Dropbox does not say how long to wait
+MAX_RETRY_SLEEP = 60  # the longest time to wait in between attempts, in seconds
+
+
+def get_content_hash(file_name: str) -> str:
+    """
+    Get the Dropbox content hash of a local file: the sha256 of the concatenated sha256 digests of each 4 MB block.
+
+    :param file_name: the local file
+    :return: the hex content hash
+    """
+    block_hashes = hashlib.sha256()
+    with open(file_name, 'rb') as file:
+        while True:
+            block = file.read(HASH_BLOCK_SIZE)
+            if not block:
+                break
+            block_hashes.update(hashlib.sha256(block).digest())
+    return block_hashes.hexdigest()
+
+
+def get_local_path(dropbox_path: str) -> str:
+    """
+    Get the local path of a file in Dropbox. The Dropbox folders mirror the folders in the repository's home folder.
+
+    :param dropbox_path: the path in Dropbox, such as '/scraped-data/2019/division_1/rosters.csv'
+    :return: the local path
+    """
+    return file_utils.get_path('..' + dropbox_path)
+
+
+def list_remote_files(dbx, folder: str) -> dict:
+    """
+    List every file in a Dropbox folder and its subfolders, following the listing through every page.
+
+    :param dbx: the dropbox connection
+    :param folder: the Dropbox folder, such as '/scraped-data'
+    :return: a dict of lower case Dropbox paths to FileMetadata
+    """
+    remote_files = {}
+    result = dbx.files_list_folder(folder, recursive=True)
+    while True:
+        for entry in result.entries:
+            if isinstance(entry, FileMetadata):
+                remote_files[entry.path_lower] = entry
+        if not result.has_more:
+            return remote_files
+        result = dbx.files_list_folder_continue(result.cursor)
+
+
+def list_local_files(data_type: str) -> dict:
+    """
+    List every local file in a data folder, leaving out temporary files and working directories.
+
+    :param data_type: the type of data (scraped-data, spray_charts, hit_location_data, etc.)
+    :return: a dict of Dropbox paths to local paths
+    """
+    local_root = get_local_path('/' + data_type)
+    local_files = {}
+    for directory, directory_names, file_names in os.walk(local_root):
+        directory_names[:] = [name for name in directory_names if name not in EXCLUDED_DIRECTORIES]
+        for file_name in file_names:
+            # temp files end in .tmp or have it before their extension, like box_score_hitting.tmp.csv and
+            # box_score_hitting.csv.tmp.gz
+            if '.tmp.' in file_name + '.':
+                continue
+            local_path = os.path.join(directory, file_name)
+            relative_path = os.path.relpath(local_path, local_root).replace(os.sep, '/')
+            local_files['/{data_type}/{path}'.format(data_type=data_type, path=relative_path)] = local_path
+    return local_files
+
+
+def upload_file(dbx, local_path: str, dropbox_path: str) -> None:
+    """
+    Upload a local file to Dropbox, replacing the file there. Files bigger than CHUNK_SIZE are sent in chunks through
+    an upload session so only one chunk is in memory at a time.
+
+    :param dbx: the dropbox connection
+    :param local_path: the local file
+    :param dropbox_path: the Dropbox path to upload to
+    :return: None
+    """
+    file_size = os.path.getsize(local_path)
+    with open(local_path, 'rb') as file:
+        if file_size <= CHUNK_SIZE:
+            dbx.files_upload(file.read(), dropbox_path, mode=WriteMode.overwrite)
+            return
+        session = dbx.files_upload_session_start(file.read(CHUNK_SIZE))
+        cursor = UploadSessionCursor(session_id=session.session_id, offset=file.tell())
+        commit = CommitInfo(path=dropbox_path, mode=WriteMode.overwrite)
+        while file_size - file.tell() > CHUNK_SIZE:
+            dbx.files_upload_session_append_v2(file.read(CHUNK_SIZE), cursor)
+            cursor.offset = file.tell()
+        dbx.files_upload_session_finish(file.read(), cursor, commit)
+
+
+def download_file(dbx, dropbox_path: str, local_path: str) -> None:
+    """
+    Download a file from Dropbox, replacing the local file in one step once the download finishes.
+
+    :param dbx: the dropbox connection
+    :param dropbox_path: the Dropbox file
+    :param local_path: the local path to download to
+    :return: None
+    """
+    temp_path = local_path + '.tmp'
+    dbx.files_download_to_file(temp_path, dropbox_path)
+    os.replace(temp_path, local_path)
+
+
+def get_remote_hash(dbx, dropbox_path: str) -> Optional[str]:
+    """
+    Get the content hash of a single Dropbox file.
+
+    :param dbx: the dropbox connection
+    :param dropbox_path: the Dropbox file
+    :return: the content hash, or None if the file does not exist
+    """
+    try:
+        metadata = dbx.files_get_metadata(dropbox_path)
+    except ApiError:
+        return None
+    return metadata.content_hash if isinstance(metadata, FileMetadata) else None
+
+
+def upload_folder(dbx, data_type: str, workers: int = DEFAULT_WORKERS) -> dict:
+    """
+    Upload every local file in a data folder that is missing from Dropbox or different from the Dropbox copy.
+
+    :param dbx: the dropbox connection
+    :param data_type: the type of data (scraped-data, spray_charts, hit_location_data, etc.)
+    :param workers: the number of files uploaded at once
+    :return: a dict with the number of files 'transferred', 'unchanged', and 'failed'
+    """
+    try:
+        remote_files = list_remote_files(dbx, '/' + data_type)
+    except ApiError:
+        # the folder is not in Dropbox yet
+        remote_files = {}
+    local_files = list_local_files(data_type)
+    changed = {dropbox_path: local_path for dropbox_path, local_path in local_files.items()
+               if not _is_same(local_path, remote_files.get(dropbox_path.lower()))}
+    unchanged = len(local_files) - len(changed)
+    return _transfer(upload_file, [(dbx, local_path, dropbox_path) for dropbox_path, local_path in changed.items()],
+                     unchanged, 'Uploading', workers)
+
+
+def download_folder(dbx, data_type: str, workers: int = DEFAULT_WORKERS) -> dict:
+    """
+    Download every file in a Dropbox data folder that is missing locally or different from the local copy.
+
+    :param dbx: the dropbox connection
+    :param data_type: the type of data (scraped-data, spray_charts, hit_location_data, etc.)
+    :param workers: the number of files downloaded at once
+    :return: a dict with the number of files 'transferred', 'unchanged', and 'failed'
+    """
+    remote_files = list_remote_files(dbx, '/' + data_type)
+    changed = {}
+    for metadata in remote_files.values():
+        local_path = get_local_path(metadata.path_display)
+        if not _is_same(local_path, metadata):
+            changed[metadata.path_display] = local_path
+    unchanged = len(remote_files) - len(changed)
+    return _transfer(download_file, [(dbx, dropbox_path, local_path) for dropbox_path, local_path in changed.items()],
+                     unchanged, 'Downloading', workers)
+
+
+def _is_same(local_path: str, metadata: Optional[FileMetadata]) -> bool:
+    """
+    Check if a local file and a Dropbox file have the same contents. The sizes are compared first so most changed
+    files are found without hashing them.
+    """
+    if metadata is None or not os.path.exists(local_path):
+        return False
+    if os.path.getsize(local_path) != metadata.size:
+        return False
+    return get_content_hash(local_path) == metadata.content_hash
+
+
+def _transfer(transfer_file: callable, transfers: list, unchanged: int, verb: str, workers: int) -> dict:
+    """
+    Run file transfers in a thread pool, printing each one as it finishes. A failed transfer is printed and counted
+    instead of stopping the others.
+
+    :param transfer_file: upload_file or download_file
+    :param transfers: a list of argument tuples for transfer_file, the last argument is where the file goes
+    :param unchanged: the number of files that did not need to be transferred
+    :param verb: 'Uploading' or 'Downloading', for the printed messages
+    :param workers: the number of transfers run at once
+    :return: a dict with the number of files 'transferred', 'unchanged', and 'failed'
+    """
+    counts = {'transferred': 0, 'unchanged': unchanged, 'failed': 0}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = [(arguments[-1], executor.submit(_transfer_with_retries, transfer_file, arguments))
+                   for arguments in transfers]
+        for destination, future in futures:
+            try:
+                future.result()
+                counts['transferred'] += 1
+                print('{verb} to {destination}... complete'.format(verb=verb, destination=destination))
+            except (DropboxException, requests.RequestException, OSError) as e:
+                counts['failed'] += 1
+                print('{verb} to {destination}... failed: {error}'.format(verb=verb, destination=destination, error=e))
+    print('{transferred} files transferred, {unchanged} unchanged, {failed} failed'.format(**counts))
+    return counts
+
+
+def _transfer_with_retries(transfer_file: callable, arguments: tuple) -> None:
+    """
+    Transfer a file, trying again when Dropbox rate limits it. Dropbox's backoff is used as the wait when it sends
+    one, otherwise the wait doubles from RETRY_SLEEP each try.
+
+    :param transfer_file: upload_file or download_file
+    :param arguments: the argument tuple for transfer_file
+    :return: None
+    """
+    for tries in range(TRY_LIMIT):
+        try:
+            transfer_file(*arguments)
+            return
+        except RateLimitError as e:
+            if tries + 1 == TRY_LIMIT:
+                raise
+            time.sleep(min(MAX_RETRY_SLEEP, e.backoff if e.backoff is not None else RETRY_SLEEP * 2 ** tries))
@@ -0,0 +1,92 @@
+"""
+An asyncio based engine for fetching many pages concurrently. Results are always delivered in the order their urls
+were submitted, so scrapers that write csv files in order can use it without changing their output.
+"""
+import asyncio
+import collections
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator
+from urllib.parse import urlparse
+
+DEFAULT_CONCURRENCY = 8  # maximum number of requests in flight to a single host
+DEFAULT_WINDOW_SIZE = 32  # maximum number of urls scheduled ahead of the one being delivered
+
+
+class FetchEngine:
+    """
+    Fetch a batch of urls concurrently with a blocking fetch function. The fetch function is run in a thread pool and
+    the number of requests in flight to each host is bounded by an asyncio semaphore.
+    """
+
+    def __init__(self, fetch: callable, concurrency: int = DEFAULT_CONCURRENCY,
+                 window_size: int = DEFAULT_WINDOW_SIZE) -> None:
+        """
+        Initialize the fetch engine.
+
+        :param fetch: a blocking function that takes a url and returns the fetched result for that url
+        :param concurrency: the maximum number of requests in flight to a single host
+        :param window_size: the maximum number of urls fetched ahead of the result currently being delivered, this
+        bounds the number of pages held in memory at once
+        """
+        self.fetch = fetch
+        self.concurrency = max(1, concurrency)
+        self.window_size = max(self.concurrency, window_size)
+
+    def fetch_all(self, urls: Iterable[str]) -> Iterator:
+        """
+        Fetch every url and yield the results in the same order as the urls. Pages further ahead in the batch keep
+        downloading while the caller works on the current result.
+
+        :param urls: the urls to fetch, consumed lazily
+        :return: an iterator over the result of the fetch function for each url
+        """
+        loop = asyncio.new_event_loop()
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=self.window_size))
+        results = self._fetch_ordered(urls)
+        try:
+            while True:
+                try:
+                    yield loop.run_until_complete(results.__anext__())
+                except StopAsyncIteration:
+                    break
+        finally:
+            loop.run_until_complete(results.aclose())
+            loop.run_until_complete(loop.shutdown_default_executor())
+            loop.close()
+
+    async def _fetch_ordered(self, urls: Iterable[str]):
+        """
+        Schedule up to window_size fetches at a time and yield their results in submission order.
+
+        :param urls: the urls to fetch
+        :return: an async generator over the fetched results
+        """
+        semaphores = {}
+        url_iterator = iter(urls)
+        pending = collections.deque(asyncio.ensure_future(self._fetch_one(url, semaphores))
+                                    for url in itertools.islice(url_iterator, self.window_size))
+        try:
+            while pending:
+                result = await pending.popleft()
+                for url in itertools.islice(url_iterator, 1):
+                    pending.append(asyncio.ensure_future(self._fetch_one(url, semaphores)))
+                yield result
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def _fetch_one(self, url: str, semaphores: dict):
+        """
+        Fetch a single url in the thread pool once a slot for its host is free.
+
+        :param url: the url to fetch
+        :param semaphores: a dict of host names to the semaphore bounding requests to that host
+        :return: the result of the fetch function
+        """
+        host = urlparse(url).netloc
+        if host not in semaphores:
+            semaphores[host] = asyncio.Semaphore(self.concurrency)
+        async with semaphores[host]:
+            return await asyncio.get_running_loop().run_in_executor(None, self.fetch, url)
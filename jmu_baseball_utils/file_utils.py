@@ -3,28 +3,51 @@ File containing multiple helper methods for the scraped csv data.
 """
 import os
 import pathlib
+import threading
 
 import unicodecsv
 from dropbox import Dropbox
 
+from jmu_baseball_utils import columnar_storage
+from jmu_baseball_utils import compressed_files
+from jmu_baseball_utils import csv_offset_index
 from jmu_baseball_utils import data_utils
 
+PACKAGE_DIRECTORY = str(pathlib.Path(__file__).parent.absolute())
+
+_created_directories = set()  # directories get_path already made sure exist
+_file_indexes = {}  # (file name, index function name) -> ((modification time, size), index)
+_offset_indexes = {}  # csv file name -> CsvOffsetIndex
+_file_indexes_lock = threading.Lock()
+
 
 def get_path(file_path: str) -> str:
     """
-    Get the absolute file path starting with this package's home folder. Creates the path if it does not exist.
+    Get the absolute file path starting with this package's home folder. Creates the path if it does not exist. Each
+    directory is only checked the first time it is seen, call clear_path_cache if directories are deleted while
+    running.
     
     :param file_path: the file path string
     :return: the specified file path appended to the absolute file path to this package's home folder
     """
-    dir_path = pathlib.Path(__file__).parent.absolute()
-    path = os.path.join(dir_path, file_path)
+    path = os.path.join(PACKAGE_DIRECTORY, file_path)
     
-    if not os.path.exists(path):
-        os.makedirs(os.path.dirname(path))
+    directory = os.path.dirname(path)
+    if directory not in _created_directories:
+        os.makedirs(directory, exist_ok=True)
+        _created_directories.add(directory)
     return path
 
 
+def clear_path_cache() -> None:
+    """
+    Forget which directories get_path has already made, so they are checked and made again if needed.
+    
+    :return: None
+    """
+    _created_directories.clear()
+
+
 def get_num_file_lines(file_name: str) -> int:
     """
     Get the number of lines in a file.
@@ -33,7 +56,7 @@ def get_num_file_lines(file_name: str) -> int:
     :return: the number of lines in the file, or 0 if it does not exist
     """
     if os.path.exists(file_name):
-        with open(file_name) as game_info_file:
+        with open_scrape_file(file_name, 'rb') as game_info_file:
             num_lines = sum(1 for row in game_info_file)
     else:
         num_lines = 0
@@ -56,6 +79,15 @@ def get_school_id_file_name() -> str:
     return get_path('../scraped-data/school_ids.csv')
 
 
+def get_copy_file_name(data_type: str) -> str:
+    """
+    Get the file path of a csv kept from a database copy.
+    :param data_type: the type of the copied data, such as 'conferences' or 'box_score_hitting'
+    :return: a string in the form: "copy-files/{data_type}.csv
+    """
+    return get_path('../copy-files/{data_type}.csv'.format(data_type=data_type))
+
+
 def get_logos_directory() -> str:
     """
     Get the directory of the logo images.
@@ -79,11 +111,148 @@ def get_scrape_file_name(year: int, division: int, stat_type: str) -> str:
     :param year: the year of this data
     :param division: the division of this data
     :param stat_type: the type of this data
-    :return: a string in the form: "scraped-data/{year}/division_{division}/{type}.csv
+    :return: a string in the form: "scraped-data/{year}/division_{division}/{type}.csv, followed by .gz or .zst if
+    the file is compressed. An existing file keeps its compression, a new file gets the default compression.
     """
     path = get_path('../scraped-data/{year}/division_{division}/'.format(year=year,
                                                                          division=division))
-    return '{path}/{type}.csv'.format(path=path, type=stat_type)
+    file_name = '{path}/{type}.csv'.format(path=path, type=stat_type)
+    for extension in [''] + list(compressed_files.EXTENSIONS.values()):
+        if os.path.exists(file_name + extension):
+            return file_name + extension
+    default_compression = compressed_files.get_default_compression()
+    if default_compression is None:
+        return file_name
+    return file_name + compressed_files.EXTENSIONS[default_compression]
+
+
+def open_scrape_file(file_name: str, mode: str = 'rb'):
+    """
+    Open a scrape file, compressing or decompressing it if its name ends with .gz or .zst. Compressed files are
+    written one complete block per flush, so appending to them and cutting them back to a flushed size work the same as
+    they do for csv files.
+    
+    :param file_name: a file name from get_scrape_file_name
+    :param mode: 'rb', 'wb', or 'ab'
+    :return: a binary file object
+    """
+    return compressed_files.open_file(file_name, mode)
+
+
+def scrape_file_exists(year: int, division: int, stat_type: str) -> bool:
+    """
+    Check if a scrape file exists for this data's year, division, and type, compressed or not.
+    
+    :param year: the year of this data
+    :param division: the division of this data
+    :param stat_type: the type of this data
+    :return: True if the file exists
+    """
+    return os.path.exists(get_scrape_file_name(year, division, stat_type))
+
+
+def get_columnar_file_name(year: int, division: int, stat_type: str, storage_format: str) -> str:
+    """
+    Get the columnar file name for this data's year, division, stat type, and storage format.
+    
+    :param year: the year of this data
+    :param division: the division of this data
+    :param stat_type: the stat type of this data
+    :param storage_format: 'parquet' or 'arrow'
+    :return: a string in the form: "scraped-data/{year}/division_{division}/{stat_type}.{storage_format}
+    """
+    path = get_path('../scraped-data/{year}/division_{division}/'.format(year=year, division=division))
+    return '{path}/{stat_type}.{storage_format}'.format(path=path, stat_type=stat_type, storage_format=storage_format)
+
+
+def write_columnar_file(year: int, division: int, stat_type: str, storage_format: str) -> str:
+    """
+    Write a typed, compressed columnar copy of a scraped csv next to it. Needs pyarrow installed.
+    
+    :param year: the year of this data
+    :param division: the division of this data
+    :param stat_type: the stat type of this data
+    :param storage_format: 'parquet' or 'arrow'
+    :return: the columnar file name
+    """
+    columnar_storage.check_format(storage_format)
+    columnar_file_name = get_columnar_file_name(year, division, stat_type, storage_format)
+    table = columnar_storage.read_csv_table(get_scrape_file_name(year, division, stat_type))
+    columnar_storage.write_table(table, columnar_file_name, storage_format)
+    return columnar_file_name
+
+
+def read_scrape_table(year: int, division: int, stat_type: str, columns: list = None):
+    """
+    Read scraped data as a typed pyarrow Table. A columnar copy is read if there is one at least as new as the csv,
+    otherwise the csv is read and typed the same way. Needs pyarrow installed.
+    
+    :param year: the year of this data
+    :param division: the division of this data
+    :param stat_type: the stat type of this data
+    :param columns: the names of the columns to read, defaults to every column
+    :return: a pyarrow Table
+    """
+    csv_file_name = get_scrape_file_name(year, division, stat_type)
+    csv_time = os.path.getmtime(csv_file_name) if os.path.exists(csv_file_name) else 0
+    for storage_format in columnar_storage.STORAGE_FORMATS:
+        columnar_file_name = get_columnar_file_name(year, division, stat_type, storage_format)
+        if os.path.exists(columnar_file_name) and os.path.getmtime(columnar_file_name) >= csv_time:
+            return columnar_storage.read_table(columnar_file_name, storage_format, columns)
+    table = columnar_storage.read_csv_table(csv_file_name)
+    return table.select(columns) if columns is not None else table
+
+
+def iter_scrape_rows(year: int, division: int, stat_type: str, columns: list = None):
+    """
+    Iterate over scraped data as typed row dicts, read the same way as read_scrape_table. Numbers come back as ints or
+    floats and empty values come back as None.
+    
+    :param year: the year of this data
+    :param division: the division of this data
+    :param stat_type: the stat type of this data
+    :param columns: the names of the columns to read, defaults to every column
+    :return: an iterator of row dicts
+    """
+    return columnar_storage.iter_rows(read_scrape_table(year, division, stat_type, columns))
+
+
+def get_manifest_file_name(year: int, division: int, artifact: str) -> str:
+    """
+    Get the resume manifest file name for this data's year, division, and artifact.
+    
+    :param year: the year of this data
+    :param division: the division of this data
+    :param artifact: the artifact the manifest tracks
+    :return: a string in the form: "scraped-data/{year}/division_{division}/manifests/{artifact}.manifest
+    """
+    path = get_path('../scraped-data/{year}/division_{division}/manifests/'.format(year=year, division=division))
+    return '{path}/{artifact}.manifest'.format(path=path, artifact=artifact)
+
+
+def get_offset_index_file_name(year: int, division: int, stat_type: str) -> str:
+    """
+    Get the byte offset index file name for this data's year, division, and stat type.
+    
+    :param year: the year of this data
+    :param division: the division of this data
+    :param stat_type: the stat type of the csv the index is for
+    :return: a string in the form: "scraped-data/{year}/division_{division}/indexes/{stat_type}.index
+    """
+    path = get_path('../scraped-data/{year}/division_{division}/indexes/'.format(year=year, division=division))
+    return '{path}/{stat_type}.index'.format(path=path, stat_type=stat_type)
+
+
+def get_name_resolution_file_name(year: int, division: int) -> str:
+    """
+    Get the file name of the play by play name resolutions saved for this data's year and division.
+    
+    :param year: the year of this data
+    :param division: the division of this data
+    :return: a string in the form: "scraped-data/{year}/division_{division}/name_resolutions.csv
+    """
+    path = get_path('../scraped-data/{year}/division_{division}/'.format(year=year, division=division))
+    return '{path}/name_resolutions.csv'.format(path=path)
 
 
 def get_hit_location_file_name(year: int, division: int, conference: str, school_name: str) -> str:
@@ -150,11 +319,7 @@ def get_conference_name(year: int, division: int, school_name: str) -> str:
     :return: the conference name
     """
     conference_teams_file_name = get_scrape_file_name(year, division, 'conference_teams')
-    with open(conference_teams_file_name, 'rb') as conference_teams_file:
-        reader = unicodecsv.DictReader(conference_teams_file)
-        for team in reader:
-            if team['school_name'] == school_name:
-                conference_name = team['conference_name']
+    conference_name = _get_file_index(conference_teams_file_name, _index_conferences).get(school_name, '')
     if conference_name == '':
         print('team not found: {}'.format(school_name))
         exit(-1)
@@ -170,14 +335,8 @@ def get_game_ids(year: int, division: int, school_name: str) -> set:
     :param school_name: the name of the school
     :return: a set of game ids
     """
-    all_game_ids = set()
     schedule_file_name = get_scrape_file_name(year, division, 'game_info')
-    with open(schedule_file_name, 'rb') as schedule_file:
-        reader = unicodecsv.DictReader(schedule_file)
-        for line in reader:
-            if line['away_school_name'] == school_name or line['home_school_name'] == school_name:
-                all_game_ids.add(line['game_id'])
-    return all_game_ids
+    return {line['game_id'] for line in _get_file_index(schedule_file_name, _index_schedules).get(school_name, [])}
 
 
 def get_roster(year: int, division: int, school_name: str) -> dict:
@@ -189,16 +348,9 @@ def get_roster(year: int, division: int, school_name: str) -> dict:
     :param school_name: the name of the school
     :return: a dict in this format: {player_id: {'first_name': first name, 'last_name': last name}}
     """
-    roster = dict()
     roster_file_name = get_scrape_file_name(year, division, 'rosters')
-    with open(roster_file_name, 'rb') as roster_file:
-        reader = unicodecsv.DictReader(roster_file)
-        for line in reader:
-            if line['school_name'] == school_name:
-                first_name, last_name, suffix = data_utils.split_name(line['Player'])
-                roster.update({line['player_id']: {'first_name': first_name,
-                                                   'last_name': last_name}})
-    return roster
+    roster = _get_file_index(roster_file_name, _index_rosters).get(school_name, {})
+    return {player_id: dict(name) for player_id, name in roster.items()}
 
 
 def get_school_schedule(year: int, division: int, school_name: str) -> list:
@@ -210,14 +362,8 @@ def get_school_schedule(year: int, division: int, school_name: str) -> list:
     :param school_name: the name of the school
     :return: a list of game info dicts
     """
-    game_info = []
     game_info_file_name = get_scrape_file_name(year, division, 'game_info')
-    with open(game_info_file_name, 'rb') as game_info_file:
-        game_info_reader = unicodecsv.DictReader(game_info_file)
-        for line in game_info_reader:
-            if line['away_school_name'] == school_name or line['home_school_name'] == school_name:
-                game_info.append(line)
-    return game_info
+    return [dict(line) for line in _get_file_index(game_info_file_name, _index_schedules).get(school_name, [])]
 
 
 def get_school_play_by_play(year: int, division: int, school_name: str) -> dict:
@@ -230,20 +376,32 @@ def get_school_play_by_play(year: int, division: int, school_name: str) -> dict:
     :return: a dict of play by play line lists in the format:
     {game_id: [[line_1_info], [line_2_info]...]}
     """
-    play_by_play = {}
-    game_ids = {game['game_id'] for game in get_school_schedule(year, division, school_name)}
+    game_ids = get_game_ids(year, division, school_name)
+    play_by_play_file_name = get_scrape_file_name(year, division, 'play_by_play')
+    if compressed_files.get_compression(play_by_play_file_name) is None:
+        return get_play_by_play_index(year, division).get_rows(game_ids)
+    
+    # byte offsets only work in an uncompressed file, so a compressed file is read through once and kept in memory
+    play_by_play, positions = _get_file_index(play_by_play_file_name, _index_play_by_play)
+    return {game_id: [dict(line) for line in play_by_play[game_id]]
+            for game_id in _in_file_order(game_ids, positions)}
+
+
+def get_play_by_play_index(year: int, division: int) -> csv_offset_index.CsvOffsetIndex:
+    """
+    Get the byte offset index of the play by play file for this year and division, which reads the play by play of
+    single games without parsing the whole file.
+    
+    :param year: the year
+    :param division: the division
+    :return: the play by play file's index, shared by every caller in this process
+    """
     play_by_play_file_name = get_scrape_file_name(year, division, 'play_by_play')
-    with open(play_by_play_file_name, 'rb') as play_by_play_file:
-        play_by_play_reader = unicodecsv.DictReader(play_by_play_file)
-        for line in play_by_play_reader:
-            if line['game_id'] in game_ids:
-                if line['game_id'] in play_by_play:
-                    current_pbp = play_by_play[line['game_id']]
-                    current_pbp.append(line)
-                    play_by_play[line['game_id']] = current_pbp
-                else:
-                    play_by_play.update({line['game_id']: [line]})
-    return play_by_play
+    with _file_indexes_lock:
+        if play_by_play_file_name not in _offset_indexes:
+            _offset_indexes[play_by_play_file_name] = csv_offset_index.CsvOffsetIndex(
+                play_by_play_file_name, get_offset_index_file_name(year, division, 'play_by_play'), 'game_id')
+        return _offset_indexes[play_by_play_file_name]
 
 
 def get_lineups(year: int, division: int, school_name: str) -> dict:
@@ -258,18 +416,106 @@ def get_lineups(year: int, division: int, school_name: str) -> dict:
     {game_id: {school_name: [{'first_name': first name, 'last_name': last_name, 'player_id': player id}, ...]}}
     """
     all_game_ids = get_game_ids(year, division, school_name)
-    
-    all_lineups = dict()
     box_score_file_name = get_scrape_file_name(year, division, 'box_score_hitting')
-    with open(box_score_file_name, 'rb') as box_score_file:
-        reader = unicodecsv.DictReader(box_score_file)
-        for line in reader:
-            if line['game_id'] in all_game_ids and line['Player'] != 'Totals':
-                game_lineup = all_lineups.get(line['game_id'], {})
-                team_lineup = game_lineup.get(line['school_name'], [])
-                first_name, last_name, suffix = data_utils.split_name(line['Player'])
-                team_lineup.append({'first_name': first_name, 'last_name': last_name,
-                                    'player_id': line['player_id']})
-                game_lineup.update({line['school_name']: team_lineup})
-                all_lineups.update({line['game_id']: game_lineup})
-    return all_lineups
+    all_lineups, positions = _get_file_index(box_score_file_name, _index_lineups)
+    return {game_id: {team: [dict(player) for player in team_lineup]
+                      for team, team_lineup in all_lineups[game_id].items()}
+            for game_id in _in_file_order(all_game_ids, positions)}
+
+
+def clear_file_indexes() -> None:
+    """
+    Forget every file index held in memory, so the next lookup in each file reads it again.
+    
+    :return: None
+    """
+    with _file_indexes_lock:
+        _file_indexes.clear()
+        _offset_indexes.clear()
+
+
+def _get_file_index(file_name: str, build_index: callable):
+    """
+    Get an index of a season csv file, building it the first time it is needed and again whenever the file's
+    modification time or size changes.
+    
+    :param file_name: the csv file
+    :param build_index: a function that takes the open csv file and returns its index
+    :return: the index returned by build_index
+    """
+    file_stat = os.stat(file_name)
+    signature = (file_stat.st_mtime_ns, file_stat.st_size)
+    key = (file_name, build_index.__name__)
+    with _file_indexes_lock:
+        cached = _file_indexes.get(key)
+        if cached is None or cached[0] != signature:
+            with open_scrape_file(file_name, 'rb') as file:
+                cached = (signature, build_index(file))
+            _file_indexes[key] = cached
+        return cached[1]
+
+
+def _in_file_order(keys: set, positions: dict) -> list:
+    """
+    Get the keys that are in an index, in the order they first appeared in its file.
+    
+    :param keys: the keys to look for
+    :param positions: a dict of every key in the index to the order it first appeared in the file
+    :return: a list of keys
+    """
+    return sorted((key for key in keys if key in positions), key=positions.get)
+
+
+def _index_conferences(conference_teams_file) -> dict:
+    """
+    :return: a dict of school names to conference names
+    """
+    return {team['school_name']: team['conference_name'] for team in unicodecsv.DictReader(conference_teams_file)}
+
+
+def _index_schedules(game_info_file) -> dict:
+    """
+    :return: a dict of school names to a list of the game info lines for each game the school played
+    """
+    schedules = {}
+    for line in unicodecsv.DictReader(game_info_file):
+        for school_name in {line['away_school_name'], line['home_school_name']}:
+            schedules.setdefault(school_name, []).append(line)
+    return schedules
+
+
+def _index_rosters(roster_file) -> dict:
+    """
+    :return: a dict of school names to rosters in the format {player_id: {'first_name': first, 'last_name': last}}
+    """
+    rosters = {}
+    for line in unicodecsv.DictReader(roster_file):
+        first_name, last_name, suffix = data_utils.split_name(line['Player'])
+        rosters.setdefault(line['school_name'], {})[line['player_id']] = {'first_name': first_name,
+                                                                          'last_name': last_name}
+    return rosters
+
+
+def _index_play_by_play(play_by_play_file) -> tuple:
+    """
+    :return: a dict of game ids to the play by play lines of the game, and a dict of game ids to the order they
+    appear in the file
+    """
+    play_by_play = {}
+    for line in unicodecsv.DictReader(play_by_play_file):
+        play_by_play.setdefault(line['game_id'], []).append(line)
+    return play_by_play, {game_id: position for position, game_id in enumerate(play_by_play)}
+
+
+def _index_lineups(box_score_file) -> tuple:
+    """
+    :return: a dict of game ids to lineups in the format {school_name: [player dicts]}, and a dict of game ids to the
+    order they appear in the file
+    """
+    all_lineups = {}
+    for line in unicodecsv.DictReader(box_score_file):
+        if line['Player'] != 'Totals':
+            first_name, last_name, suffix = data_utils.split_name(line['Player'])
+            all_lineups.setdefault(line['game_id'], {}).setdefault(line['school_name'], []).append(
+                {'first_name': first_name, 'last_name': last_name, 'player_id': line['player_id']})
+    return all_lineups, {game_id: position for position, game_id in enumerate(all_lineups)}
@@ -0,0 +1,168 @@
+"""
+Pluggable html parser backends for scraped pages. Every backend returns an object that supports the select,
+select_one, text, and attrs access patterns the scrapers use. The BeautifulSoup backends return a full BeautifulSoup
+object, the selectolax backend returns a light wrapper that only supports those four.
+"""
+import importlib.util
+from typing import Optional
+
+from bs4 import BeautifulSoup
+
+HTML_PARSER = 'html.parser'  # BeautifulSoup with python's built in parser, always available
+LXML = 'lxml'  # BeautifulSoup with the lxml parser, needs lxml installed
+SELECTOLAX = 'selectolax'  # selectolax's lexbor engine behind a select/select_one wrapper, needs selectolax installed
+PARSER_BACKENDS = (HTML_PARSER, LXML, SELECTOLAX)
+SOUP_BACKENDS = (HTML_PARSER, LXML)
+
+_default_backend = HTML_PARSER
+
+
+def is_available(backend: str) -> bool:
+    """
+    Check if the library a parser backend needs is installed.
+
+    :param backend: the name of the parser backend
+    :return: True if the backend can be used
+    """
+    if backend == HTML_PARSER:
+        return True
+    if backend == LXML:
+        return importlib.util.find_spec('lxml') is not None
+    if backend == SELECTOLAX:
+        return importlib.util.find_spec('selectolax') is not None
+    return False
+
+
+def get_available_backends() -> list:
+    """
+    Get every parser backend that can be used with the installed libraries.
+
+    :return: a list of parser backend names
+    """
+    return [backend for backend in PARSER_BACKENDS if is_available(backend)]
+
+
+def set_default_backend(backend: str) -> None:
+    """
+    Set the parser backend used for every page that does not specify its own.
+
+    :param backend: one of 'html.parser', 'lxml', or 'selectolax'
+    :return: None
+    """
+    global _default_backend
+    _default_backend = check_backend(backend)
+
+
+def get_default_backend() -> str:
+    """
+    Get the parser backend used for every page that does not specify its own.
+
+    :return: the default parser backend
+    """
+    return _default_backend
+
+
+def get_soup_backend() -> str:
+    """
+    Get a parser backend that returns a full BeautifulSoup object, for scrapers that need more than select and
+    select_one (find_all, findNext, contents). This is the default backend unless the default is selectolax, in which
+    case lxml is used if it is installed.
+
+    :return: the name of a BeautifulSoup parser backend
+    """
+    if _default_backend in SOUP_BACKENDS:
+        return _default_backend
+    if is_available(LXML):
+        return LXML
+    return HTML_PARSER
+
+
+def check_backend(backend: Optional[str]) -> str:
+    """
+    Make sure a parser backend is valid and installed, falling back to the default backend if it is None.
+
+    :param backend: the parser backend to check
+    :return: the parser backend
+    """
+    if backend is None:
+        return _default_backend
+    if backend not in PARSER_BACKENDS:
+        raise ValueError('Unknown parser backend {backend}, must be one of {backends}'
+                         .format(backend=backend, backends=', '.join(PARSER_BACKENDS)))
+    if not is_available(backend):
+        raise ValueError('Parser backend {backend} is not installed'.format(backend=backend))
+    return backend
+
+
+def parse(page_text: str, backend: str = None):
+    """
+    Parse the text of a page with a parser backend.
+
+    :param page_text: the html text of the page
+    :param backend: the parser backend to use, defaults to the default backend
+    :return: a BeautifulSoup object for the BeautifulSoup backends, or a SelectolaxNode for the selectolax backend
+    """
+    backend = check_backend(backend)
+    if backend == SELECTOLAX:
+        from selectolax.parser import HTMLParser
+        return SelectolaxNode(HTMLParser(page_text).root)
+    return BeautifulSoup(page_text, backend)
+
+
+class SelectolaxNode:
+    """
+    A wrapper around a selectolax node with the same select, select_one, text, and attrs behavior as a BeautifulSoup
+    tag.
+    """
+
+    __slots__ = ['node']
+
+    def __init__(self, node) -> None:
+        """
+        Wrap a selectolax node.
+
+        :param node: the selectolax node
+        """
+        self.node = node
+
+    def select(self, selector: str, *args) -> list:
+        """
+        Get every descendant that matches a css selector.
+
+        :param selector: the css selector
+        :return: a list of matching nodes
+        """
+        return [SelectolaxNode(node) for node in self.node.css(selector)]
+
+    def select_one(self, selector: str, *args) -> Optional['SelectolaxNode']:
+        """
+        Get the first descendant that matches a css selector.
+
+        :param selector: the css selector
+        :return: the first matching node, or None if nothing matches
+        """
+        node = self.node.css_first(selector)
+        if node is None:
+            return None
+        return SelectolaxNode(node)
+
+    @property
+    def text(self) -> str:
+        """
+        Get all text inside this node.
+
+        :return: the text of this node and its descendants
+        """
+        return self.node.text(deep=True)
+
+    @property
+    def attrs(self) -> dict:
+        """
+        Get the attributes of this node. Like BeautifulSoup, the class attribute is split into a list.
+
+        :return: a dict of attribute names to values
+        """
+        attributes = dict(self.node.attributes)
+        if attributes.get('class') is not None:
+            attributes['class'] = attributes['class'].split()
+        return attributes
@@ -0,0 +1,72 @@
+"""
+A shared, pooled http session for every scraper. Connections are kept alive and reused between requests so each page
+does not pay for a new TCP and TLS handshake.
+"""
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_POOL_SIZE = 32  # maximum number of connections kept open to a single host
+DEFAULT_HEADERS = {'User-Agent': 'Mozilla/5.0'}
+
+_session = None
+_pool_size = DEFAULT_POOL_SIZE
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """
+    Get the shared session, creating it the first time this is called. The session is safe to use from multiple
+    threads at once, connections to each host are handed out from a pool of at most pool_size connections.
+
+    :return: the shared requests session
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = _create_session(_pool_size)
+        return _session
+
+
+def configure_session(pool_size: int = DEFAULT_POOL_SIZE) -> None:
+    """
+    Set the connection pool size of the shared session. Closes the current session if one is open, the next call to
+    get_session will create a new one with the new pool size.
+
+    :param pool_size: the maximum number of connections kept open to a single host
+    :return: None
+    """
+    global _pool_size
+    close_session()
+    with _session_lock:
+        _pool_size = pool_size
+
+
+def close_session() -> None:
+    """
+    Close the shared session and all of its pooled connections.
+
+    :return: None
+    """
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+def _create_session(pool_size: int) -> requests.Session:
+    """
+    Create a session with keep-alive connection pools for both http and https.
+
+    :param pool_size: the maximum number of connections kept open to a single host
+    :return: the new session
+    """
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
+    # pool_block makes extra threads wait for a free connection instead of opening throwaway ones
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, pool_block=True)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
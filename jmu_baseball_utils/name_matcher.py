@@ -0,0 +1,281 @@
+"""
+A prebuilt matcher for finding which player on a roster a play by play name refers to. It returns the same result as
+data_utils.get_player_id_from_name, but builds each roster's normalized names and an index of their three letter pieces
+once, so each lookup only compares the name against players that share part of it, and caches the Jaro-Winkler
+similarities it uses to break ties.
+
+The same spellings of a player's name show up in every game he plays, so NameResolutionCache remembers each team's
+resolved names, and can save them to a csv so a later run over the same season does not resolve them again.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from difflib import SequenceMatcher
+from typing import Optional
+
+import unicodecsv
+from strsimpy.jaro_winkler import JaroWinkler
+
+GRAM_SIZE = 3  # length of the name pieces in the index
+AUTOJUNK_LENGTH = 200  # names this long are matched with SequenceMatcher, whose junk heuristic starts at this length
+DEFAULT_CACHE_SIZE = 100000  # number of resolved names a NameResolutionCache keeps in memory
+RESOLUTION_HEADER = ['team', 'roster_version', 'pbp_name', 'player_id', 'length', 'similarity']
+
+jaro_winkler = JaroWinkler()
+
+
+class RosterNameMatcher:
+    """
+    Matches play by play names against one roster.
+    """
+
+    def __init__(self, player_dict: dict) -> None:
+        """
+        Build the matcher for a roster.
+
+        :param player_dict: a dict of players formatted like this: {player_id: {'first_name': first, 'last_name': last}}
+        """
+        self.player_ids = list(player_dict)
+        self.player_names = [name_dict['first_name'].lower() + ' ' + name_dict['last_name'].lower()
+                             for name_dict in player_dict.values()]
+        # gram -> indexes of every player whose name contains it, in roster order
+        self.gram_index = {}
+        for player_index, player_name in enumerate(self.player_names):
+            for gram in _get_grams(player_name):
+                players = self.gram_index.setdefault(gram, [])
+                if not players or players[-1] != player_index:
+                    players.append(player_index)
+        self.similarities = {}  # (player index, pbp name) -> jaro winkler similarity
+
+    def match(self, pbp_name: str) -> tuple:
+        """
+        Get the player id of the player with the name closest to the name found in the play by play: the player with
+        the longest piece of the name in common, with ties broken by the highest Jaro-Winkler similarity and then by
+        roster order.
+
+        :param pbp_name: the player name extracted from a play by play string
+        :return: a tuple of the player id of the best match, the length of that match, and the jaro winkler
+        similarity, or (None, None, None) if no player matches this name at all
+        """
+        pbp_name = pbp_name.lower()
+        # a player with a common piece at least GRAM_SIZE long shares a gram with the name, so if any player shares a
+        # gram the longest matches are all among them. Otherwise every player has to be checked
+        candidates = set()
+        for gram in _get_grams(pbp_name):
+            candidates.update(self.gram_index.get(gram, ()))
+        if not candidates:
+            candidates = range(len(self.player_names))
+
+        length = 0
+        best_players = []
+        for player_index in sorted(candidates):
+            new_length = _get_longest_match(pbp_name, self.player_names[player_index])
+            if new_length > length:
+                length = new_length
+                best_players = [player_index]
+            elif new_length == length:
+                best_players.append(player_index)
+        if length == 0:
+            return None, None, None
+
+        # the first player with the highest similarity, the same one a running comparison in roster order ends on
+        best_player = best_players[0]
+        best_similarity = self._get_similarity(best_player, pbp_name)
+        for player_index in best_players[1:]:
+            similarity = self._get_similarity(player_index, pbp_name)
+            if similarity > best_similarity:
+                best_player = player_index
+                best_similarity = similarity
+        return self.player_ids[best_player], length, best_similarity
+
+    def _get_similarity(self, player_index: int, pbp_name: str) -> float:
+        """
+        Get the Jaro-Winkler similarity between a player's name and a lower case play by play name.
+        """
+        key = (player_index, pbp_name)
+        if key not in self.similarities:
+            self.similarities[key] = jaro_winkler.similarity(self.player_names[player_index], pbp_name)
+        return self.similarities[key]
+
+
+def _get_grams(name: str) -> set:
+    """
+    Get every piece of a name that is GRAM_SIZE characters long.
+    """
+    return {name[i:i + GRAM_SIZE] for i in range(len(name) - GRAM_SIZE + 1)}
+
+
+def _get_longest_match(pbp_name: str, player_name: str) -> int:
+    """
+    Get the length of the longest piece two names have in common, the same size SequenceMatcher.find_longest_match
+    finds. For each starting point in pbp_name only pieces longer than the best so far are tried, so this needs about
+    one substring search per character.
+
+    :param pbp_name: the lower case play by play name
+    :param player_name: the lower case player name
+    :return: the length of the longest common substring
+    """
+    if len(player_name) >= AUTOJUNK_LENGTH:
+        return SequenceMatcher(a=pbp_name, b=player_name).find_longest_match(0, len(pbp_name), 0,
+                                                                             len(player_name)).size
+    longest = 0
+    for start in range(len(pbp_name)):
+        while start + longest < len(pbp_name) and pbp_name[start:start + longest + 1] in player_name:
+            longest += 1
+    return longest
+
+
+class NameResolutionCache:
+    """
+    A least recently used cache of resolved play by play names, keyed by team, normalized name, and roster version.
+    The roster version is a hash of the roster in order, so a changed roster never gets the results of the old one.
+    Names are normalized to lower case, the only normalization that never changes a match. It is safe to use from
+    several threads at once.
+    """
+
+    def __init__(self, file_name: Optional[str] = None, max_size: int = DEFAULT_CACHE_SIZE) -> None:
+        """
+        Initialize the cache, loading the names saved in file_name.
+
+        :param file_name: the csv resolved names are saved to and loaded from, such as
+        file_utils.get_name_resolution_file_name(year, division), or None to only keep them in memory
+        :param max_size: the number of resolved names kept in memory
+        """
+        self.file_name = file_name
+        self.max_size = max_size
+        self.resolutions = OrderedDict()  # (team, pbp name, roster version) -> (player id, length, similarity)
+        self.unsaved = []  # (key, resolution) of the names resolved since the last save
+        self.rosters = {}  # team -> (roster items, roster version, matcher)
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        if file_name is not None and os.path.exists(file_name):
+            self._load()
+
+    def get_player_id_from_name(self, team, pbp_name: str, player_dict: dict) -> tuple:
+        """
+        Get the player id of the player with the name closest to the name found in the play by play, the same as
+        data_utils.get_player_id_from_name, using the saved result if this name was already resolved for this roster.
+
+        :param team: the school name or id the roster belongs to
+        :param pbp_name: the player name extracted from a play by play string
+        :param player_dict: a dict of players formatted like this: {player_id: {'first_name': first, 'last_name': last}}
+        :return: a tuple of the player id of the best match, the length of that match, and the jaro winkler
+        similarity, or (None, None, None) if no player matches this name at all
+        """
+        pbp_name = pbp_name.lower()
+        with self.lock:
+            roster_version, matcher = self._get_roster(team, player_dict)
+            key = (str(team), pbp_name, roster_version)
+            resolution = self.resolutions.get(key)
+            if resolution is not None:
+                self.hits += 1
+                self.resolutions.move_to_end(key)
+                if resolution[0] is not None and resolution[0] not in player_dict:
+                    # saved results have their player ids as strings, so they are matched back to the roster's ids
+                    player_id = next(player_id for player_id in player_dict if str(player_id) == resolution[0])
+                    resolution = (player_id,) + resolution[1:]
+                    self.resolutions[key] = resolution
+                return resolution
+            self.misses += 1
+            resolution = matcher.match(pbp_name)
+            self._add(key, resolution)
+            self.unsaved.append((key, resolution))
+            return resolution
+
+    def save(self) -> None:
+        """
+        Append the names resolved since the last save to the cache's file.
+
+        :return: None
+        """
+        with self.lock:
+            if self.file_name is None or not self.unsaved:
+                return
+            with open(self.file_name, 'ab') as file:
+                writer = unicodecsv.writer(file)
+                if file.tell() == 0:
+                    writer.writerow(RESOLUTION_HEADER)
+                # the resolutions are kept with the keys, since the cache may have already dropped some of them
+                for (team, pbp_name, roster_version), (player_id, length, similarity) in self.unsaved:
+                    writer.writerow([team, roster_version, pbp_name, _to_csv(player_id), _to_csv(length),
+                                     _to_csv(similarity)])
+            self.unsaved = []
+
+    def get_stats(self) -> dict:
+        """
+        Get how well the cache is working.
+
+        :return: a dict with the number of 'hits' and 'misses', the 'hit_rate', and the number of names 'cached'
+        """
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits / lookups if lookups else 0.0,
+                    'cached': len(self.resolutions)}
+
+    def print_stats(self) -> None:
+        """
+        Print how well the cache is working.
+
+        :return: None
+        """
+        print('Name resolutions: {hits} hits, {misses} misses ({hit_rate:.1%} hit rate), {cached} cached'
+              .format(**self.get_stats()))
+
+    def _get_roster(self, team, player_dict: dict) -> tuple:
+        """
+        Get the version of a team's roster and a matcher for it, only hashing the roster and building the matcher again
+        when it is different from the last roster used for this team.
+        """
+        roster_items = list(player_dict.items())
+        cached = self.rosters.get(team)
+        if cached is not None and cached[0] == roster_items:
+            return cached[1], cached[2]
+        roster_version = get_roster_version(player_dict)
+        matcher = RosterNameMatcher(player_dict)
+        self.rosters[team] = (roster_items, roster_version, matcher)
+        return roster_version, matcher
+
+    def _add(self, key: tuple, resolution: tuple) -> None:
+        """
+        Add a resolved name, removing the least recently used one if the cache is full.
+        """
+        self.resolutions[key] = resolution
+        self.resolutions.move_to_end(key)
+        while len(self.resolutions) > self.max_size:
+            self.resolutions.popitem(last=False)
+
+    def _load(self) -> None:
+        """
+        Load the resolved names saved in the cache's file.
+        """
+        with open(self.file_name, 'rb') as file:
+            for line in unicodecsv.DictReader(file):
+                key = (line['team'], line['pbp_name'], line['roster_version'])
+                resolution = (line['player_id'] or None, int(line['length']) if line['length'] else None,
+                              float(line['similarity']) if line['similarity'] else None)
+                self._add(key, resolution)
+
+
+def get_roster_version(player_dict: dict) -> str:
+    """
+    Get a hash of a roster. The order of the players is part of it because it decides ties between equal matches.
+
+    :param player_dict: a dict of players formatted like this: {player_id: {'first_name': first, 'last_name': last}}
+    :return: the hex hash
+    """
+    roster_hash = hashlib.sha1()
+    for player_id, name_dict in player_dict.items():
+        roster_hash.update('{player_id}\t{first}\t{last}\n'.format(player_id=player_id, first=name_dict['first_name'],
+                                                                    last=name_dict['last_name']).encode('utf-8'))
+    return roster_hash.hexdigest()[:16]
+
+
+def _to_csv(value) -> str:
+    """
+    Write None as an empty value and floats so they read back exactly.
+    """
+    if value is None:
+        return ''
+    return repr(value) if isinstance(value, float) else str(value)
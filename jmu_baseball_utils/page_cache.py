@@ -0,0 +1,142 @@
+"""
+A compressed, content-addressed on-disk cache of raw page responses. Page bodies are stored once per unique content
+under 'scraped-data/page-cache/objects/' and each url points at the content it last returned through a small file
+under 'scraped-data/page-cache/urls/'. Keeping the raw pages lets a season be re-parsed without re-downloading it.
+"""
+import gzip
+import hashlib
+import os
+import tempfile
+from typing import Optional
+
+from jmu_baseball_utils import file_utils
+
+LIVE = 'live'  # always request the page, and record the response in the cache
+CACHE_FIRST = 'cache-first'  # use the cached page if there is one, otherwise request it and record it
+REPLAY_ONLY = 'replay-only'  # only use cached pages, never touch the network
+CACHE_POLICIES = (LIVE, CACHE_FIRST, REPLAY_ONLY)
+
+_default_policy = LIVE
+
+
+class CacheMissError(Exception):
+    """
+    Raised when a page is requested in replay-only mode but it is not in the cache.
+    """
+
+
+def set_default_policy(policy: str) -> None:
+    """
+    Set the cache policy used by every page request that does not specify its own.
+
+    :param policy: one of 'live', 'cache-first', or 'replay-only'
+    :return: None
+    """
+    global _default_policy
+    _default_policy = check_policy(policy)
+
+
+def get_default_policy() -> str:
+    """
+    Get the cache policy used by every page request that does not specify its own.
+
+    :return: the default cache policy
+    """
+    return _default_policy
+
+
+def check_policy(policy: Optional[str]) -> str:
+    """
+    Make sure a cache policy is valid, falling back to the default policy if it is None.
+
+    :param policy: the cache policy to check
+    :return: the cache policy
+    """
+    if policy is None:
+        return _default_policy
+    if policy not in CACHE_POLICIES:
+        raise ValueError('Unknown cache policy {policy}, must be one of {policies}'
+                         .format(policy=policy, policies=', '.join(CACHE_POLICIES)))
+    return policy
+
+
+def get_cache_directory() -> str:
+    """
+    Get the directory of the page cache.
+
+    :return: the path to the page cache directory
+    """
+    return file_utils.get_path('../scraped-data/page-cache/')
+
+
+def load(url: str) -> Optional[str]:
+    """
+    Get the cached text of a page.
+
+    :param url: the url of the page
+    :return: the text of the page, or None if the url is not in the cache
+    """
+    url_file_name = _get_url_file_name(url)
+    if not os.path.exists(url_file_name):
+        return None
+    with open(url_file_name) as url_file:
+        content_hash = url_file.read().strip()
+    object_file_name = _get_object_file_name(content_hash)
+    if not os.path.exists(object_file_name):
+        return None
+    with gzip.open(object_file_name, 'rb') as object_file:
+        return object_file.read().decode('utf-8')
+
+
+def store(url: str, text: str) -> str:
+    """
+    Add a page to the cache. The page text is only written if no other cached page has the same content.
+
+    :param url: the url of the page
+    :param text: the text of the page
+    :return: the content hash of the page
+    """
+    content = text.encode('utf-8')
+    content_hash = hashlib.sha256(content).hexdigest()
+    object_file_name = _get_object_file_name(content_hash)
+    if not os.path.exists(object_file_name):
+        _write_atomically(object_file_name, gzip.compress(content))
+    _write_atomically(_get_url_file_name(url), content_hash.encode('ascii'))
+    return content_hash
+
+
+def _get_url_file_name(url: str) -> str:
+    """
+    Get the file that holds the content hash a url points at.
+
+    :param url: the url of the page
+    :return: the url file path
+    """
+    url_hash = hashlib.sha256(url.encode('utf-8')).hexdigest()
+    path = file_utils.get_path('../scraped-data/page-cache/urls/{prefix}/'.format(prefix=url_hash[:2]))
+    return '{path}{url_hash}'.format(path=path, url_hash=url_hash)
+
+
+def _get_object_file_name(content_hash: str) -> str:
+    """
+    Get the file that holds the compressed page with this content hash.
+
+    :param content_hash: the sha256 hash of the page content
+    :return: the object file path
+    """
+    path = file_utils.get_path('../scraped-data/page-cache/objects/{prefix}/'.format(prefix=content_hash[:2]))
+    return '{path}{content_hash}.html.gz'.format(path=path, content_hash=content_hash)
+
+
+def _write_atomically(file_name: str, data: bytes) -> None:
+    """
+    Write a file through a temporary file so that other threads and later runs never see a partial file.
+
+    :param file_name: the file to write
+    :param data: the data to write
+    :return: None
+    """
+    file_descriptor, temp_file_name = tempfile.mkstemp(dir=os.path.dirname(file_name))
+    with os.fdopen(file_descriptor, 'wb') as temp_file:
+        temp_file.write(data)
+    os.replace(temp_file_name, file_name)
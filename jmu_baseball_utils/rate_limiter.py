@@ -0,0 +1,156 @@
+"""
+Shared per-host rate limiting for page requests. Each host gets a token bucket that paces requests per second and an
+AIMD (additive increase, multiplicative decrease) limit on concurrent requests. Both back off quickly when the host
+returns 5xx responses or times out, and ramp back up slowly while responses stay fast.
+"""
+import threading
+import time
+from urllib.parse import urlparse
+
+DEFAULT_RATE = 4.0  # requests per second a host starts at
+MIN_RATE = 0.5
+MAX_RATE = 20.0
+RATE_INCREASE = 0.5  # requests per second added after each healthy window
+DEFAULT_CONCURRENCY = 2  # concurrent requests a host starts at
+MAX_CONCURRENCY = 8
+BACKOFF_FACTOR = 0.5  # multiplier applied to the rate and concurrency after a failure
+HEALTHY_LATENCY = 2.0  # responses slower than this many seconds do not count towards ramping up
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket. Tokens refill at rate tokens per second up to capacity, and each request takes one.
+    """
+
+    def __init__(self, rate: float, capacity: float = None) -> None:
+        """
+        Initialize the token bucket full.
+
+        :param rate: the number of tokens added per second
+        :param capacity: the maximum number of tokens, defaults to one second worth of tokens
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """
+        Take a token from the bucket, sleeping until one is available.
+
+        :return: None
+        """
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_time = (1 - self.tokens) / self.rate
+            time.sleep(wait_time)
+
+    def set_rate(self, rate: float) -> None:
+        """
+        Change the refill rate of the bucket.
+
+        :param rate: the new number of tokens added per second
+        :return: None
+        """
+        with self.lock:
+            self._refill()
+            self.rate = rate
+            self.capacity = max(1.0, rate)
+            self.tokens = min(self.tokens, self.capacity)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+
+class AdaptiveLimiter:
+    """
+    Rate and concurrency limits for a single host that adapt to how the host is responding.
+    """
+
+    def __init__(self, rate: float = DEFAULT_RATE, concurrency: int = DEFAULT_CONCURRENCY,
+                 max_concurrency: int = MAX_CONCURRENCY, healthy_latency: float = HEALTHY_LATENCY) -> None:
+        """
+        Initialize the limiter.
+
+        :param rate: the requests per second to start at
+        :param concurrency: the number of concurrent requests to start at
+        :param max_concurrency: the most concurrent requests the limiter will ramp up to
+        :param healthy_latency: responses slower than this many seconds do not count towards ramping up
+        """
+        self.bucket = TokenBucket(rate)
+        self.concurrency = float(concurrency)
+        self.max_concurrency = max_concurrency
+        self.healthy_latency = healthy_latency
+        self.in_flight = 0
+        self.healthy_responses = 0
+        self.condition = threading.Condition()
+
+    def acquire(self) -> None:
+        """
+        Wait until a request to this host is allowed by both the concurrency limit and the token bucket. Every call
+        must be followed by a call to release.
+
+        :return: None
+        """
+        with self.condition:
+            while self.in_flight >= int(self.concurrency):
+                self.condition.wait()
+            self.in_flight += 1
+        self.bucket.acquire()
+
+    def release(self, latency: float, failed: bool) -> None:
+        """
+        Record the outcome of a request and adjust the limits. A failure halves the rate and concurrency, while a full
+        window of healthy responses adds one concurrent request and RATE_INCREASE requests per second.
+
+        :param latency: how many seconds the request took
+        :param failed: True if the request timed out, could not connect, or got a 5xx response
+        :return: None
+        """
+        with self.condition:
+            self.in_flight -= 1
+            if failed:
+                self.healthy_responses = 0
+                self.concurrency = max(1.0, self.concurrency * BACKOFF_FACTOR)
+                self.bucket.set_rate(max(MIN_RATE, self.bucket.rate * BACKOFF_FACTOR))
+            elif latency <= self.healthy_latency:
+                self.healthy_responses += 1
+                if self.healthy_responses >= int(self.concurrency):
+                    self.healthy_responses = 0
+                    self.concurrency = min(self.max_concurrency, self.concurrency + 1)
+                    self.bucket.set_rate(min(MAX_RATE, self.bucket.rate + RATE_INCREASE))
+            self.condition.notify_all()
+
+
+def get_limiter(url: str) -> AdaptiveLimiter:
+    """
+    Get the shared limiter for the host of a url, creating it the first time the host is seen.
+
+    :param url: a url on the host
+    :return: the limiter for that host
+    """
+    host = urlparse(url).netloc
+    with _limiters_lock:
+        if host not in _limiters:
+            _limiters[host] = AdaptiveLimiter()
+        return _limiters[host]
+
+
+def reset_limiters() -> None:
+    """
+    Forget every host's limiter so the next request to each host starts from the default limits.
+
+    :return: None
+    """
+    with _limiters_lock:
+        _limiters.clear()
@@ -0,0 +1,104 @@
+"""
+Append-only resume manifests for the scrapers that add on to their output files. A manifest is a small sidecar file
+next to the output csvs with one line per finished unit of work (a game id or url), followed by the size of each output
+file right after that unit was written. Resuming only reads the manifest instead of the whole output csv, and the sizes
+let a crashed run cut off anything it wrote after the last finished unit.
+"""
+import os
+from typing import Callable, Iterable
+
+from jmu_baseball_utils import file_utils
+
+CREATED_KEY = '*'  # key of the first line, which holds the output file sizes when the manifest was created
+
+
+class ResumeManifest:
+    """
+    The resume manifest for one artifact in a year and division.
+    """
+
+    def __init__(self, year: int, division: int, artifact: str, output_file_names: list) -> None:
+        """
+        Initialize the manifest. Call open before adding to it.
+
+        :param year: the year of the data
+        :param division: the division of the data
+        :param artifact: the name of the artifact the manifest tracks, such as 'play_by_play' or 'box_scores'
+        :param output_file_names: every output file written for each unit of work
+        """
+        self.file_name = file_utils.get_manifest_file_name(year, division, artifact)
+        self.output_file_names = output_file_names
+
+    def open(self, rebuild: Callable[[], Iterable[str]]) -> set:
+        """
+        Load the finished keys from the manifest and cut every output file back to the size it was after the last
+        finished key. If the manifest does not exist, or the output files are smaller than the manifest says they
+        should be (they were deleted or replaced), the keys are rebuilt from the output files and a new manifest is
+        written.
+
+        :param rebuild: a function that reads the finished keys from the output files, only called when the manifest
+        cannot be used
+        :return: a set of the finished keys
+        """
+        entries = self._read()
+        if entries:
+            offsets = entries[-1][1]
+            sizes = self._get_output_sizes()
+            if len(offsets) == len(sizes) and all(size >= offset for size, offset in zip(sizes, offsets)):
+                for output_file_name, size, offset in zip(self.output_file_names, sizes, offsets):
+                    if size > offset:
+                        print('Removing {num_bytes} unfinished bytes from {file_name}'
+                              .format(num_bytes=size - offset, file_name=output_file_name))
+                        with open(output_file_name, 'ab') as output_file:
+                            output_file.truncate(offset)
+                return {key for key, offsets in entries if key != CREATED_KEY}
+
+        keys = set(rebuild())
+        sizes = self._get_output_sizes()
+        with open(self.file_name, 'w', encoding='utf-8') as manifest_file:
+            manifest_file.write(self._format_line(CREATED_KEY, sizes))
+            for key in keys:
+                manifest_file.write(self._format_line(key, sizes))
+        return keys
+
+    def add(self, key: str) -> None:
+        """
+        Record a finished unit of work. The output files must be flushed before this is called.
+
+        :param key: the key of the unit of work
+        :return: None
+        """
+        with open(self.file_name, 'a', encoding='utf-8') as manifest_file:
+            manifest_file.write(self._format_line(key, self._get_output_sizes()))
+
+    def _read(self) -> list:
+        """
+        Read every complete line of the manifest.
+
+        :return: a list of (key, offsets) tuples in the order they were added, empty if there is no manifest
+        """
+        if not os.path.exists(self.file_name):
+            return []
+        entries = []
+        complete_size = 0
+        with open(self.file_name, 'rb') as manifest_file:
+            for line in manifest_file:
+                # a line without a newline was cut off part way through being written
+                if not line.endswith(b'\n'):
+                    break
+                complete_size += len(line)
+                key, *offsets = line.decode('utf-8').rstrip('\n').split('\t')
+                entries.append((key, [int(offset) for offset in offsets]))
+        # drop the cut off line so the next line added starts on a line of its own
+        if complete_size < os.path.getsize(self.file_name):
+            with open(self.file_name, 'ab') as manifest_file:
+                manifest_file.truncate(complete_size)
+        return entries
+
+    def _get_output_sizes(self) -> list:
+        return [os.path.getsize(output_file_name) if os.path.exists(output_file_name) else 0
+                for output_file_name in self.output_file_names]
+
+    @staticmethod
+    def _format_line(key: str, sizes: list) -> str:
+        return '\t'.join([key] + [str(size) for size in sizes]) + '\n'
@@ -0,0 +1,222 @@
+"""
+A two stage scrape pipeline that keeps downloading and parsing from blocking each other. The fetch stage runs in a
+background thread, downloading pages with the fetch engine and writing each raw page to a spool file. The parse stage
+hands the spooled pages to a process pool, so parsing a season of pages scales with the number of cores. A bounded
+queue between the two stages keeps the fetch stage from running too far ahead of the parsers. The parser processes are
+started by a forkserver, or spawned where there is none, never forked from this process: the fetch threads may be
+holding a lock, such as a rate limiter's, the http session's, or stdout's, and a forked child would start with it stuck.
+Pipelines that run at the same time, like the box scores and play by play of several seasons, can share one pool of
+parser processes with shared_parse_pool, so together they use the cores once instead of each starting its own pool.
+"""
+import collections
+import multiprocessing
+import os
+import queue
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from jmu_baseball_utils import file_utils
+from jmu_baseball_utils import html_parsers
+from jmu_baseball_utils import web_utils
+
+DEFAULT_QUEUE_SIZE = 64  # maximum number of spooled pages waiting to be parsed
+NOT_FETCHED = object()  # yielded instead of a parse result when a page could not be fetched
+
+_FETCH_DONE = object()
+
+_shared_pool = None  # (executor, workers) used by every pipeline while shared_parse_pool is active
+
+
+def get_spool_directory() -> str:
+    """
+    Get the directory raw pages are spooled to in between the fetch and parse stages.
+
+    :return: the path to the spool directory
+    """
+    return file_utils.get_path('../scraped-data/spool/')
+
+
+def get_process_context():
+    """
+    Get the multiprocessing context parser processes are started with, forkserver where it is available and spawn
+    everywhere else.
+
+    :return: a multiprocessing context
+    """
+    start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return multiprocessing.get_context(start_method)
+
+
+@contextmanager
+def shared_parse_pool(workers: int = None):
+    """
+    Use one pool of parser processes for every pipeline run inside the with block, from any thread. Each pipeline
+    still keeps its own results in order.
+
+    :param workers: the number of parser processes, defaults to the number of cores
+    :return: the shared ProcessPoolExecutor
+    """
+    global _shared_pool
+    workers = workers or os.cpu_count() or 1
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=get_process_context())
+    _shared_pool = (executor, workers)
+    try:
+        yield executor
+    finally:
+        _shared_pool = None
+        executor.shutdown()
+
+
+def run_pipeline(items: list, urls: list, parse: callable, sleep_time: float, try_limit: int,
+                 workers: int = None, queue_size: int = DEFAULT_QUEUE_SIZE, cache_policy: str = None,
+                 parser: str = None) -> Iterator[tuple]:
+    """
+    Fetch a page for each item and parse it in a process pool, yielding the results in the same order as the items.
+
+    :param items: the items to scrape, each one is passed to parse along with its page
+    :param urls: the url of the page for each item
+    :param parse: a module level function that takes a parsed page and its item and returns picklable results
+    :param sleep_time: the time to sleep in between attempts to fetch a page
+    :param try_limit: the maximum number of attempts to fetch a page
+    :param workers: the number of parser processes, defaults to the number of cores, ignored inside shared_parse_pool
+    :param queue_size: the maximum number of spooled pages waiting to be parsed
+    :param cache_policy: 'live', 'cache-first', or 'replay-only', defaults to the page cache's default policy
+    :param parser: the html parser backend, defaults to html_parsers' default backend
+    :return: an iterator of (item, result) tuples, result is NOT_FETCHED if the page could not be fetched
+    """
+    shared_pool = _shared_pool
+    if shared_pool is not None:
+        executor, workers = shared_pool
+    else:
+        workers = workers or os.cpu_count() or 1
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=get_process_context())
+    # the default backend is resolved here since parser processes do not share this process's settings
+    parser = html_parsers.check_backend(parser)
+    spooled_pages = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    fetcher = threading.Thread(target=_fetch_stage, daemon=True,
+                               args=(urls, sleep_time, try_limit, cache_policy, spooled_pages, stop))
+    fetcher.start()
+
+    pending = collections.deque()
+    try:
+        for item in items:
+            spool_file_name = spooled_pages.get()
+            if spool_file_name is _FETCH_DONE:
+                break
+            if isinstance(spool_file_name, BaseException):
+                raise spool_file_name
+            if spool_file_name is None:
+                pending.append((item, None, None))
+            else:
+                pending.append((item, executor.submit(_parse_spooled_page, parse, spool_file_name, item, parser),
+                                spool_file_name))
+            # keep every worker busy without letting finished results pile up
+            while len(pending) > workers * 2:
+                yield _collect(pending.popleft())
+        while pending:
+            yield _collect(pending.popleft())
+    finally:
+        stop.set()
+        for item, future, spool_file_name in pending:
+            # a cancelled parse never ran, so its spool file is still there
+            if future is not None and future.cancel():
+                os.remove(spool_file_name)
+        if shared_pool is None:
+            executor.shutdown()
+        _drain(spooled_pages)
+        fetcher.join()
+        _drain(spooled_pages)
+
+
+def _collect(pending_item: tuple) -> tuple:
+    """
+    Wait for the result of a parse.
+
+    :param pending_item: an (item, future, spool file name) tuple, the future is None if the page could not be
+    fetched
+    :return: an (item, result) tuple
+    """
+    item, future, spool_file_name = pending_item
+    if future is None:
+        return item, NOT_FETCHED
+    return item, future.result()
+
+
+def _fetch_stage(urls: list, sleep_time: float, try_limit: int, cache_policy: Optional[str],
+                 spooled_pages: queue.Queue, stop: threading.Event) -> None:
+    """
+    Download every url and write each page to a spool file, putting the spool file names on the queue in order.
+    Pages that could not be fetched are put on the queue as None, and _FETCH_DONE is put on the queue at the end.
+
+    :param urls: the urls to download
+    :param sleep_time: the time to sleep in between attempts to fetch a page
+    :param try_limit: the maximum number of attempts to fetch a page
+    :param cache_policy: 'live', 'cache-first', or 'replay-only'
+    :param spooled_pages: the queue shared with the parse stage
+    :param stop: set by the parse stage when it no longer needs pages
+    :return: None
+    """
+    try:
+        for page_text in web_utils.get_page_texts(urls, sleep_time, try_limit, cache_policy=cache_policy):
+            spool_file_name = None
+            if page_text is not None:
+                file_descriptor, spool_file_name = tempfile.mkstemp(suffix='.html', dir=get_spool_directory())
+                with os.fdopen(file_descriptor, 'w', encoding='utf-8') as spool_file:
+                    spool_file.write(page_text)
+            if not _put(spooled_pages, spool_file_name, stop):
+                return
+        _put(spooled_pages, _FETCH_DONE, stop)
+    except BaseException as e:
+        _put(spooled_pages, e, stop)
+
+
+def _put(spooled_pages: queue.Queue, value, stop: threading.Event) -> bool:
+    """
+    Put a value on the queue, waiting for room unless the parse stage has stopped.
+
+    :return: True if the value was put on the queue, False if the parse stage stopped first
+    """
+    while not stop.is_set():
+        try:
+            spooled_pages.put(value, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    if isinstance(value, str):
+        os.remove(value)
+    return False
+
+
+def _drain(spooled_pages: queue.Queue) -> None:
+    """
+    Remove everything left on the queue and delete the spool files that were never parsed.
+    """
+    while True:
+        try:
+            value = spooled_pages.get_nowait()
+        except queue.Empty:
+            return
+        if isinstance(value, str) and os.path.exists(value):
+            os.remove(value)
+
+
+def _parse_spooled_page(parse: callable, spool_file_name: str, item, parser: str):
+    """
+    Parse a spooled page in a worker process and delete the spool file.
+
+    :param parse: the function that turns a parsed page and its item into results
+    :param spool_file_name: the spool file holding the raw page
+    :param item: the item the page belongs to
+    :param parser: the html parser backend
+    :return: the results of parse
+    """
+    try:
+        with open(spool_file_name, encoding='utf-8') as spool_file:
+            page_text = spool_file.read()
+    finally:
+        os.remove(spool_file_name)
+    return parse(html_parsers.parse(page_text, parser), item)
@@ -0,0 +1,192 @@
+"""
+Compact, typed records for the rows of the scraped csv files. Each record is a NamedTuple, which takes a fraction of
+the memory of the dict a csv DictReader makes for every row, and the ids in each row are converted to ints once while
+reading instead of by every caller. Box score files have different stat columns in different years, so their stats are
+read into a tuple in the order the caller asks for.
+"""
+import csv
+import io
+import operator
+import re
+from typing import Iterator, NamedTuple, Optional
+
+from jmu_baseball_utils import compressed_files
+
+
+class GameInfo(NamedTuple):
+    """
+    A row of game_info.csv.
+    """
+    game_url: str
+    contest_id: str
+    game_id: Optional[int]
+    away_school_name: str
+    away_school_id: Optional[int]
+    home_school_name: str
+    home_school_id: Optional[int]
+    game_code: str
+    date: str
+    location: str
+    attendance: str
+    hp_official: str
+    first_base_official: str
+    second_base_official: str
+    third_base_official: str
+    weather: str
+    other: str
+
+
+class RosterLine(NamedTuple):
+    """
+    A row of rosters.csv.
+    """
+    school_name: str
+    school_id: Optional[int]
+    player_name: str
+    player_id: Optional[int]
+    jersey_number: str
+    player_class: str
+
+
+class PlayByPlayLine(NamedTuple):
+    """
+    A row of play_by_play.csv.
+    """
+    game_id: Optional[int]
+    school_name: str
+    school_id: Optional[int]
+    inning: Optional[int]
+    pbp_type: str
+    side: str
+    pbp_text: str
+    score_change: str
+
+
+class BoxScoreLine(NamedTuple):
+    """
+    A row of one of the box_score_{stat_type}.csv files, with the stats that were asked for.
+    """
+    game_id: Optional[int]
+    team_url: str
+    school_name: str
+    school_id: Optional[int]
+    player: str
+    player_id: Optional[int]
+    stats: tuple
+
+
+# csv headings that are not valid field names
+COLUMN_NAMES = {
+    GameInfo: {'first_base_official': '1b_official', 'second_base_official': '2b_official',
+               'third_base_official': '3b_official'},
+    RosterLine: {'player_class': 'class'},
+}
+
+
+def read_records(file_name: str, record_type: type) -> Iterator[NamedTuple]:
+    """
+    Read the rows of a scraped csv as records. A column missing from the file is read as None.
+
+    :param file_name: the scraped csv, compressed or not
+    :param record_type: one of GameInfo, RosterLine, or PlayByPlayLine
+    :return: an iterator of records
+    """
+    with compressed_files.open_file(file_name, 'rb') as file:
+        reader = csv.reader(io.TextIOWrapper(file, encoding='utf-8', newline=''))
+        header = next(reader, [])
+        column_names = COLUMN_NAMES.get(record_type, {})
+        converters = [_get_converter(record_type.__annotations__[field]) for field in record_type._fields]
+        columns = _get_column_indexes(header)
+        indexes = [columns.get(column_names.get(field, field)) for field in record_type._fields]
+        for row in reader:
+            if row:
+                yield record_type._make(convert(_get_value(row, index))
+                                        for convert, index in zip(converters, indexes))
+
+
+def read_box_score_lines(file_name: str, stat_names: list, convert_stats: bool = True) -> Iterator[BoxScoreLine]:
+    """
+    Read the rows of a box score csv as records, skipping the team totals rows. Stats are converted the same way the
+    database copiers always have: a stat that is not a column in the file is None, an empty stat is 0, a number is an
+    int, and anything else has every character that is not a digit or a dot removed.
+
+    :param file_name: the box score csv, compressed or not
+    :param stat_names: the lower case names of the stat columns to read, in the order they go in each record's stats
+    :param convert_stats: False to keep the stats as the strings in the file, for columns that are not numbers like
+    the positions in the fielding box scores
+    :return: an iterator of BoxScoreLines
+    """
+    with compressed_files.open_file(file_name, 'rb') as file:
+        reader = csv.reader(io.TextIOWrapper(file, encoding='utf-8', newline=''))
+        header = [heading.lower() for heading in next(reader, [])]
+        columns = _get_column_indexes(header)
+        # short rows are padded with empty values, and a missing column reads the None added after them
+        width = len(header)
+        get_ids = operator.itemgetter(*[columns.get(field, width) for field in BoxScoreLine._fields[:-1]])
+        get_stats = operator.itemgetter(*[columns.get(stat_name, width) for stat_name in stat_names], width)
+        for row in reader:
+            if not row:
+                continue
+            if len(row) < width:
+                row += [''] * (width - len(row))
+            row.append(None)
+            game_id, team_url, school_name, school_id, player, player_id = get_ids(row)
+            if player == 'Totals':
+                continue
+            if not convert_stats:
+                yield BoxScoreLine(_to_int(game_id), team_url, school_name, _to_int(school_id), player,
+                                   _to_int(player_id), get_stats(row)[:-1])
+                continue
+            stats = []
+            # the extra None read by get_stats keeps it returning a tuple even for a single stat
+            for stat in get_stats(row)[:-1]:
+                if stat:
+                    try:
+                        stat = int(stat)
+                    except ValueError:
+                        # sometimes stats have non-numerical characters like '-' and ',', we remove them
+                        stat = re.sub(r'[^\d.]', '', stat)
+                elif stat is not None:
+                    stat = 0
+                stats.append(stat)
+            yield BoxScoreLine(_to_int(game_id), team_url, school_name, _to_int(school_id), player, _to_int(player_id),
+                               tuple(stats))
+
+
+def _get_column_indexes(header: list) -> dict:
+    """
+    Get the index of each column. If a heading is repeated, the last one is used, the same as a csv DictReader.
+    """
+    return {heading: index for index, heading in enumerate(header)}
+
+
+def _get_value(row: list, index: Optional[int]) -> Optional[str]:
+    """
+    Get a value from a row, or None if the column is missing or the row is too short.
+    """
+    if index is None or index >= len(row):
+        return None
+    return row[index]
+
+
+def _get_converter(annotation) -> callable:
+    """
+    Get the function that converts a csv value to the type of a record field.
+    """
+    if annotation == Optional[int]:
+        return _to_int
+    return _to_str
+
+
+def _to_int(value: Optional[str]) -> Optional[int]:
+    """
+    Convert a csv value to an int, or None if it is empty or not a number.
+    """
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_str(value: Optional[str]) -> Optional[str]:
+    return value
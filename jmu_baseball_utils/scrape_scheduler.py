@@ -0,0 +1,122 @@
+"""
+A small dependency aware scheduler for running scrapers concurrently. Each scraper call is a task that names the tasks
+it depends on, and a task starts as soon as everything it depends on has finished. Tasks run in a thread pool, so every
+task still shares the page cache, http session, and per-host rate limiter, which keeps the total request rate to a
+host the same no matter how many tasks are running.
+"""
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Iterable
+
+DEFAULT_MAX_TASKS = 4  # maximum number of tasks running at once
+
+
+class ScrapeTask:
+    """
+    One scraper call in the schedule.
+    """
+
+    def __init__(self, name: str, run: callable, dependencies: Iterable[str] = ()) -> None:
+        """
+        Initialize the task.
+
+        :param name: a name unique to this task, such as '2019 division 1 box scores'
+        :param run: a function that takes no arguments and runs the scraper
+        :param dependencies: the names of the tasks that must finish before this one starts
+        """
+        self.name = name
+        self.run = run
+        self.dependencies = set(dependencies)
+
+
+def run_tasks(tasks: list, max_tasks: int = DEFAULT_MAX_TASKS) -> dict:
+    """
+    Run every task once all of its dependencies have finished, running up to max_tasks at once. If a task fails, the
+    error is printed and every task that depends on it, directly or not, is skipped.
+
+    :param tasks: a list of ScrapeTasks, every dependency must be the name of another task in the list
+    :param max_tasks: the maximum number of tasks running at once
+    :return: a dict of task names to the number of seconds each finished task took
+    """
+    tasks_by_name = {task.name: task for task in tasks}
+    if len(tasks_by_name) != len(tasks):
+        raise ValueError('Task names must be unique')
+    for task in tasks:
+        missing = task.dependencies - tasks_by_name.keys()
+        if missing:
+            raise ValueError('{name} depends on unknown tasks: {missing}'.format(name=task.name, missing=missing))
+    _check_for_cycles(tasks_by_name)
+
+    waiting = dict(tasks_by_name)
+    finished = set()
+    failed = set()
+    timings = {}
+    running = {}
+    with ThreadPoolExecutor(max_workers=max(1, max_tasks)) as executor:
+        while waiting or running:
+            # skip everything that depends on a failed task, then start everything that is ready, in list order
+            for name, task in list(waiting.items()):
+                if task.dependencies & failed:
+                    print('Skipping {name}, a task it depends on failed'.format(name=name))
+                    failed.add(name)
+                    del waiting[name]
+                elif task.dependencies <= finished:
+                    running[executor.submit(_time_task, task)] = name
+                    del waiting[name]
+            if not running:
+                continue
+
+            done, not_done = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    timings[name] = future.result()
+                    finished.add(name)
+                    print('Finished {name} in {minutes:.2f} minutes'.format(name=name, minutes=timings[name] / 60))
+                except Exception:
+                    print('{name} failed:'.format(name=name))
+                    traceback.print_exc()
+                    failed.add(name)
+    return timings
+
+
+def print_timings(timings: dict) -> None:
+    """
+    Print how long each task took, slowest first.
+
+    :param timings: a dict of task names to seconds, as returned by run_tasks
+    :return: None
+    """
+    for name, seconds in sorted(timings.items(), key=lambda timing: timing[1], reverse=True):
+        print('{minutes:8.2f} minutes  {name}'.format(minutes=seconds / 60, name=name))
+
+
+def _time_task(task: ScrapeTask) -> float:
+    """
+    Run a task.
+
+    :param task: the task to run
+    :return: the number of seconds the task took
+    """
+    start_time = time.time()
+    task.run()
+    return time.time() - start_time
+
+
+def _check_for_cycles(tasks_by_name: dict) -> None:
+    """
+    Make sure the dependencies do not loop back on themselves, since a task in a loop would never start.
+
+    :param tasks_by_name: a dict of task names to tasks
+    :return: None
+    """
+    remaining = {name: set(task.dependencies) for name, task in tasks_by_name.items()}
+    while remaining:
+        ready = {name for name, dependencies in remaining.items() if not dependencies}
+        if not ready:
+            raise ValueError('Task dependencies form a cycle: {names}'.format(names=sorted(remaining)))
+        for name in ready:
+            del remaining[name]
+        for dependencies in remaining.values():
+            dependencies -= ready
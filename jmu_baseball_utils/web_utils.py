@@ -1,38 +1,194 @@
 """
 File containing many helper methods for interfacing with the web with bs4 and urllib.
 """
-import sys
+import functools
+import re
+from typing import Iterable, Iterator, Optional
 
 from bs4 import BeautifulSoup
 import time
 import requests
 
+from jmu_baseball_utils import fetch_engine
+from jmu_baseball_utils import html_parsers
+from jmu_baseball_utils import http_session
+from jmu_baseball_utils import page_cache
+from jmu_baseball_utils import rate_limiter
 
-def get_page(url: str, sleep_time: float, try_limit: int) -> BeautifulSoup:
+REQUEST_TIMEOUT = 30  # seconds to wait for a response before counting the attempt as a timeout
+MAX_RETRY_SLEEP = 30  # the longest time to sleep in between attempts, in seconds
+
+GAME_NUMBER_REGEX = re.compile(r'/(?:contests|game/\w+)/(\d+)')
+
+
+class PageFetchError(Exception):
+    """
+    Raised when a page could not be fetched after every attempt.
+    """
+
+
+def get_page(url: str, sleep_time: float, try_limit: int, cache_policy: str = None,
+             parser: str = None) -> BeautifulSoup:
     """
     Get a page with the specified url. If the requested page is not found, the method will try
-    again until try_limit is reached, sleeping for sleep_time seconds in between each attempt.
+    again until try_limit is reached, backing off from sleep_time seconds in between each attempt.
     
     :param url: the url of the page to get
     :param sleep_time: the time to sleep in between attempts
     :param try_limit: the maximum number of attempts to connect
-    :return: the page in a BeautifulSoup object with the parser set to 'html.parser'
+    :param cache_policy: 'live', 'cache-first', or 'replay-only', defaults to the page cache's default policy
+    :param parser: the html parser backend, defaults to html_parsers' default backend
+    :return: the page parsed by the parser backend, a BeautifulSoup object unless the backend is selectolax
+    """
+    t0 = time.time()
+    page_text = get_page_text(url, sleep_time, try_limit, cache_policy)
+    print('{:.2f} seconds... '.format(time.time() - t0), end='')
+    return html_parsers.parse(page_text, parser)
+
+
+def get_pages(urls: Iterable[str], sleep_time: float, try_limit: int,
+              concurrency: int = fetch_engine.DEFAULT_CONCURRENCY, cache_policy: str = None,
+              parser: str = None) -> Iterator[BeautifulSoup]:
+    """
+    Get a batch of pages concurrently. Pages are yielded in the same order as the urls, and each page is retried the
+    same way get_page retries it. A page that still cannot be fetched is yielded as None, so one bad page does not
+    stop the rest of the batch.
+
+    :param urls: the urls of the pages to get
+    :param sleep_time: the time to sleep in between attempts
+    :param try_limit: the maximum number of attempts to connect
+    :param concurrency: the maximum number of requests in flight to a single host
+    :param cache_policy: 'live', 'cache-first', or 'replay-only', defaults to the page cache's default policy
+    :param parser: the html parser backend, defaults to html_parsers' default backend
+    :return: an iterator over the pages parsed by the parser backend, or None for pages that could not be fetched
+    """
+    for page_text in get_page_texts(urls, sleep_time, try_limit, concurrency, cache_policy):
+        if page_text is None:
+            yield None
+        else:
+            yield html_parsers.parse(page_text, parser)
+
+
+def get_all_pages(items: list, urls: list, sleep_time: float, try_limit: int, retries: int = 1,
+                  parser: str = None) -> Iterator[tuple]:
     """
+    Get a batch of pages concurrently for scrapers that rewrite their whole file, where a skipped page would silently
+    be missing from the file. Pages that cannot be fetched are tried again once the rest of the batch is done, and if
+    any still cannot be fetched, PageFetchError is raised after every other page has been yielded.
+
+    :param items: the item each url belongs to, such as the team dicts from data_utils.get_schools
+    :param urls: the urls of the pages to get, in the same order as the items
+    :param sleep_time: the time to sleep in between attempts
+    :param try_limit: the maximum number of attempts to connect
+    :param retries: the number of times the pages that could not be fetched are tried again
+    :param parser: the html parser backend, defaults to html_parsers' default backend
+    :return: an iterator of (item, page) tuples, in the order of the urls except for pages that were tried again
+    :raises PageFetchError: once every other page has been yielded, if some pages still could not be fetched
+    """
+    missing = list(zip(items, urls))
+    for _ in range(retries + 1):
+        failed = []
+        for (item, url), page in zip(missing, get_pages([url for _, url in missing], sleep_time, try_limit,
+                                                        parser=parser)):
+            if page is None:
+                failed.append((item, url))
+            else:
+                yield item, page
+        missing = failed
+        if not missing:
+            return
+    raise PageFetchError('Unable to get {count} pages, the file is missing them: {urls}'
+                         .format(count=len(missing), urls=', '.join(url for _, url in missing)))
+
+
+def get_page_texts(urls: Iterable[str], sleep_time: float, try_limit: int,
+                   concurrency: int = fetch_engine.DEFAULT_CONCURRENCY,
+                   cache_policy: str = None) -> Iterator[Optional[str]]:
+    """
+    Get the raw text of a batch of pages concurrently, without parsing them. Texts are yielded in the same order as
+    the urls.
+
+    :param urls: the urls of the pages to get
+    :param sleep_time: the time to sleep in between attempts
+    :param try_limit: the maximum number of attempts to connect
+    :param concurrency: the maximum number of requests in flight to a single host
+    :param cache_policy: 'live', 'cache-first', or 'replay-only', defaults to the page cache's default policy
+    :return: an iterator over the text of each page, or None for pages that could not be fetched
+    """
+    engine = fetch_engine.FetchEngine(functools.partial(_get_page_text_or_none, sleep_time=sleep_time,
+                                                        try_limit=try_limit, cache_policy=cache_policy), concurrency)
+    return engine.fetch_all(urls)
+
+
+def get_page_text(url: str, sleep_time: float, try_limit: int, cache_policy: str = None) -> str:
+    """
+    Get the raw text of the page with the specified url, retrying until try_limit is reached. Requests are paced by
+    the host's shared rate limiter, and the sleep in between attempts doubles from sleep_time each try. Connection
+    errors, timeouts, and 5xx responses all count as failed attempts and slow the rate limiter down. Uses the shared
+    keep-alive session. Successful responses are recorded in the page cache unless the cache policy is
+    'replay-only', which never touches the network.
+
+    :param url: the url of the page to get
+    :param sleep_time: the time to sleep in between attempts
+    :param try_limit: the maximum number of attempts to connect
+    :param cache_policy: 'live', 'cache-first', or 'replay-only', defaults to the page cache's default policy
+    :return: the text of the page, if the host still returns a 5xx response on the last attempt the text of that
+    response is returned
+    :raises PageFetchError: if every attempt failed to get a response
+    """
+    cache_policy = page_cache.check_policy(cache_policy)
+    if cache_policy != page_cache.LIVE:
+        page_text = page_cache.load(url)
+        if page_text is not None:
+            return page_text
+        if cache_policy == page_cache.REPLAY_ONLY:
+            raise page_cache.CacheMissError('{url} is not in the page cache'.format(url=url))
+    
+    limiter = rate_limiter.get_limiter(url)
+    page = None
     for tries in range(0, try_limit):
-        headers = {'User-Agent': 'Mozilla/5.0', 'Connection': 'close'}
+        limiter.acquire()
+        t0 = time.time()
+        failed = True
         try:
-            t0 = time.time()
-            page = requests.get(url, headers=headers)
-            print('{:.2f} seconds... '.format(time.time() - t0), end='')
-            return BeautifulSoup(page.text, 'html.parser')
+            page = http_session.get_session().get(url, timeout=REQUEST_TIMEOUT)
+            failed = page.status_code >= 500
+            error = 'Server error {status_code}'.format(status_code=page.status_code)
         except requests.exceptions.RequestException as e:
-            print('\nFailed to connect to {url} trying again. Try {try_number}.'.
-                  format(url=url, try_number=tries))
-            if tries == try_limit - 1:
-                print('Unable to connect to {url}'.format(url=url))
-                print('\t' + str(e))
-        time.sleep(sleep_time)
-    sys.exit(1)
+            error = str(e)
+        finally:
+            limiter.release(time.time() - t0, failed)
+        if not failed:
+            if page.ok:
+                page_cache.store(url, page.text)
+            return page.text
+        print('\nFailed to connect to {url} trying again. Try {try_number}.'.
+              format(url=url, try_number=tries))
+        if tries == try_limit - 1:
+            print('Unable to connect to {url}'.format(url=url))
+            print('\t' + error)
+        else:
+            time.sleep(min(MAX_RETRY_SLEEP, sleep_time * 2 ** tries))
+    if page is not None:
+        return page.text
+    raise PageFetchError('Unable to connect to {url} after {try_limit} tries'.format(url=url, try_limit=try_limit))
+
+
+def _get_page_text_or_none(url: str, sleep_time: float, try_limit: int, cache_policy: str = None) -> Optional[str]:
+    """
+    Get the raw text of a page like get_page_text, but return None instead of raising if the page cannot be fetched.
+
+    :param url: the url of the page to get
+    :param sleep_time: the time to sleep in between attempts
+    :param try_limit: the maximum number of attempts to connect
+    :param cache_policy: 'live', 'cache-first', or 'replay-only', defaults to the page cache's default policy
+    :return: the text of the page, or None if it could not be fetched
+    """
+    try:
+        return get_page_text(url, sleep_time, try_limit, cache_policy)
+    except (PageFetchError, page_cache.CacheMissError) as e:
+        print('\n' + str(e))
+        return None
 
 
 def get_school_id_from_url(url: str) -> str:
@@ -74,3 +230,18 @@ def get_contest_id_from_url(url: str) -> str:
     :return: the game's id
     """
     return url.split('/')[2][:]
+
+
+def get_game_number_from_url(url: str) -> Optional[str]:
+    """
+    Get the number that identifies a game from its url, ignoring anything after it such as the org_id both teams'
+    schedules add to older game urls. Works for both '/contests/{id}/box_score' and '/game/index/{id}?org_id={id}'
+    urls.
+
+    :param url: the game's url
+    :return: the game's number, or None if the url does not have one
+    """
+    match = GAME_NUMBER_REGEX.search(url)
+    if match is None:
+        return None
+    return match.group(1)
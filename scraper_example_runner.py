@@ -4,9 +4,17 @@ work.
 
 @author: Kevin Kelly
 """
+import functools
 import os
 import time
 
+from jmu_baseball_utils import columnar_storage
+from jmu_baseball_utils import compressed_files
+from jmu_baseball_utils import file_utils
+from jmu_baseball_utils import html_parsers
+from jmu_baseball_utils import page_cache
+from jmu_baseball_utils import scrape_pipeline
+from jmu_baseball_utils import scrape_scheduler
 from scrapers import box_scores
 from scrapers import conference_stats
 from scrapers import game_info
@@ -27,31 +35,87 @@ def main():
     """
     start = time.time()
     
+    # set NCAACachePolicy to 'cache-first' or 'replay-only' to re-parse pages that have already been downloaded
+    page_cache.set_default_policy(os.getenv('NCAACachePolicy', page_cache.LIVE))
+    # set NCAAParser to 'lxml' or 'selectolax' to parse pages with a faster backend
+    html_parsers.set_default_backend(os.getenv('NCAAParser', html_parsers.HTML_PARSER))
+    # set NCAACompression to 'gzip' or 'zstd' to compress new scrape files, existing files keep their compression
+    compressed_files.set_default_compression(os.getenv('NCAACompression'))
+    
     school_ids.get_school_ids()
     logos.get_all_logos()
     years = range(2012, 2021)
     divisions = [1]
+    tasks = []
     for year in years:
         for division in divisions:
             if year == 2012 and division != 1:
                 continue
             if year == 2013 and division == 2:
                 continue
-            print('Year: {}, Division: {}'.format(year, division))
-            start_time = time.time()
-            conference_stats.get_conference_stats(year, division)
-            team_stats.get_team_stats(year, division)  # must run before team info, rosters, and player stats
-            team_info.get_team_info(year, division)
-            rosters.get_rosters(year, division)
-            player_stats.get_player_stats(year, division)
-            game_info.get_game_info(year, division)  # must run before box scores and play by play
-            box_scores.get_box_scores(year, division)
-            play_by_play.get_play_by_play(year, division)
-            end_time = time.time() - start_time
-            print(f'{year} division {division}: {end_time / 60} minutes')
+            tasks += get_season_tasks(year, division)
+    # seasons do not depend on each other, so they run side by side and share the per-host rate limit.
+    # set NCAAMaxTasks to change how many scrapers run at once. The box score and play by play scrapers running at
+    # once share one pool of parser processes, so parsing uses the cores once no matter how many tasks run
+    with scrape_pipeline.shared_parse_pool():
+        timings = scrape_scheduler.run_tasks(tasks, int(os.getenv('NCAAMaxTasks',
+                                                                  scrape_scheduler.DEFAULT_MAX_TASKS)))
+    scrape_scheduler.print_timings(timings)
     total_time = time.time() - start
     print(f'total time: {total_time / 60} minutes')
 
 
+def get_season_tasks(year: int, division: int) -> list:
+    """
+    Get the scrape tasks for one year and division. Team stats must run before team info, rosters, and player stats,
+    team info must run before game info since it writes the schedules, and game info must run before box scores and
+    play by play.
+    
+    :param year: the year to scrape
+    :param division: the division to scrape
+    :return: a list of ScrapeTasks
+    """
+    def task(scraper: callable, dependencies: list = ()) -> scrape_scheduler.ScrapeTask:
+        return scrape_scheduler.ScrapeTask(task_name(scraper), lambda: scraper(year, division),
+                                           [task_name(dependency) for dependency in dependencies])
+    
+    def task_name(scraper: callable) -> str:
+        return '{year} division {division} {scraper}'.format(year=year, division=division,
+                                                             scraper=scraper.__name__[4:].replace('_', ' '))
+    
+    return [task(conference_stats.get_conference_stats),
+            task(team_stats.get_team_stats),
+            task(team_info.get_team_info, [team_stats.get_team_stats]),
+            task(rosters.get_rosters, [team_stats.get_team_stats]),
+            task(player_stats.get_player_stats, [team_stats.get_team_stats]),
+            task(game_info.get_game_info, [team_info.get_team_info]),
+            task(box_scores.get_box_scores, [game_info.get_game_info]),
+            task(play_by_play.get_play_by_play, [game_info.get_game_info])] + get_columnar_tasks(year, division)
+
+
+def get_columnar_tasks(year: int, division: int) -> list:
+    """
+    Get the tasks that write columnar copies of the box score and play by play csvs once they are scraped. Set
+    NCAAColumnarFormat to 'parquet' or 'arrow' to write them, by default there are none.
+    
+    :param year: the year to convert
+    :param division: the division to convert
+    :return: a list of ScrapeTasks
+    """
+    storage_format = os.getenv('NCAAColumnarFormat')
+    if storage_format is None:
+        return []
+    columnar_storage.check_format(storage_format)
+    season = '{year} division {division}'.format(year=year, division=division)
+    stat_types = {'box_score_hitting': 'box scores', 'box_score_pitching': 'box scores',
+                  'box_score_fielding': 'box scores', 'play_by_play': 'play by play'}
+    return [scrape_scheduler.ScrapeTask('{season} {stat_type} {storage_format}'
+                                        .format(season=season, stat_type=stat_type, storage_format=storage_format),
+                                        functools.partial(file_utils.write_columnar_file, year, division, stat_type,
+                                                          storage_format),
+                                        ['{season} {scraper}'.format(season=season, scraper=scraper)])
+            for stat_type, scraper in stat_types.items()]
+
+
 if __name__ == '__main__':
     main()
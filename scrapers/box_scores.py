@@ -5,19 +5,28 @@ each box score.
 
 @author: Kevin Kelly
 """
+import contextlib
 import os
+from typing import Optional
 
 import unicodecsv
 
 from jmu_baseball_utils import data_utils
 from jmu_baseball_utils import file_utils
+from jmu_baseball_utils import resume_manifest
+from jmu_baseball_utils import scrape_pipeline
 from jmu_baseball_utils import web_utils
 
+BOX_SCORE_HEADER = ['game_id', 'team_url', 'school_name', 'school_id']
+PLAYER_ID_OFFSET = len(BOX_SCORE_HEADER) + 1  # the player id column goes right after the player's name
+
 
 def get_box_scores(year, division):
     """
     Get all box scores for a given year and division. Creates three csv files, in the format
-    'scraped-data/{year}/division_{}/box_score_{stat_type}.csv'.
+    'scraped-data/{year}/division_{}/box_score_{stat_type}.csv'. Each game is one unit of work, its hitting,
+    pitching, and fielding box scores are fetched together and written to all three files at once, so the files never
+    get ahead of each other.
     :param year: the year to get games from
     :param division: the division the games were played at
     :return: None
@@ -32,82 +41,195 @@ def get_box_scores(year, division):
     
     games = data_utils.get_games_from_game_info(year, division)
     
-    for stat_type in stat_types:
-        header = ['game_id', 'team_url', 'school_name', 'school_id']
-        header_offset = len(header) + 1
-        stat_file_name = base_file_name.format(stat_type=stat_type)
-        box_score_file_name = file_utils.get_scrape_file_name(year, division, stat_file_name)
-        
-        # if the box score file already has data in it, we do not want to redo work we have
-        # already done so we take all game urls from the old file and add it to game_ids so they
-        # will be skipped
-        # if the file does not exist we start from the beginning
-        game_ids = set()
-        if os.path.exists(box_score_file_name):
-            with open(box_score_file_name, 'rb') as box_score_file:
-                box_score_reader = unicodecsv.DictReader(box_score_file)
-                for box_score_line in box_score_reader:
-                    game_ids.add(box_score_line['game_id'])
+    box_score_file_names = {stat_type: file_utils.get_scrape_file_name(year, division,
+                                                                       base_file_name.format(stat_type=stat_type))
+                            for stat_type in stat_types}
+    
+    # if the box score files already have data in them, we do not want to redo work we have
+    # already done so we take all game ids from the resume manifest and add them to game_ids so they
+    # will be skipped
+    # if the files do not exist we start from the beginning
+    manifest = resume_manifest.ResumeManifest(year, division, 'box_scores', list(box_score_file_names.values()))
+    game_ids = manifest.open(lambda: _get_finished_game_ids(box_score_file_names))
+    
+    # only request each remaining game once
+    queued_ids = set(game_ids)
+    new_games = []
+    for game in games:
+        if game['game_id'] not in queued_ids:
+            queued_ids.add(game['game_id'])
+            new_games.append(game)
+    
+    # every game gets one page per stat type, the three pages are fetched concurrently and come back next to each
+    # other
+    items = []
+    box_score_urls = []
+    for game in new_games:
+        for stat_type in stat_types:
+            items.append(game)
+            box_score_urls.append(base_url.format(game_id=game['game_id'], stat_id=ids[stat_type + '_id']))
+    
+    # write in append mode because we want to add on if the files already exist
+    with contextlib.ExitStack() as stack:
+        box_score_files = {stat_type: stack.enter_context(file_utils.open_scrape_file(box_score_file_names[stat_type],
+                                                                                      'ab'))
+                           for stat_type in stat_types}
         
-        # write in append mode because we want to add on if the file already exists
-        with open(box_score_file_name, 'ab') as box_score_file:
-            box_score_writer = unicodecsv.writer(box_score_file)
+        # pages are downloaded in the background and parsed by a pool of processes
+        pipeline = scrape_pipeline.run_pipeline(items, box_score_urls, parse_box_score, 0.1, 10)
+        for game_results in zip(*[pipeline] * len(stat_types)):
+            game = game_results[0][0]
+            box_scores = {stat_type: box_score for stat_type, (item, box_score) in zip(stat_types, game_results)}
+            
+            print('{num_games}: Getting box scores for {game_id}...'
+                  .format(num_games=len(game_ids) + 1, game_id=game['game_id']), end='')
+            
+            # a page could not be fetched, the game will be picked up again the next time this runs
+            if any(box_score is scrape_pipeline.NOT_FETCHED for box_score in box_scores.values()):
+                print('Skipping.')
+                continue
+            
+            if any(box_score is None for box_score in box_scores.values()):
+                print('Box score not found.')
+                continue
+            
+            _append_game(box_score_files, box_scores)
+            manifest.add(game['game_id'])
+            game_ids.add(game['game_id'])
+            
+            print('{box_score_lines} players involved'.format(box_score_lines=len(
+                box_scores['hitting']['lines']) - 2))
+    
+    print('{num_games} games total'.format(num_games=len(game_ids)))
+
+
+def _get_finished_game_ids(box_score_file_names: dict) -> set:
+    """
+    Get the ids of every game already written to all of the box score files by reading the files. This is only needed
+    when there is no resume manifest yet.
+    
+    :param box_score_file_names: a dict of stat types to box score file names
+    :return: a set of game ids
+    """
+    file_game_ids = [_get_written_game_ids(box_score_file_name)
+                     for box_score_file_name in box_score_file_names.values()]
+    game_ids = set.intersection(*file_game_ids)
+    
+    # a game that made it into some files but not others was interrupted part way through, so it is removed and
+    # scraped again
+    partial_game_ids = set.union(*file_game_ids) - game_ids
+    if partial_game_ids:
+        print('Removing {num_games} partially written games'.format(num_games=len(partial_game_ids)))
+        for box_score_file_name in box_score_file_names.values():
+            _remove_games(box_score_file_name, partial_game_ids)
+    return game_ids
+
 
-            for game in games:
-                if game['game_id'] in game_ids:
-                    continue
+def _get_written_game_ids(box_score_file_name: str) -> set:
+    """
+    Get the ids of every game already written to a box score file.
     
-                box_score_url = base_url.format(game_id=game['game_id'],
-                                                stat_id=ids[stat_type + '_id'])
+    :param box_score_file_name: the box score file
+    :return: a set of game ids, empty if the file does not exist
+    """
+    game_ids = set()
+    if os.path.exists(box_score_file_name):
+        with file_utils.open_scrape_file(box_score_file_name, 'rb') as box_score_file:
+            box_score_reader = unicodecsv.DictReader(box_score_file)
+            for box_score_line in box_score_reader:
+                game_ids.add(box_score_line['game_id'])
+    return game_ids
+
+
+def _remove_games(box_score_file_name: str, game_ids: set) -> None:
+    """
+    Rewrite a box score file without any lines from these games.
     
-                print('{num_games}: Getting {stat_type} box score for {game_id}...'
-                      .format(num_games=len(game_ids) + 1,
-                              stat_type=stat_type, game_id=game['game_id']), end='')
-                page = web_utils.get_page(box_score_url, 0.1, 10)
+    :param box_score_file_name: the box score file
+    :param game_ids: the ids of the games to remove
+    :return: None
+    """
+    if not os.path.exists(box_score_file_name):
+        return
+    # the temp file keeps the extension so it gets the same compression
+    root, extension = os.path.splitext(box_score_file_name)
+    temp_file_name = root + '.tmp' + extension
+    with file_utils.open_scrape_file(box_score_file_name, 'rb') as box_score_file, \
+            file_utils.open_scrape_file(temp_file_name, 'wb') as temp_file:
+        box_score_reader = unicodecsv.reader(box_score_file)
+        box_score_writer = unicodecsv.writer(temp_file)
+        for line_num, box_score_line in enumerate(box_score_reader):
+            if line_num == 0 or box_score_line[0] not in game_ids:
+                box_score_writer.writerow(box_score_line)
+    os.replace(temp_file_name, box_score_file_name)
+
+
+def _append_game(box_score_files: dict, box_scores: dict) -> None:
+    """
+    Append one game's box scores to every box score file. If anything goes wrong part way through, every file is
+    truncated back to where it was so no file ends up with the game when the others do not.
     
-                if page.text == 'Game not found':
-                    print('Box score not found.')
-                    continue
+    :param box_score_files: a dict of stat types to box score files opened in append mode
+    :param box_scores: a dict of stat types to the parsed box score for that stat type
+    :return: None
+    """
+    offsets = {stat_type: box_score_file.tell() for stat_type, box_score_file in box_score_files.items()}
+    try:
+        for stat_type, box_score_file in box_score_files.items():
+            box_score_writer = unicodecsv.writer(box_score_file)
+            # the header comes from the first box score written to an empty file
+            if offsets[stat_type] == 0:
+                header = BOX_SCORE_HEADER + box_scores[stat_type]['headings']
+                header.insert(PLAYER_ID_OFFSET, 'player_id')
+                box_score_writer.writerow(header)
+            box_score_writer.writerows(box_scores[stat_type]['lines'])
+        for box_score_file in box_score_files.values():
+            box_score_file.flush()
+    except BaseException:
+        for stat_type, box_score_file in box_score_files.items():
+            box_score_file.truncate(offsets[stat_type])
+        raise
+
+
+def parse_box_score(page, game: dict) -> Optional[dict]:
+    """
+    Read the box score lines for both teams from a box score page. This runs in the scrape pipeline's parser
+    processes.
     
-                team_urls = {'away': page.select('a.skipMask')[1].attrs.get('href'),
-                             'home': page.select('a.skipMask')[2].attrs.get('href')}
+    :param page: the parsed box score page
+    :param game: the game info dict of the game
+    :return: a dict with the stat table 'headings' and the csv 'lines' for the game, or None if the game was not found
+    """
+    if page.text == 'Game not found':
+        return None
     
-                box_score_tables = page.select('.mytable')[1:3]
+    team_urls = {'away': page.select('a.skipMask')[1].attrs.get('href'),
+                 'home': page.select('a.skipMask')[2].attrs.get('href')}
     
-                if len(game_ids) == 0:
-                    box_score_header = box_score_tables[0].select_one('.grey_heading').select('th')
-                    [header.append(heading.text.strip()) for heading in box_score_header]
-                    header.insert(header_offset, 'player_id')
-                    box_score_writer.writerow(header)
+    box_score_tables = page.select('.mytable')[1:3]
     
-                game_ids.add(game['game_id'])
+    box_score_header = box_score_tables[0].select_one('.grey_heading').select('th')
+    headings = [heading.text.strip() for heading in box_score_header]
     
-                box_score_lines = []
-                for side, box_score_table in zip(['away', 'home'], box_score_tables):
-                    for box_score_row in box_score_table.select('tr')[2:]:
-                        box_score_cols = box_score_row.select('td')
+    box_score_lines = []
+    for side, box_score_table in zip(['away', 'home'], box_score_tables):
+        for box_score_row in box_score_table.select('tr')[2:]:
+            box_score_cols = box_score_row.select('td')
             
-                        school_name = game['{side}_school_name'.format(side=side)]
-                        team_url = team_urls[side]
-                        school_id = game['{side}_school_id'.format(side=side)]
+            school_name = game['{side}_school_name'.format(side=side)]
+            team_url = team_urls[side]
+            school_id = game['{side}_school_id'.format(side=side)]
             
-                        box_score_line = [game['game_id'], team_url, school_name, school_id]
-                        for box_score_col in box_score_cols:
-                            box_score_line.append(box_score_col.text.strip())
+            box_score_line = [game['game_id'], team_url, school_name, school_id]
+            for box_score_col in box_score_cols:
+                box_score_line.append(box_score_col.text.strip())
             
-                        try:
-                            player_url = box_score_row.select_one('a').attrs.get('href')
-                            player_id = web_utils.get_player_id_from_url(player_url)
-                        except AttributeError:
-                            player_id = None
-                        box_score_line.insert(header_offset, player_id)
+            try:
+                player_url = box_score_row.select_one('a').attrs.get('href')
+                player_id = web_utils.get_player_id_from_url(player_url)
+            except AttributeError:
+                player_id = None
+            box_score_line.insert(PLAYER_ID_OFFSET, player_id)
             
-                        box_score_lines.append(box_score_line)
-    
-                box_score_writer.writerows(box_score_lines)
-                box_score_file.flush()
-    
-                print('{box_score_lines} players involved'.format(box_score_lines=len(
-                    box_score_lines) - 2))
-        
-        print('{num_games} games total'.format(num_games=len(game_ids)))
+            box_score_lines.append(box_score_line)
+    return {'headings': headings, 'lines': box_score_lines}
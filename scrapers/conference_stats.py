@@ -38,7 +38,7 @@ def get_conference_stats(year: int, division: int) -> None:
     for stat_type in stat_types:
         stat_file_name = base_file_name.format(stat_type=stat_type)
         conference_stats_file_name = file_utils.get_scrape_file_name(year, division, stat_file_name)
-        with open(conference_stats_file_name, 'wb') as conference_stats_file:
+        with file_utils.open_scrape_file(conference_stats_file_name, 'wb') as conference_stats_file:
             if year == 2016 and division == 3 and stat_type == 'fielding':
                 print('2016 division 3 fielding totals are messed up on the ncaa site, check if '
                       'they work again manually\n {}'.format(url))
@@ -82,7 +82,7 @@ def get_conference_stats(year: int, division: int) -> None:
     
     conferences_file_name = file_utils.get_scrape_file_name(year, division, 'conferences')
     conference_header = ['conference_name']
-    with open(conferences_file_name, 'wb') as file:
+    with file_utils.open_scrape_file(conferences_file_name, 'wb') as file:
         conferences_writer = unicodecsv.writer(file)
         conferences_writer.writerow(conference_header)
         conferences_writer.writerows(conference_info[:-1])
@@ -11,6 +11,8 @@ from bs4 import NavigableString
 
 from jmu_baseball_utils import data_utils
 from jmu_baseball_utils import file_utils
+from jmu_baseball_utils import html_parsers
+from jmu_baseball_utils import resume_manifest
 from jmu_baseball_utils import web_utils
 
 
@@ -36,51 +38,48 @@ def get_game_info(year: int, division: int) -> None:
                         'other']
     
     game_info_file_name = file_utils.get_scrape_file_name(year, division, 'game_info')
-    game_ids = set()
+    innings_file_name = file_utils.get_scrape_file_name(year, division, 'game_innings')
     
     # If the game info file already has data in it, we do not want to redo work we have already
-    # done so we take all game urls from the old file and add it to game_ids so they will be skipped.
+    # done so we take all game urls from the resume manifest and add them to game_ids so they will be skipped.
     # If the file does not exist we start from the beginning
-    file_exists = os.path.exists(game_info_file_name)
-    if file_exists:
-        with open(game_info_file_name, 'rb') as game_info_file:
-            game_info_reader = unicodecsv.DictReader(game_info_file)
-            for line in game_info_reader:
-                game_ids.add(line['game_url'])
+    manifest = resume_manifest.ResumeManifest(year, division, 'game_info', [innings_file_name, game_info_file_name])
+    game_ids = manifest.open(lambda: _get_written_game_urls(game_info_file_name))
     
     # write in append mode because we want to add on if the files already exist
-    innings_file_name = file_utils.get_scrape_file_name(year, division, 'game_innings')
-    with open(innings_file_name, 'ab') as innings_file, \
-            open(game_info_file_name, 'ab') as game_info_file:
+    with file_utils.open_scrape_file(innings_file_name, 'ab') as innings_file, \
+            file_utils.open_scrape_file(game_info_file_name, 'ab') as game_info_file:
         
         innings_writer = unicodecsv.writer(innings_file)
         
         info_writer = unicodecsv.DictWriter(game_info_file, game_info_header)
         
-        # write headers if game_info file is empty
-        if not file_exists:
+        # write headers if the files are empty
+        if innings_file.tell() == 0:
             innings_writer.writerow(['url', 'game_id', 'side', 'school', 'school_id'])
+            innings_file.flush()
+        if game_info_file.tell() == 0:
             info_writer.writeheader()
+            game_info_file.flush()
         
-        for game in games:
-            game_url = base_url + game['game_url']
-            
-            if game_url in game_ids:
-                continue
-
-            if game['game_url'] is None or game['game_url'] == '':
-                print('No link for game {date} {school_name} {opponent_name}'
-                      .format(date=game['date'], school_name=game['school_name'],
-                              opponent_name=game['opponent_string']))
-                continue
-
-            game_ids.add(game_url)
+        # only request each remaining game once, the pages are fetched concurrently but come back in order
+        new_games = _get_new_games(games, base_url, game_ids)
+        game_ids.update(base_url + game['game_url'] for game in new_games)
+        game_urls = [base_url + game['game_url'] for game in new_games]
 
+        # game info pages need find_all and findNext, so they are always parsed with BeautifulSoup
+        pages = web_utils.get_pages(game_urls, 0.1, 10, parser=html_parsers.get_soup_backend())
+        for num_games, (game, game_url, page) in enumerate(zip(new_games, game_urls, pages),
+                                                           start=len(game_ids) - len(new_games) + 1):
             print('{num_games}: Getting game info and innings for {game_id}... '.format(
-                num_games=len(game_ids),
+                num_games=num_games,
                 game_id=web_utils.get_contest_id_from_url(game['game_url'])), end='')
 
-            page = web_utils.get_page(game_url, 0.1, 10)
+            # the page could not be fetched, it will be picked up again the next time this runs
+            if page is None:
+                print('Skipping.')
+                continue
+
             if page.text == 'Box score not available' or 'We\'re sorry, but something went wrong (500)' in page.text:
                 print('{url}: box score missing'.format(url=game['game_url']))
                 continue
@@ -176,5 +175,82 @@ def get_game_info(year: int, division: int) -> None:
 
             innings_file.flush()
             game_info_file.flush()
+            manifest.add(game_url)
     
     print('Total games: {num_games}'.format(num_games=len(game_ids)))
+
+
+def _get_new_games(games: list, base_url: str, game_urls: set) -> list:
+    """
+    Resolve the games in the schedules to one entry per physical game and drop the games that were already scraped.
+    Every game shows up in the schedules of both teams, with a url that can differ between the two, so games are
+    matched on the number in their url, or on their date and teams if the url does not have one. Prints how many
+    requests were avoided.
+    
+    :param games: the game dicts from the schedules
+    :param base_url: the url game urls are relative to
+    :param game_urls: the full urls of games that were already scraped
+    :return: a list of the game dicts to scrape, the first schedule entry for each game
+    """
+    games_by_key = {}
+    for game in games:
+        if game['game_url'] is None or game['game_url'] == '':
+            print('No link for game {date} {school_name} {opponent_name}'
+                  .format(date=game['date'], school_name=game['school_name'],
+                          opponent_name=game['opponent_string']))
+            continue
+        games_by_key.setdefault(_get_game_key(game, games_by_key), []).append(game)
+    
+    new_games = []
+    num_duplicates = 0
+    for key_games in games_by_key.values():
+        # a game is done if it was scraped from either team's schedule
+        if any(base_url + game['game_url'] in game_urls for game in key_games):
+            continue
+        new_games.append(key_games[0])
+        num_duplicates += len(key_games) - 1
+    print('{num_games} new games, skipped {num_duplicates} duplicate schedule entries'
+          .format(num_games=len(new_games), num_duplicates=num_duplicates))
+    return new_games
+
+
+def _get_game_key(game: dict, games_by_key: dict) -> tuple:
+    """
+    Get a key that is the same for both teams' schedule entries of a game.
+    
+    :param game: a game dict from the schedules
+    :param games_by_key: the games already seen from the schedules, by key
+    :return: ('number', game number) if the game url has a number, otherwise ('teams', date, team ids, occurrence),
+    where occurrence separates the games of a doubleheader
+    """
+    game_number = web_utils.get_game_number_from_url(game['game_url'])
+    if game_number is not None:
+        return 'number', game_number
+    
+    opponent_id = web_utils.get_school_id_from_url(game['opponent_url']) if game['opponent_url'] else \
+        game['opponent_string']
+    teams = tuple(sorted([game['school_id'], opponent_id]))
+    # count how many games between these teams on this date this school's schedule already had
+    occurrence = 0
+    while ('teams', game['date'], teams, occurrence) in games_by_key and \
+            any(seen_game['school_id'] == game['school_id']
+                for seen_game in games_by_key['teams', game['date'], teams, occurrence]):
+        occurrence += 1
+    return 'teams', game['date'], teams, occurrence
+
+
+def _get_written_game_urls(game_info_file_name: str) -> set:
+    """
+    Get the url of every game already written to the game info file by reading the file. This is only needed when
+    there is no resume manifest yet.
+    
+    :param game_info_file_name: the game info file
+    :return: a set of game urls, empty if the file does not exist
+    """
+    game_urls = set()
+    if os.path.exists(game_info_file_name):
+        with file_utils.open_scrape_file(game_info_file_name, 'rb') as game_info_file:
+            game_info_reader = unicodecsv.DictReader(game_info_file)
+            for line in game_info_reader:
+                game_urls.add(line['game_url'])
+    return game_urls
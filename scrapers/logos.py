@@ -3,14 +3,14 @@ File to get logos from http://web2.ncaa.org/ncaa_style/img/All_Logos/.
 
 @author: Kevin Kelly
 """
+import requests
 import unicodecsv
 
 from jmu_baseball_utils import data_utils
 
-import os
-import requests
-
 from jmu_baseball_utils import file_utils
+from jmu_baseball_utils import http_session
+from jmu_baseball_utils import web_utils
 
 
 def get_all_logos() -> None:
@@ -23,15 +23,22 @@ def get_all_logos() -> None:
     sizes = ['sm', 'lg']  # some schools have both sizes, some only have one or neither
     
     school_id_dict = data_utils.get_school_id_dict()
+    session = http_session.get_session()
     
     logo_list = []
     logo_count = 0
+    failed_count = 0
     
     for school in school_id_dict:
         for size in sizes:
             url = base_url.format(size=size, school_id=school_id_dict[school])
             
-            response = requests.get(url)
+            try:
+                response = session.get(url, timeout=web_utils.REQUEST_TIMEOUT)
+            except requests.exceptions.RequestException as e:
+                print('Logo download failed: {school} {size} {error}'.format(school=school, size=size, error=e))
+                failed_count += 1
+                continue
 
             # 200 means it got the page for that url which should include the logo
             if response.status_code == 200:
@@ -57,4 +64,4 @@ def get_all_logos() -> None:
         writer.writerow(header)
         writer.writerows(logo_list)
     
-    print('{} logos found out of {}'.format(logo_count, len(logo_list)))
+    print('{} logos found out of {}, {} downloads failed'.format(logo_count, len(logo_list), failed_count))
@@ -9,7 +9,12 @@ import unicodecsv
 
 from jmu_baseball_utils import data_utils
 from jmu_baseball_utils import file_utils
-from jmu_baseball_utils import web_utils
+from jmu_baseball_utils import resume_manifest
+from jmu_baseball_utils import scrape_pipeline
+
+
+PLAY_BY_PLAY_HEADER = ['game_id', 'school_name', 'school_id', 'inning', 'pbp_type', 'side', 'pbp_text',
+                       'score_change']
 
 
 def get_play_by_play(year: int, division: int) -> None:
@@ -24,94 +29,123 @@ def get_play_by_play(year: int, division: int) -> None:
     base_url = 'https://stats.ncaa.org/game/play_by_play/{game_id}'
     
     games = data_utils.get_games_from_game_info(year, division)
-    game_ids = set()
-    
-    header = ['game_id', 'school_name', 'school_id', 'inning', 'pbp_type', 'side', 'pbp_text',
-              'score_change']
     
     # if the play by play file already has data in it, we do not want to redo work we have already
-    # done so we take all game urls from the old file and add it to game_ids so they will be skipped
+    # done so we take all game ids from the resume manifest and add them to game_ids so they will be skipped
     # if the file does not exist we start from the beginning
     play_by_play_file_name = file_utils.get_scrape_file_name(year, division, 'play_by_play')
-    if os.path.exists(play_by_play_file_name):
-        with open(play_by_play_file_name, 'rb') as play_by_play_file:
-            play_by_play_reader = unicodecsv.DictReader(play_by_play_file)
-            for play_by_play_line in play_by_play_reader:
-                game_ids.add(play_by_play_line['game_id'])
+    manifest = resume_manifest.ResumeManifest(year, division, 'play_by_play', [play_by_play_file_name])
+    game_ids = manifest.open(lambda: _get_written_game_ids(play_by_play_file_name))
     
     # write in append mode because we want to add on if the file already exists
-    with open(play_by_play_file_name, 'ab') as play_by_play_file:
-        play_by_play_writer = unicodecsv.DictWriter(play_by_play_file, header)
+    with file_utils.open_scrape_file(play_by_play_file_name, 'ab') as play_by_play_file:
+        play_by_play_writer = unicodecsv.DictWriter(play_by_play_file, PLAY_BY_PLAY_HEADER)
         
-        if len(game_ids) == 0:
+        if play_by_play_file.tell() == 0:
             play_by_play_writer.writeheader()
+            play_by_play_file.flush()
         
+        # only request each remaining game once, the pages are fetched concurrently but come back in order
+        new_games = []
         for game in games:
-            if game['game_id'] in game_ids:
-                continue
-
-            game_ids.add(game['game_id'])
-            url = base_url.format(game_id=game['game_id'])
-            
+            if game['game_id'] not in game_ids:
+                game_ids.add(game['game_id'])
+                new_games.append(game)
+        urls = [base_url.format(game_id=game['game_id']) for game in new_games]
+        
+        # pages are downloaded in the background and parsed by a pool of processes
+        pipeline = scrape_pipeline.run_pipeline(new_games, urls, parse_play_by_play, 0.1, 10)
+        for num_games, (game, game_pbp_lines) in enumerate(pipeline, start=len(game_ids) - len(new_games) + 1):
             print('{num_games}: Getting play by play for {game_id}...'
-                  .format(num_games=len(game_ids), game_id=game['game_id']), end='')
-
-            page = web_utils.get_page(url, 0.1, 10)
-            
-            innings = page.select('.mytable')[1:]
+                  .format(num_games=num_games, game_id=game['game_id']), end='')
             
-            game_pbp_lines = []
-
-            for inning_num, inning in enumerate(innings):
-                for pbp_line in inning.select('tr')[1:]:
-        
-                    pbp_cols = pbp_line.select('td')
-        
-                    away_pbp = pbp_cols[0].text.strip()
-                    score_change = pbp_cols[1].text.strip()
-                    home_pbp = pbp_cols[2].text.strip()
-        
-                    # this indicates this is an inning summary line
-                    if away_pbp.startswith('R: '):
-                        for side in ['away', 'home']:
-                            summary = {heading: None for heading in header}
-                
-                            summary['game_id'] = game['game_id']
-                            summary['school_name'] = game[side + '_school_name']
-                            summary['school_id'] = game[side + '_school_id']
-                            summary['inning'] = inning_num + 1
-                            summary['side'] = side
-                            summary['pbp_type'] = 'inning_summary'
-                            if side == 'away':
-                                summary['pbp_text'] = away_pbp
-                            else:
-                                summary['pbp_text'] = home_pbp
-                            summary['score_change'] = score_change
-                
-                            game_pbp_lines.append(summary)
-                    else:
-                        pbp_line = {heading: None for heading in header}
-                        pbp_line['game_id'] = game['game_id']
-                        pbp_line['inning'] = inning_num + 1
-                        pbp_line['pbp_type'] = 'play'
-                        pbp_line['score_change'] = score_change
-                        
-                        if away_pbp == '':
-                            pbp_line['school_name'] = game['home_school_name']
-                            pbp_line['school_id'] = game['home_school_id']
-                            pbp_line['side'] = 'home'
-                            pbp_line['pbp_text'] = home_pbp
-                        else:
-                            pbp_line['school_name'] = game['away_school_name']
-                            pbp_line['school_id'] = game['away_school_id']
-                            pbp_line['side'] = 'away'
-                            pbp_line['pbp_text'] = away_pbp
-
-                        game_pbp_lines.append(pbp_line)
+            # the page could not be fetched, it will be picked up again the next time this runs
+            if game_pbp_lines is scrape_pipeline.NOT_FETCHED:
+                print('Skipping.')
+                continue
 
             play_by_play_writer.writerows(game_pbp_lines)
             play_by_play_file.flush()
+            manifest.add(game['game_id'])
 
             print('{num_lines} lines'.format(num_lines=len(game_pbp_lines)))
     
     print('{num_games} games total'.format(num_games=len(game_ids)))
+
+
+def _get_written_game_ids(play_by_play_file_name: str) -> set:
+    """
+    Get the ids of every game already written to the play by play file by reading the file. This is only needed when
+    there is no resume manifest yet.
+    
+    :param play_by_play_file_name: the play by play file
+    :return: a set of game ids, empty if the file does not exist
+    """
+    game_ids = set()
+    if os.path.exists(play_by_play_file_name):
+        with file_utils.open_scrape_file(play_by_play_file_name, 'rb') as play_by_play_file:
+            play_by_play_reader = unicodecsv.DictReader(play_by_play_file)
+            for play_by_play_line in play_by_play_reader:
+                game_ids.add(play_by_play_line['game_id'])
+    return game_ids
+
+
+def parse_play_by_play(page, game: dict) -> list:
+    """
+    Read every play by play line from a play by play page. This runs in the scrape pipeline's parser processes.
+    
+    :param page: the parsed play by play page
+    :param game: the game info dict of the game
+    :return: a list of play by play line dicts with the keys in PLAY_BY_PLAY_HEADER
+    """
+    innings = page.select('.mytable')[1:]
+    
+    game_pbp_lines = []
+
+    for inning_num, inning in enumerate(innings):
+        for pbp_line in inning.select('tr')[1:]:
+
+            pbp_cols = pbp_line.select('td')
+
+            away_pbp = pbp_cols[0].text.strip()
+            score_change = pbp_cols[1].text.strip()
+            home_pbp = pbp_cols[2].text.strip()
+
+            # this indicates this is an inning summary line
+            if away_pbp.startswith('R: '):
+                for side in ['away', 'home']:
+                    summary = {heading: None for heading in PLAY_BY_PLAY_HEADER}
+        
+                    summary['game_id'] = game['game_id']
+                    summary['school_name'] = game[side + '_school_name']
+                    summary['school_id'] = game[side + '_school_id']
+                    summary['inning'] = inning_num + 1
+                    summary['side'] = side
+                    summary['pbp_type'] = 'inning_summary'
+                    if side == 'away':
+                        summary['pbp_text'] = away_pbp
+                    else:
+                        summary['pbp_text'] = home_pbp
+                    summary['score_change'] = score_change
+        
+                    game_pbp_lines.append(summary)
+            else:
+                pbp_line = {heading: None for heading in PLAY_BY_PLAY_HEADER}
+                pbp_line['game_id'] = game['game_id']
+                pbp_line['inning'] = inning_num + 1
+                pbp_line['pbp_type'] = 'play'
+                pbp_line['score_change'] = score_change
+                
+                if away_pbp == '':
+                    pbp_line['school_name'] = game['home_school_name']
+                    pbp_line['school_id'] = game['home_school_id']
+                    pbp_line['side'] = 'home'
+                    pbp_line['pbp_text'] = home_pbp
+                else:
+                    pbp_line['school_name'] = game['away_school_name']
+                    pbp_line['school_id'] = game['away_school_id']
+                    pbp_line['side'] = 'away'
+                    pbp_line['pbp_text'] = away_pbp
+
+                game_pbp_lines.append(pbp_line)
+    return game_pbp_lines
@@ -37,19 +37,19 @@ def get_player_stats(year: int, division: int) -> None:
         stat_file_name = base_file_name.format(stat_type=stat_type)
         player_stats_file_name = file_utils.get_scrape_file_name(year, division, stat_file_name)
     
-        with open(player_stats_file_name, 'wb') as player_stats_file:
+        with file_utils.open_scrape_file(player_stats_file_name, 'wb') as player_stats_file:
             player_stats_writer = unicodecsv.writer(player_stats_file)
         
-            for team in teams_list:
+            player_stats_urls = [base_url.format(school_id=team['school_id'],
+                                                 year_id=ids['year_id'],
+                                                 stat_id=ids[stat_type + '_id'])
+                                 for team in teams_list]
+        
+            # raises once the other teams are written if a team's stats still cannot be fetched
+            for team, page in web_utils.get_all_pages(teams_list, player_stats_urls, 0.1, 10):
                 print('Getting player {stat_type} stats for {school}... '
                       .format(stat_type=stat_type, school=team['school_name']), end='')
 
-                player_stats_url = base_url.format(school_id=team['school_id'],
-                                                   year_id=ids['year_id'],
-                                                   stat_id=ids[stat_type + '_id'])
-
-                page = web_utils.get_page(player_stats_url, 0.1, 10)
-
                 stat_table = page.select_one('#stat_grid')
 
                 if not header:
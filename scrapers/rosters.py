@@ -28,16 +28,17 @@ def get_rosters(year: int, division: int) -> None:
     header = ['school_name', 'school_id', 'player_name', 'player_id', 'jersey_number', 'class']
     
     roster_file_name = file_utils.get_scrape_file_name(year, division, 'rosters')
-    with open(roster_file_name, 'wb') as roster_file:
+    with file_utils.open_scrape_file(roster_file_name, 'wb') as roster_file:
         roster_writer = unicodecsv.DictWriter(roster_file, header)
         roster_writer.writeheader()
         
-        for team in teams_list:
+        roster_urls = [base_url + '/team/{school_id}/roster/{year_id}'.format(school_id=team['school_id'],
+                                                                              year_id=ids['year_id'])
+                       for team in teams_list]
+        
+        # raises once the other rosters are written if a team's roster still cannot be fetched
+        for team, page in web_utils.get_all_pages(teams_list, roster_urls, 0.1, 10):
             print('Getting roster for {school}... '.format(school=team['school_name']), end='')
-            roster_url = base_url + '/team/{school_id}/roster/{year_id}'.format(school_id=team[
-                'school_id'], year_id=ids['year_id'])
-            
-            page = web_utils.get_page(roster_url, 0.1, 10)
 
             roster_rows = page.select_one('tbody').select('tr')
 
@@ -8,6 +8,7 @@ import unicodecsv
 
 from jmu_baseball_utils import data_utils
 from jmu_baseball_utils import file_utils
+from jmu_baseball_utils import html_parsers
 from jmu_baseball_utils import web_utils
 
 
@@ -40,10 +41,10 @@ def get_team_info(year: int, division: int) -> None:
     schedule_header = ['school_name', 'school_id', 'opponent_string', 'opponent_url', 'date',
                        'score_string', 'game_url']
     
-    with open(team_info_file_name, 'wb') as team_info_file, \
-            open(stadium_file_name, 'wb') as stadium_file, \
-            open(coach_file_name, 'wb') as coach_file, \
-            open(schedule_file_name, 'wb') as schedule_file:
+    with file_utils.open_scrape_file(team_info_file_name, 'wb') as team_info_file, \
+            file_utils.open_scrape_file(stadium_file_name, 'wb') as stadium_file, \
+            file_utils.open_scrape_file(coach_file_name, 'wb') as coach_file, \
+            file_utils.open_scrape_file(schedule_file_name, 'wb') as schedule_file:
         
         team_info_writer = unicodecsv.DictWriter(team_info_file, team_info_header)
         team_info_writer.writeheader()
@@ -57,12 +58,15 @@ def get_team_info(year: int, division: int) -> None:
         schedule_writer = unicodecsv.DictWriter(schedule_file, schedule_header)
         schedule_writer.writeheader()
         
-        for team in teams_list:
-            team_url = base_url + '/team/{school_id}/{year_id}'.format(school_id=team['school_id'],
-                                                                       year_id=ids['year_id'])
+        team_urls = [base_url + '/team/{school_id}/{year_id}'.format(school_id=team['school_id'],
+                                                                     year_id=ids['year_id'])
+                     for team in teams_list]
+        # team pages compare tags to strings when reading coaches, so they are always parsed with BeautifulSoup
+        # raises once the other teams are written if a team page still cannot be fetched
+        pages = web_utils.get_all_pages(teams_list, team_urls, 0.1, 10, parser=html_parsers.get_soup_backend())
+        for team, page in pages:
             print('Getting team information and schedules for {school_name}... '.format(
                 school_name=team['school_name']), end='')
-            page = web_utils.get_page(team_url, 0.1, 10)
 
             # school website and nickname
             school_info = page.select_one('legend')
@@ -37,7 +37,7 @@ def get_team_stats(year: int, division: int) -> None:
     for stat_type in stat_types:
         stat_file_name = base_file_name.format(stat_type=stat_type)
         team_stats_file_name = file_utils.get_scrape_file_name(year, division, stat_file_name)
-        with open(team_stats_file_name, 'wb') as team_stats_file:
+        with file_utils.open_scrape_file(team_stats_file_name, 'wb') as team_stats_file:
             if year == 2016 and division == 3 and stat_type != 'hitting':
                 print('2016 division 3 pitching and fielding totals are messed up on the ncaa '
                       'site, check if they work again manually\n {}'.format(url))
@@ -98,7 +98,7 @@ def get_team_stats(year: int, division: int) -> None:
     
     schools_file_name = file_utils.get_scrape_file_name(year, division, 'conference_teams')
     team_header = ['school_id', 'conference_name', 'school_name']
-    with open(schools_file_name, 'wb') as file:
+    with file_utils.open_scrape_file(schools_file_name, 'wb') as file:
         schools_writer = unicodecsv.writer(file)
         schools_writer.writerow(team_header)
         schools_writer.writerows(team_conference_info)
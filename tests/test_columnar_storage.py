@@ -0,0 +1,68 @@
+"""
+Tests for the typed columnar copies of scraped csvs, from the csv to a Parquet or Arrow file and back through
+file_utils. Run from the repository root with:
+python -m unittest tests.test_columnar_storage
+
+@author: Kevin Kelly
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from jmu_baseball_utils import columnar_storage
+from jmu_baseball_utils import compressed_files
+from jmu_baseball_utils import file_utils
+
+YEAR = 2019
+DIVISION = 1
+STAT_TYPE = 'rosters'
+CSV_TEXT = ('school_name,school_id,player_name,player_id,jersey_number,class,zip_code\n'
+            'James Madison,352,"Doe, John",123,7,Fr,02134\n'
+            'George Mason,248,"Roe, Richard",,12,So,22030\n')
+
+
+@unittest.skipUnless(columnar_storage.is_available(), 'needs pyarrow installed')
+class ColumnarRoundTripTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp()
+        # file_utils puts scraped-data next to the package directory, so the package directory is moved into the
+        # temporary directory
+        package_directory = os.path.join(self.directory, 'jmu_baseball_utils')
+        os.makedirs(package_directory)
+        patches = [mock.patch.object(file_utils, 'PACKAGE_DIRECTORY', package_directory),
+                   mock.patch.object(compressed_files, '_default_compression', None)]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        file_utils.clear_path_cache()
+        self.addCleanup(file_utils.clear_path_cache)
+        self.addCleanup(shutil.rmtree, self.directory)
+        with file_utils.open_scrape_file(file_utils.get_scrape_file_name(YEAR, DIVISION, STAT_TYPE), 'wb') as file:
+            file.write(CSV_TEXT.encode('utf-8'))
+
+    def _check_round_trip(self, storage_format: str) -> None:
+        columnar_file_name = file_utils.write_columnar_file(YEAR, DIVISION, STAT_TYPE, storage_format)
+        self.assertTrue(os.path.exists(columnar_file_name))
+        # the columnar copy is newer than the csv, so it is what gets read
+        table = file_utils.read_scrape_table(YEAR, DIVISION, STAT_TYPE)
+        self.assertEqual(str(table.schema.field('zip_code').type), 'string')
+        self.assertEqual(str(table.schema.field('school_id').type), 'int64')
+        rows = list(file_utils.iter_scrape_rows(YEAR, DIVISION, STAT_TYPE))
+        self.assertEqual([row['zip_code'] for row in rows], ['02134', '22030'])
+        self.assertEqual([row['player_id'] for row in rows], [123, None])
+        self.assertEqual(rows[0]['player_name'], 'Doe, John')
+        self.assertEqual(list(file_utils.iter_scrape_rows(YEAR, DIVISION, STAT_TYPE, ['zip_code'])),
+                         [{'zip_code': '02134'}, {'zip_code': '22030'}])
+
+    def test_parquet_round_trip(self):
+        self._check_round_trip(columnar_storage.PARQUET)
+
+    def test_arrow_round_trip(self):
+        self._check_round_trip(columnar_storage.ARROW)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,173 @@
+"""
+Tests for dropbox_sync against a fake Dropbox client that keeps its files in memory. Run from the repository root with:
+python -m unittest tests.test_dropbox_sync
+
+@author: Kevin Kelly
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import types
+import unittest
+from unittest import mock
+
+import requests
+from dropbox.exceptions import ApiError, InternalServerError, RateLimitError
+from dropbox.files import FileMetadata
+
+from jmu_baseball_utils import dropbox_sync
+
+
+class FakeDropbox:
+    """
+    A Dropbox client with only the methods dropbox_sync uses, keeping files in a dict of Dropbox paths to bytes.
+    Listings come back two entries to a page so the sync has to follow has_more.
+    """
+
+    def __init__(self, files: dict = None) -> None:
+        """
+        :param files: the files already in Dropbox, a dict of Dropbox paths to bytes
+        """
+        self.files = dict(files or {})
+        self.sessions = {}
+        self.pages = []
+        self.calls = []
+        self.errors = {}  # Dropbox path -> a list of exceptions raised by the next transfers of that file
+
+    def files_list_folder(self, folder: str, recursive: bool = False):
+        entries = [self._get_metadata(path) for path in sorted(self.files) if path.startswith(folder + '/')]
+        if not entries and folder not in self.files:
+            raise ApiError('request', 'not_found', 'folder not found', 'en')
+        self.pages = [entries[start:start + 2] for start in range(0, max(len(entries), 1), 2)]
+        return self._get_page(0)
+
+    def files_list_folder_continue(self, cursor: int):
+        return self._get_page(cursor)
+
+    def files_get_metadata(self, path: str):
+        if path not in self.files:
+            raise ApiError('request', 'not_found', 'file not found', 'en')
+        return self._get_metadata(path)
+
+    def files_upload(self, data: bytes, path: str, mode=None) -> None:
+        self._raise_error(path)
+        self.calls.append(('upload', path))
+        self.files[path] = data
+
+    def files_upload_session_start(self, data: bytes):
+        session_id = str(len(self.sessions))
+        self.sessions[session_id] = bytearray(data)
+        return types.SimpleNamespace(session_id=session_id)
+
+    def files_upload_session_append_v2(self, data: bytes, cursor) -> None:
+        assert cursor.offset == len(self.sessions[cursor.session_id])
+        self.sessions[cursor.session_id] += data
+
+    def files_upload_session_finish(self, data: bytes, cursor, commit) -> None:
+        assert cursor.offset == len(self.sessions[cursor.session_id])
+        self._raise_error(commit.path)
+        self.calls.append(('session', commit.path))
+        self.files[commit.path] = bytes(self.sessions[cursor.session_id] + data)
+
+    def files_download_to_file(self, download_path: str, path: str) -> None:
+        self._raise_error(path)
+        self.calls.append(('download', path))
+        with open(download_path, 'wb') as file:
+            file.write(self.files[path])
+
+    def _get_page(self, index: int):
+        return types.SimpleNamespace(entries=self.pages[index], has_more=index + 1 < len(self.pages), cursor=index + 1)
+
+    def _get_metadata(self, path: str) -> FileMetadata:
+        data = self.files[path]
+        block_hashes = hashlib.sha256()
+        for start in range(0, len(data), dropbox_sync.HASH_BLOCK_SIZE):
+            block_hashes.update(hashlib.sha256(data[start:start + dropbox_sync.HASH_BLOCK_SIZE]).digest())
+        return FileMetadata(name=path.rsplit('/', 1)[1], id='id:' + path, path_lower=path.lower(),
+                            path_display=path, size=len(data), content_hash=block_hashes.hexdigest())
+
+    def _raise_error(self, path: str) -> None:
+        errors = self.errors.get(path)
+        if errors:
+            raise errors.pop(0)
+
+
+class DropboxSyncTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp()
+        patches = [mock.patch.object(dropbox_sync, 'get_local_path', self._get_local_path),
+                   mock.patch.object(dropbox_sync, 'CHUNK_SIZE', 10),
+                   mock.patch.object(dropbox_sync, 'RETRY_SLEEP', 0),
+                   mock.patch('builtins.print')]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def _get_local_path(self, dropbox_path: str) -> str:
+        path = os.path.join(self.directory, dropbox_path.lstrip('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def _write(self, dropbox_path: str, data: bytes) -> None:
+        with open(self._get_local_path(dropbox_path), 'wb') as file:
+            file.write(data)
+
+    def _read(self, dropbox_path: str) -> bytes:
+        with open(self._get_local_path(dropbox_path), 'rb') as file:
+            return file.read()
+
+    def test_upload_only_changed_files(self):
+        self._write('/scraped-data/2019/division_1/rosters.csv', b'short')
+        self._write('/scraped-data/2019/division_1/box_score_hitting.csv', b'x' * 35)
+        self._write('/scraped-data/school_ids.csv', b'1,2')
+        self._write('/scraped-data/spool/page.html', b'never synced')
+        self._write('/scraped-data/2019/division_1/box_score_hitting.tmp.csv', b'half written')
+        self._write('/scraped-data/2019/division_1/box_score_pitching.csv.tmp.gz', b'half written')
+        self._write('/scraped-data/2019/division_1/rosters.csv.tmp', b'half written')
+        dbx = FakeDropbox()
+
+        counts = dropbox_sync.upload_folder(dbx, 'scraped-data')
+        self.assertEqual(counts, {'transferred': 3, 'unchanged': 0, 'failed': 0})
+        self.assertIn(('session', '/scraped-data/2019/division_1/box_score_hitting.csv'), dbx.calls)
+        self.assertEqual(dbx.files['/scraped-data/2019/division_1/box_score_hitting.csv'], b'x' * 35)
+        self.assertEqual(sorted(dbx.files), ['/scraped-data/2019/division_1/box_score_hitting.csv',
+                                             '/scraped-data/2019/division_1/rosters.csv',
+                                             '/scraped-data/school_ids.csv'])
+
+        dbx.calls.clear()
+        self._write('/scraped-data/school_ids.csv', b'1,3')
+        counts = dropbox_sync.upload_folder(dbx, 'scraped-data')
+        self.assertEqual(counts, {'transferred': 1, 'unchanged': 2, 'failed': 0})
+        self.assertEqual(dbx.calls, [('upload', '/scraped-data/school_ids.csv')])
+
+    def test_download_follows_every_page(self):
+        dbx = FakeDropbox({'/scraped-data/{number}.csv'.format(number=number): str(number).encode()
+                           for number in range(5)})
+        counts = dropbox_sync.download_folder(dbx, 'scraped-data')
+        self.assertEqual(counts, {'transferred': 5, 'unchanged': 0, 'failed': 0})
+        self.assertEqual(self._read('/scraped-data/4.csv'), b'4')
+        self.assertEqual(dropbox_sync.download_folder(dbx, 'scraped-data'),
+                         {'transferred': 0, 'unchanged': 5, 'failed': 0})
+
+    def test_rate_limited_transfer_is_retried(self):
+        dbx = FakeDropbox({'/scraped-data/a.csv': b'a'})
+        dbx.errors['/scraped-data/a.csv'] = [RateLimitError('request', backoff=0), RateLimitError('request')]
+        counts = dropbox_sync.download_folder(dbx, 'scraped-data')
+        self.assertEqual(counts, {'transferred': 1, 'unchanged': 0, 'failed': 0})
+        self.assertEqual(self._read('/scraped-data/a.csv'), b'a')
+
+    def test_failed_transfers_are_counted(self):
+        dbx = FakeDropbox({'/scraped-data/{name}.csv'.format(name=name): name.encode() for name in 'abcd'})
+        dbx.errors['/scraped-data/a.csv'] = [InternalServerError('request', 500, 'error')]
+        dbx.errors['/scraped-data/b.csv'] = [requests.ConnectionError('connection reset')]
+        dbx.errors['/scraped-data/c.csv'] = [RateLimitError('request', backoff=0)] * dropbox_sync.TRY_LIMIT
+        counts = dropbox_sync.download_folder(dbx, 'scraped-data')
+        self.assertEqual(counts, {'transferred': 1, 'unchanged': 0, 'failed': 3})
+        self.assertEqual(self._read('/scraped-data/d.csv'), b'd')
+
+
+if __name__ == '__main__':
+    unittest.main()